@@ -0,0 +1 @@
+# Static assets package initialization
\ No newline at end of file
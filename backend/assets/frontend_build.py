@@ -0,0 +1,132 @@
+"""
+بصمة مصادر الواجهة لتجنب إعادة البناء (npm run build) عند كل تشغيل
+
+- البصمة: SHA-256 لمسارات ومحتوى src/ و public/ و package.json و package-lock.json و tsconfig.json
+- تُحفظ بعد كل بناء ناجح في build/build-fingerprint.json مع بصمة asset-manifest.json،
+  فيُعتبر البناء حديثًا فقط إذا تطابقت المصادر وكان ملف البيان هو نفسه الناتج عن ذلك البناء
+- البناء في الخلفية يتم في مجلد منفصل (build.next) ثم يُستبدل به مجلد build بعد أن يتحول
+  فهرس الملفات إليه (swap_build_directory)
+"""
+import os
+import json
+import shutil
+import hashlib
+
+FRONTEND_SOURCES = ('src', 'public', 'package.json', 'package-lock.json', 'tsconfig.json')
+FINGERPRINT_FILE = 'build-fingerprint.json'
+MANIFEST_FILE = 'asset-manifest.json'
+
+
+def _hash_file(digest, path):
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(65536), b''):
+            digest.update(chunk)
+
+
+def source_fingerprint(root):
+    """
+    حساب بصمة مصادر الواجهة
+
+    Args:
+        root: مجلد المشروع
+
+    Returns:
+        str: بصمة SHA-256 بالنظام الست عشري
+    """
+    digest = hashlib.sha256()
+    for source in FRONTEND_SOURCES:
+        path = os.path.join(root, source)
+        if os.path.isfile(path):
+            files = [path]
+        elif os.path.isdir(path):
+            files = []
+            for directory, subdirectories, names in os.walk(path):
+                subdirectories.sort()
+                files.extend(os.path.join(directory, name) for name in sorted(names))
+        else:
+            continue
+        for file_path in files:
+            relative_path = os.path.relpath(file_path, root).replace(os.sep, '/')
+            digest.update(relative_path.encode('utf-8') + b'\0')
+            _hash_file(digest, file_path)
+            digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _manifest_hash(build_dir):
+    digest = hashlib.sha256()
+    _hash_file(digest, os.path.join(build_dir, MANIFEST_FILE))
+    return digest.hexdigest()
+
+
+def build_status(root, build_dir, fingerprint=None):
+    """
+    مقارنة مصادر الواجهة مع البناء الحالي
+
+    Args:
+        root: مجلد المشروع
+        build_dir: مجلد البناء
+        fingerprint: بصمة المصادر (تُحسب إذا لم تُمرر)
+
+    Returns:
+        tuple: (هل البناء حديث، السبب، بصمة المصادر)
+    """
+    if fingerprint is None:
+        fingerprint = source_fingerprint(root)
+    if not os.path.exists(os.path.join(build_dir, MANIFEST_FILE)):
+        return False, 'no build found', fingerprint
+    try:
+        with open(os.path.join(build_dir, FINGERPRINT_FILE), encoding='utf-8') as f:
+            recorded = json.load(f)
+    except (OSError, ValueError):
+        return False, 'build has no source fingerprint', fingerprint
+    if recorded.get('sources') != fingerprint:
+        return False, 'sources changed since the last build', fingerprint
+    if recorded.get('manifest') != _manifest_hash(build_dir):
+        return False, 'asset-manifest.json does not match the recorded build', fingerprint
+    return True, 'build is up to date', fingerprint
+
+
+def write_fingerprint(build_dir, fingerprint):
+    """تسجيل بصمة المصادر بعد بناء ناجح"""
+    record = {'sources': fingerprint, 'manifest': _manifest_hash(build_dir)}
+    with open(os.path.join(build_dir, FINGERPRINT_FILE), 'w', encoding='utf-8') as f:
+        json.dump(record, f, indent=2)
+
+
+def _link_or_copy(source, destination):
+    """ربط صلب للملف (بدون نسخ المحتوى) أو نسخه إذا لم يدعم نظام الملفات الروابط"""
+    try:
+        os.link(source, destination)
+    except OSError:
+        shutil.copy2(source, destination)
+
+
+def swap_build_directory(new_build_dir, build_dir, assets=None):
+    """
+    استبدال مجلد البناء بالبناء الجديد
+
+    بدون فهرس: عمليتا إعادة تسمية فقط.
+
+    مع فهرس StaticAssets (الملفات الكبيرة تُقرأ من القرص عند الطلب) لا يشير الفهرس
+    في أي لحظة إلى مجلد تمت إعادة تسميته:
+    1. يتحول الفهرس إلى new_build_dir، فلا يعود المجلد القديم مستخدمًا
+    2. يُنقل المجلد القديم وتُنشأ build_dir من روابط صلبة لملفات new_build_dir
+    3. يتحول الفهرس إلى build_dir ثم يُحذف المجلدان المؤقتان
+    """
+    old_build_dir = build_dir + '.old'
+    shutil.rmtree(old_build_dir, ignore_errors=True)
+    if assets is None:
+        if os.path.exists(build_dir):
+            os.rename(build_dir, old_build_dir)
+        os.rename(new_build_dir, build_dir)
+        shutil.rmtree(old_build_dir, ignore_errors=True)
+        return
+
+    assets.scan(new_build_dir)
+    if os.path.exists(build_dir):
+        os.rename(build_dir, old_build_dir)
+    shutil.copytree(new_build_dir, build_dir, copy_function=_link_or_copy)
+    assets.scan(build_dir)
+    shutil.rmtree(new_build_dir, ignore_errors=True)
+    shutil.rmtree(old_build_dir, ignore_errors=True)
@@ -0,0 +1,379 @@
+"""
+تقديم ملفات الواجهة (مجلد build) مع الضغط المسبق والتخزين المؤقت في المتصفح
+
+- نسخ gzip و brotli تُبنى مرة واحدة عند التشغيل بجانب الملف الأصلي (main.js.gz, main.js.br)
+  أو تُقرأ من مجلد البناء إذا كانت موجودة وأحدث من الملف الأصلي
+- اختيار الترميز حسب هيدر Accept-Encoding مع Vary: Accept-Encoding
+- الملفات التي يحتوي اسمها على بصمة المحتوى (من asset-manifest.json) تُخزن لمدة سنة مع immutable
+- الصور بدون بصمة تُخزن لمدة يوم، وباقي الملفات (index.html, manifest.json) يُعاد التحقق منها
+  عبر ETag قوي مبني على المحتوى
+- هيدر Link: rel=preload لملفات نقطة الدخول (من asset-manifest.json) على استجابة index.html،
+  مع 103 Early Hints إذا كان خادم WSGI يوفر wsgi.early_hints
+- فهرس لجميع الملفات يُبنى عند التشغيل (الحجم، وقت التعديل، البصمة، النوع) مع تحميل الملفات
+  الصغيرة و index.html في الذاكرة، لذلك لا يحتاج تقديم الملفات أو مسارات SPA إلى أي استدعاء
+  لنظام الملفات. في وضع التطوير يُعاد فحص المجلد دوريًا لالتقاط البناء الجديد.
+"""
+import os
+import re
+import gzip
+import json
+import hashlib
+import mimetypes
+import time
+import threading
+from flask import request, send_file, make_response, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_PRECOMPRESS = os.getenv('STATIC_PRECOMPRESS', 'true').lower() == 'true'
+STATIC_COMPRESS_MIN_SIZE = int(os.getenv('STATIC_COMPRESS_MIN_SIZE', '1024'))
+STATIC_GZIP_LEVEL = int(os.getenv('STATIC_GZIP_LEVEL', '9'))
+STATIC_BROTLI_QUALITY = int(os.getenv('STATIC_BROTLI_QUALITY', '11'))
+# مدة التخزين للملفات ذات البصمة (سنة) وللملفات الأخرى (0 = إعادة التحقق دائمًا)
+STATIC_IMMUTABLE_MAX_AGE = int(os.getenv('STATIC_IMMUTABLE_MAX_AGE', '31536000'))
+STATIC_DEFAULT_MAX_AGE = int(os.getenv('STATIC_DEFAULT_MAX_AGE', '0'))
+# الملفات الأصغر من هذا الحجم (ونسخها المضغوطة) تُحمّل في الذاكرة
+STATIC_PRELOAD_MAX_SIZE = int(os.getenv('STATIC_PRELOAD_MAX_SIZE', '65536'))
+# إعادة فحص مجلد البناء دوريًا (افتراضيًا في وضع التطوير فقط)
+STATIC_WATCH = (os.getenv('STATIC_WATCH') or os.getenv('DEBUG_MODE', 'false')).lower() == 'true'
+STATIC_WATCH_INTERVAL = float(os.getenv('STATIC_WATCH_INTERVAL', '1'))
+# هيدر Link للتحميل المسبق على index.html، و 103 Early Hints إذا دعمها الخادم
+STATIC_PRELOAD_HEADERS = os.getenv('STATIC_PRELOAD_HEADERS', 'true').lower() == 'true'
+STATIC_EARLY_HINTS = os.getenv('STATIC_EARLY_HINTS', 'true').lower() == 'true'
+# الصور بدون بصمة (rank_icon, images) نادرًا ما تتغير لذلك تُخزن لمدة أقصر دون إعادة تحقق
+STATIC_IMAGE_MAX_AGE = int(os.getenv('STATIC_IMAGE_MAX_AGE', '86400'))
+
+# الأنواع التي يفيد ضغطها (الصور PNG/JPG مضغوطة أصلاً)
+COMPRESSIBLE_TYPES = (
+    'text/', 'application/javascript', 'application/json', 'application/manifest+json',
+    'image/svg+xml', 'image/x-icon', 'image/vnd.microsoft.icon', 'application/xml',
+)
+# الترميزات بترتيب الأفضلية: (الاسم، امتداد الملف المضغوط)
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+# نوع التحميل المسبق حسب الامتداد
+PRELOAD_TYPES = {'.js': 'script', '.css': 'style', '.woff2': 'font', '.woff': 'font'}
+# أسماء ملفات CRA التي تحتوي على بصمة المحتوى: main.b159d869.js, 453.4e175c56.chunk.js,
+# media/logo.6ce24c58.svg, media/font.5e3b1a9f.woff2 (البصمة مقطع في اسم الملف بأي امتداد)
+HASHED_NAME = re.compile(r'\.[0-9a-f]{8,}\.[^/]+$')
+
+
+def _is_compressible(mimetype):
+    return any(mimetype.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+def _compress(data, encoding):
+    if encoding == 'gzip':
+        # mtime=0 حتى يكون الناتج ثابتًا بين عمليات البناء
+        return gzip.compress(data, compresslevel=STATIC_GZIP_LEVEL, mtime=0)
+    return brotli.compress(data, quality=STATIC_BROTLI_QUALITY)
+
+
+def precompress_file(path, data=None):
+    """
+    تجهيز النسخ المضغوطة لملف واحد
+
+    تُستخدم النسخة الموجودة إذا كانت أحدث من الملف الأصلي، وإلا تُبنى وتُكتب بجانبه.
+
+    Returns:
+        dict: {الترميز: مسار الملف المضغوط}
+    """
+    variants = {}
+    source_mtime = os.path.getmtime(path)
+    for encoding, suffix in ENCODINGS:
+        if encoding == 'br' and brotli is None:
+            continue
+        variant_path = path + suffix
+        try:
+            if os.path.exists(variant_path) and os.path.getmtime(variant_path) >= source_mtime:
+                variants[encoding] = variant_path
+                continue
+            if not STATIC_PRECOMPRESS:
+                continue
+            if data is None:
+                with open(path, 'rb') as f:
+                    data = f.read()
+            compressed = _compress(data, encoding)
+            # لا فائدة من نسخة مضغوطة لا توفر شيئًا يذكر
+            if len(compressed) >= len(data) * 0.95:
+                continue
+            tmp_path = variant_path + '.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(compressed)
+            os.replace(tmp_path, variant_path)
+            variants[encoding] = variant_path
+        except OSError as e:
+            # مجلد البناء قد يكون للقراءة فقط؛ نقدم الملف بدون ضغط
+            print(f"[ASSETS] Could not precompress {path} ({encoding}): {e}")
+    return variants
+
+
+class AssetEntry:
+    """بيانات ملف واحد من مجلد البناء"""
+    __slots__ = ('path', 'size', 'mtime', 'mimetype', 'etag', 'immutable', 'variants', 'body', 'encoded')
+
+    def __init__(self, path, size, mtime, mimetype, etag, immutable, variants, body=None, encoded=None):
+        self.path = path
+        self.size = size
+        self.mtime = mtime
+        self.mimetype = mimetype
+        self.etag = etag
+        self.immutable = immutable
+        self.variants = variants
+        # المحتوى المحمّل في الذاكرة (None للملفات الكبيرة)
+        self.body = body
+        self.encoded = encoded or {}
+
+
+class StaticAssets:
+    """تقديم ملفات مجلد البناء من فهرس في الذاكرة مع التفاوض على الضغط وهيدرات التخزين المؤقت"""
+
+    def __init__(self, folder, preload_max_size=STATIC_PRELOAD_MAX_SIZE):
+        self.folder = folder
+        self.preload_max_size = preload_max_size
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self.hashed_files = set()
+        self.preload_links = []
+
+    def _load_manifest(self, folder):
+        """قراءة الملفات ذات البصمة وملفات نقطة الدخول من asset-manifest.json"""
+        hashed, links = set(), []
+        try:
+            with open(os.path.join(folder, 'asset-manifest.json'), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            manifest = {}
+        for file_path in (manifest.get('files') or {}).values():
+            file_path = file_path.lstrip('/')
+            if HASHED_NAME.search(file_path):
+                hashed.add(file_path)
+        for file_path in manifest.get('entrypoints') or []:
+            file_path = file_path.lstrip('/')
+            hashed.add(file_path)
+            preload_as = PRELOAD_TYPES.get(os.path.splitext(file_path)[1])
+            if preload_as:
+                link = f'</{file_path}>; rel=preload; as={preload_as}'
+                if preload_as == 'font':
+                    link += '; crossorigin'
+                links.append(link)
+        self.hashed_files, self.preload_links = hashed, links
+
+    def _is_immutable(self, relative_path):
+        return relative_path in self.hashed_files or (
+            relative_path.startswith('static/') and HASHED_NAME.search(relative_path) is not None
+        )
+
+    def _build_entry(self, relative_path, path, st):
+        with open(path, 'rb') as f:
+            data = f.read()
+        mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        variants = {}
+        if _is_compressible(mimetype) and st.st_size >= STATIC_COMPRESS_MIN_SIZE:
+            variants = precompress_file(path, data)
+
+        body, encoded = None, {}
+        # index.html يُقدم لكل مسارات SPA لذلك يُحمّل دائمًا
+        if st.st_size <= self.preload_max_size or relative_path == 'index.html':
+            body = data
+            for encoding, variant_path in variants.items():
+                with open(variant_path, 'rb') as f:
+                    encoded[encoding] = f.read()
+
+        return AssetEntry(
+            path=path,
+            size=st.st_size,
+            mtime=st.st_mtime,
+            mimetype=mimetype,
+            etag=hashlib.sha1(data).hexdigest()[:20],
+            immutable=self._is_immutable(relative_path),
+            variants=variants,
+            body=body,
+            encoded=encoded
+        )
+
+    def get(self, relative_path):
+        """
+        بيانات ملف من الفهرس (بدون أي استدعاء لنظام الملفات)
+
+        Returns:
+            AssetEntry or None: None إذا لم يكن الملف موجودًا
+        """
+        return self._entries.get(relative_path)
+
+    def scan(self, folder=None):
+        """
+        بناء فهرس جميع الملفات ونسخها المضغوطة
+
+        الملفات التي لم يتغير حجمها أو وقت تعديلها تبقى كما هي، والفهرس الجديد
+        يستبدل القديم دفعة واحدة حتى لا يرى الطلب فهرسًا نصف مبني.
+
+        Args:
+            folder: مجلد آخر يُقدم منه بعد فحصه (مثلاً build.next أثناء استبدال البناء)؛
+                يبقى الفهرس القديم ومجلده مستخدمين حتى تكتمل عملية الفحص
+
+        Returns:
+            bool: True إذا تغير أي ملف
+        """
+        with self._lock:
+            folder = folder or self.folder
+            previous = self._entries
+            entries = {}
+            # بناء جديد يعني بصمات جديدة في asset-manifest.json
+            manifest = previous.get('asset-manifest.json')
+            manifest_path = os.path.join(folder, 'asset-manifest.json')
+            try:
+                manifest_mtime = os.path.getmtime(manifest_path)
+            except OSError:
+                manifest_mtime = None
+            if manifest is None or manifest.path != manifest_path or manifest.mtime != manifest_mtime:
+                self._load_manifest(folder)
+            suffixes = tuple(suffix for _, suffix in ENCODINGS) + ('.tmp',)
+            for root, _, files in os.walk(folder):
+                for name in files:
+                    if name.endswith(suffixes):
+                        continue
+                    path = os.path.join(root, name)
+                    relative_path = os.path.relpath(path, folder).replace(os.sep, '/')
+                    try:
+                        st = os.stat(path)
+                        entry = previous.get(relative_path)
+                        # المسار المحفوظ يجب أن يكون داخل المجلد الحالي لأن الملفات الكبيرة تُقرأ منه
+                        if (entry is None or entry.path != path
+                                or entry.mtime != st.st_mtime or entry.size != st.st_size):
+                            entry = self._build_entry(relative_path, path, st)
+                    except OSError:
+                        # الملف حُذف أثناء الفحص (مثلاً أثناء npm run build)
+                        continue
+                    entries[relative_path] = entry
+            changed = entries.keys() != previous.keys() or any(
+                entries[key] is not previous.get(key) for key in entries
+            )
+            self.folder, self._entries = folder, entries
+            return changed
+
+    def warm(self):
+        """
+        بناء الفهرس عند التشغيل
+
+        Returns:
+            tuple: (عدد الملفات، عدد الملفات المضغوطة مسبقًا)
+        """
+        self.scan()
+        entries = list(self._entries.values())
+        return len(entries), sum(1 for entry in entries if entry.variants)
+
+    def start_watcher(self, interval=STATIC_WATCH_INTERVAL):
+        """إعادة فحص مجلد البناء دوريًا في خيط خلفي (لوضع التطوير)"""
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    if self.scan():
+                        print(f"[ASSETS] Build directory changed, reindexed {len(self._entries)} files")
+                except Exception as e:
+                    print(f"[ASSETS] Error rescanning build directory: {e}")
+
+        self._watcher = threading.Thread(target=watch, name='static-assets-watcher', daemon=True)
+        self._watcher.start()
+
+    def stats(self):
+        """عدد الملفات في الفهرس وحجم المحتوى المحمّل في الذاكرة"""
+        entries = list(self._entries.values())
+        preloaded = [entry for entry in entries if entry.body is not None]
+        return {
+            'files': len(entries),
+            'preloaded_files': len(preloaded),
+            'preloaded_bytes': sum(len(entry.body) + sum(map(len, entry.encoded.values())) for entry in preloaded),
+            'precompressed_files': sum(1 for entry in entries if entry.variants),
+            'watching': self._watcher is not None,
+        }
+
+    def send_early_hints(self):
+        """
+        إرسال 103 Early Hints بملفات نقطة الدخول قبل الاستجابة النهائية
+
+        يعمل فقط مع خوادم WSGI التي توفر wsgi.early_hints في البيئة؛ في غير ذلك
+        يكفي هيدر Link على الاستجابة لأن الوكلاء مثل Cloudflare يحولونه إلى 103.
+        """
+        early_hints = request.environ.get('wsgi.early_hints')
+        if not (STATIC_EARLY_HINTS and self.preload_links and callable(early_hints)):
+            return False
+        try:
+            early_hints([('Link', link) for link in self.preload_links])
+            return True
+        except Exception as e:
+            print(f"[ASSETS] Could not send early hints: {e}")
+            return False
+
+    def _negotiate(self, entry):
+        """اختيار أفضل ترميز يقبله المتصفح"""
+        if not entry.variants:
+            return None
+        accepted = request.accept_encodings
+        for encoding, _ in ENCODINGS:
+            if encoding in entry.variants and accepted.quality(encoding) > 0:
+                return encoding
+        return None
+
+    def send(self, relative_path):
+        """
+        إرسال ملف من مجلد البناء
+
+        Returns:
+            Response or None: None إذا لم يكن الملف موجودًا
+        """
+        try:
+            return self._send(relative_path)
+        except FileNotFoundError:
+            # استُبدل البناء بين قراءة الفهرس وفتح الملف، والفهرس الحالي يشير إلى المجلد الجديد
+            return self._send(relative_path)
+
+    def _send(self, relative_path):
+        entry = self._entries.get(relative_path)
+        if entry is None:
+            return None
+
+        # صفحة SPA: إعلام المتصفح بملفات نقطة الدخول قبل أن يحلل HTML
+        is_shell = relative_path == 'index.html' and STATIC_PRELOAD_HEADERS and bool(self.preload_links)
+        if is_shell:
+            self.send_early_hints()
+
+        encoding = self._negotiate(entry)
+        # ETag قوي مختلف لكل ترميز لأن المحتوى المرسل مختلف
+        etag = f'{entry.etag}-{encoding}' if encoding else entry.etag
+
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        elif entry.body is not None:
+            response = Response(entry.encoded[encoding] if encoding else entry.body, mimetype=entry.mimetype)
+        else:
+            response = send_file(
+                entry.variants[encoding] if encoding else entry.path,
+                mimetype=entry.mimetype,
+                conditional=False,
+                etag=False
+            )
+        if encoding and response.status_code == 200:
+            response.headers['Content-Encoding'] = encoding
+
+        response.set_etag(etag)
+        if is_shell:
+            response.headers['Link'] = ', '.join(self.preload_links)
+        if entry.variants:
+            response.vary.add('Accept-Encoding')
+        if entry.immutable:
+            response.headers['Cache-Control'] = f'public, max-age={STATIC_IMMUTABLE_MAX_AGE}, immutable'
+        elif entry.mimetype.startswith('image/') and STATIC_IMAGE_MAX_AGE:
+            response.headers['Cache-Control'] = f'public, max-age={STATIC_IMAGE_MAX_AGE}'
+        elif STATIC_DEFAULT_MAX_AGE:
+            response.headers['Cache-Control'] = f'public, max-age={STATIC_DEFAULT_MAX_AGE}'
+        else:
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
@@ -1,16 +1,24 @@
 import os
 import jwt
 import json
-import random
-import requests
+import hashlib
 import datetime
 import time
 from functools import wraps
 from bson.objectid import ObjectId
 from dotenv import load_dotenv
 from flask import Blueprint, request, redirect, jsonify, make_response, g, current_app
-from pymongo import MongoClient
+from pymongo import ReturnDocument
 import sys
+from backend.security.user_cache import invalidate_user
+from backend.security.token_cache import decode_token_cached, record_token_refresh
+from backend.security.security import get_principal
+from backend.auth.presence import create_presence_store
+from backend.auth.geo import GeoLocator, GeoEnricher
+from backend.http_client import http_client
+from backend.events.hub import publish_event
+from backend.observability.metrics import span
+from backend.db.client import LazyCollection
 
 # تحميل ملف الإعدادات
 # تحديث المسار ليشير إلى المجلد الرئيسي
@@ -32,9 +40,6 @@ GOOGLE_CLIENT_ID = os.getenv('GOOGLE_CLIENT_ID')
 GOOGLE_CLIENT_SECRET = os.getenv('GOOGLE_CLIENT_SECRET')
 GOOGLE_REDIRECT_URI = os.getenv('GOOGLE_REDIRECT_URI')
 
-# إعدادات MongoDB
-MONGODB_URI = os.getenv('MONGODB_URI')
-
 # إعدادات JWT
 JWT_SECRET = os.getenv('JWT_SECRET')
 JWT_EXPIRATION = int(os.getenv('JWT_EXPIRATION', '86400'))  # تحويل إلى عدد صحيح
@@ -46,6 +51,10 @@ COOKIE_HTTPONLY = os.getenv('COOKIE_HTTPONLY', 'true').lower() == 'true'
 COOKIE_PATH = os.getenv('COOKIE_PATH', '/')
 COOKIE_MAX_AGE = int(os.getenv('COOKIE_MAX_AGE', '2592000'))  # 30 يوم افتراضياً
 
+# نسبة العمر المتبقي من التوكن التي يُعاد إصداره عندها في check-token
+# (0.5 = يُجدد التوكن فقط عندما يتبقى أقل من نصف مدة JWT_EXPIRATION)
+TOKEN_REFRESH_THRESHOLD = float(os.getenv('TOKEN_REFRESH_THRESHOLD', '0.5'))
+
 # IPinfo.io API
 IPINFO_API_TOKENS = [
     os.getenv('IPINFO_API_TOKEN_1'),
@@ -57,9 +66,13 @@ IPINFO_API_TOKENS = [
 DISCORD_API_URL = 'https://discord.com/api/v10'
 DISCORD_AUTH_URL = f'https://discord.com/oauth2/authorize?client_id={DISCORD_CLIENT_ID}&redirect_uri={DISCORD_REDIRECT_URI}&response_type=code&scope=identify%20email'
 
+DISCORD_TOKEN_URL = 'https://discord.com/api/oauth2/token'
+DISCORD_USER_URL = 'https://discord.com/api/users/@me'
+
 GOOGLE_AUTH_URL = 'https://accounts.google.com/o/oauth2/v2/auth'
 GOOGLE_TOKEN_URL = 'https://oauth2.googleapis.com/token'
 GOOGLE_USERINFO_URL = 'https://www.googleapis.com/oauth2/v3/userinfo'
+GOOGLE_USER_V1_URL = 'https://www.googleapis.com/oauth2/v1/userinfo'  # يعيد الحقل id المستخدم في google_id
 
 # إعدادات الموقع
 FRONTEND_URL = "http://localhost:5000"
@@ -68,65 +81,132 @@ FRONTEND_URL = "http://localhost:5000"
 # اتصال قاعدة البيانات
 # -----------------------------------------------------------------------------
 
-# إنشاء اتصال مع قاعدة البيانات MongoDB
-client = MongoClient(MONGODB_URI)
-db = client.get_database("elo_boost_pro")
-users_collection = db.users
-sessions_collection = db.sessions
+# مجموعات MongoDB؛ الاتصال وتجمعه يُنشآن عند أول استعلام في كل عملية (backend/db/client.py)
+# فلا يرث عمال gunicorn اتصالات العملية الرئيسية عند التحميل المسبق
+users_collection = LazyCollection('users')
+sessions_collection = LazyCollection('sessions')
+
+# تحديد الموقع الجغرافي مع ذاكرة مؤقتة وطابور إثراء خلفي
+geo_locator = GeoLocator(IPINFO_API_TOKENS)
+geo_enricher = GeoEnricher(geo_locator, lambda *args: store_user_location(*args))
 
 # -----------------------------------------------------------------------------
 # وظائف مساعدة
 # -----------------------------------------------------------------------------
 
+def get_request_ip(request):
+    """استخراج عنوان IP المستخدم من الطلب (بدون أي طلب شبكة)"""
+    if 'X-Forwarded-For' in request.headers:
+        return request.headers['X-Forwarded-For'].split(',')[0].strip()
+    return request.remote_addr
+
 def get_client_ip(request):
     """استخراج عنوان IP المستخدم من الطلب"""
-    client_ip = None
-    if 'X-Forwarded-For' in request.headers:
-        client_ip = request.headers['X-Forwarded-For'].split(',')[0].strip()
-    else:
-        client_ip = request.remote_addr
-    
-    # إذا كان العنوان هو localhost (127.0.0.1)، استخدم خدمة خارجية
-    if client_ip == '127.0.0.1' or client_ip == 'localhost':
-        try:
-            # استخدام خدمة خارجية للحصول على IP العام
-            response = requests.get('https://api.ipify.org?format=json', timeout=5)
-            if response.status_code == 200:
-                return response.json()['ip']
-        except Exception as e:
-            print(f"Error getting public IP: {str(e)}")
-    
-    return client_ip
+    # إذا كان العنوان هو localhost، يتم استخدام العنوان العام للخادم (مخزن مؤقتًا)
+    return geo_locator.resolve_public_ip(get_request_ip(request))
 
 def get_ip_info(ip_address):
-    """الحصول على معلومات الموقع الجغرافي من عنوان IP"""
-    token = random.choice(IPINFO_API_TOKENS)
+    """الحصول على معلومات الموقع الجغرافي من عنوان IP (مع الذاكرة المؤقتة)"""
+    return geo_locator.lookup(ip_address)
+
+def store_user_location(user_id, ip_address, ip_info):
+    """حفظ معلومات الموقع في مستند المستخدم (يُستدعى من طابور الإثراء الخلفي)"""
+    with span('mongo.users.update_one'):
+        users_collection.update_one(
+            {"_id": ObjectId(user_id)},
+            {"$set": {"ip_address": ip_address, "ip_info": ip_info}}
+        )
+    invalidate_user(user_id)
+
+def enrich_user_location(user_id, ip_address):
+    """جدولة تحديث الموقع الجغرافي للمستخدم في الخلفية بدلاً من حجب تسجيل الدخول"""
+    if not geo_enricher.enqueue(user_id, ip_address):
+        print(f"[GEO] Enrichment queue full, skipping user {user_id}")
+
+def take_prefetched_location(geo_future):
+    """إرجاع نتيجة البحث المسبق إذا انتهت بالفعل (دون انتظار)، وإلا None"""
+    if geo_future is None or not geo_future.done():
+        return None
+    try:
+        public_ip, ip_info = geo_future.result()
+    except Exception:
+        return None
+    if not ip_info or 'error' in ip_info:
+        return None
+    return public_ip, ip_info
+
+def upsert_oauth_user(provider_field, provider_id, set_fields, insert_fields):
+    """
+    إنشاء المستخدم أو تحديثه بعملية واحدة (find_one_and_update مع upsert)
+    بدلاً من البحث ثم الكتابة، مما يمنع أيضًا إنشاء مستخدمين مكررين عند التزامن
+    
+    Returns:
+        tuple: (مستند المستخدم بعد التحديث، هل هو مستخدم جديد)
+    """
+    now = datetime.datetime.utcnow()
+    set_fields = dict(set_fields, last_login=now)
+    insert_fields = {key: value for key, value in insert_fields.items() if key not in set_fields}
+    insert_fields.update(created_at=now, is_owner=False, is_booster=False)
+    
+    with span('mongo.users.find_one_and_update'):
+        user = users_collection.find_one_and_update(
+            {provider_field: provider_id},
+            {"$set": set_fields, "$setOnInsert": insert_fields},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+    # إبطال نسخة المستخدم المخزنة مؤقتًا بعد التحديث
+    invalidate_user(user["_id"])
     
+    # المستخدم الجديد يكون وقت إنشائه مساويًا لوقت آخر دخول
+    is_new = user.get("created_at") == user.get("last_login")
+    return user, is_new
+
+def store_prefetched_location(user_id, client_ip, geo_future):
+    """حفظ نتيجة البحث المسبق عند اكتماله، أو تحويل المهمة إلى طابور الإثراء عند فشله"""
     try:
-        response = requests.get(f"https://ipinfo.io/{ip_address}?token={token}")
-        
-        if response.status_code == 200:
-            data = response.json()
-            return {
-                'ip': data.get('ip', ''),
-                'city': data.get('city', ''),
-                'region': data.get('region', ''),
-                'country': data.get('country', ''),
-                'loc': data.get('loc', ''),
-                'org': data.get('org', ''),
-                'postal': data.get('postal', ''),
-                'timezone': data.get('timezone', '')
-            }
-        return {'ip': ip_address, 'error': f"API request failed with status code {response.status_code}"}
+        public_ip, ip_info = geo_future.result()
+        store_user_location(user_id, public_ip, ip_info)
     except Exception as e:
-        return {'ip': ip_address, 'error': str(e)}
+        print(f"[GEO] Prefetch failed for user {user_id}: {str(e)}")
+        enrich_user_location(user_id, client_ip)
+
+def finish_oauth_login(user, client_ip, geo_future, location_saved):
+    """الخطوات المشتركة بعد حفظ المستخدم: الحالة، الموقع، التوكن والكوكيز"""
+    user_id = str(user["_id"])
+    
+    # تحديث حالة المستخدم كمتصل
+    update_user_status(user_id, True)
+    
+    # إذا لم يُحفظ الموقع مع المستخدم، يُحفظ عند اكتمال البحث دون انتظاره هنا
+    if not location_saved:
+        geo_future.add_done_callback(
+            lambda future: store_prefetched_location(user_id, client_ip, future)
+        )
+    
+    # إنشاء رمز JWT بما في ذلك الصورة
+    token = generate_token(
+        user_id,
+        username=user.get("username"),
+        email=user.get("email"),
+        is_owner=user.get("is_owner", False),
+        is_booster=user.get("is_booster", False),
+        avatar=user.get("avatar")
+    )
+    
+    # تحديد مسار إعادة التوجيه بشكل صحيح
+    redirect_url = request.cookies.get('redirect_after_login', '/')
+    resp = redirect(redirect_url)
+    set_auth_cookies(resp, token, 60*60*24*30)  # صالح لمدة 30 يوم
+    return resp
 
 def generate_token(user_id, username=None, email=None, is_owner=False, is_booster=False, avatar=None):
     """توليد توكن JWT للمستخدم مع جميع المعلومات المطلوبة"""
     # إذا كانت المعلومات الإضافية غير موجودة، ابحث عنها في قاعدة البيانات
     if username is None or email is None:
         try:
-            user = users_collection.find_one({"_id": ObjectId(user_id)})
+            with span('mongo.users.find_one'):
+                user = users_collection.find_one({"_id": ObjectId(user_id)})
             if user:
                 username = user.get('username', 'User')
                 email = user.get('email', '')
@@ -152,7 +232,7 @@ def generate_token(user_id, username=None, email=None, is_owner=False, is_booste
 def decode_token(token):
     """فك تشفير توكن JWT"""
     try:
-        payload = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        payload = decode_token_cached(token, JWT_SECRET)
         return payload
     except:
         return None
@@ -161,23 +241,15 @@ def token_required(f):
     """ديكوريتور للتحقق من صحة التوكن"""
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
-        if 'Authorization' in request.headers:
-            token = request.headers['Authorization'].split()[1]
-        elif 'auth_token' in request.cookies:
-            token = request.cookies.get('auth_token')
-            
-        if not token:
+        # هوية صاحب الطلب محسوبة مرة واحدة (مع تحديث حالة الاتصال) في وحدة الأمان
+        principal = get_principal()
+        if not principal.token:
             return jsonify({'message': 'Token is missing!'}), 401
             
-        user_data = verify_auth_token(token)
-        if not user_data:
+        if not principal.is_authenticated:
             return jsonify({'message': 'Invalid or expired token!'}), 401
-            
-        # تحديث حالة المستخدم كمتصل
-        update_user_status(user_data.get('user_id'), True)
         
-        g.user = user_data
+        g.user = principal.payload
         return f(*args, **kwargs)
         
     return decorated
@@ -201,6 +273,24 @@ def set_auth_cookies(response, token, max_age=JWT_EXPIRATION):
     )
     return response
 
+def token_needs_refresh(payload):
+    """التحقق مما إذا كان التوكن قريبًا من انتهاء صلاحيته ويجب تجديده"""
+    exp = payload.get('exp')
+    if not isinstance(exp, (int, float)):
+        return True
+    return exp - time.time() < JWT_EXPIRATION * TOKEN_REFRESH_THRESHOLD
+
+def refresh_auth_cookie_if_needed(response, payload, user_id, **claims):
+    """إعادة إصدار التوكن والكوكي فقط عند اقتراب انتهاء صلاحية التوكن الحالي"""
+    if not token_needs_refresh(payload):
+        record_token_refresh(False)
+        return response
+    
+    new_token = generate_token(user_id, **claims)
+    set_auth_cookies(response, new_token, COOKIE_MAX_AGE)
+    record_token_refresh(True)
+    return response
+
 # -----------------------------------------------------------------------------
 # وظائف مساعدة للتعامل مع OAuth
 # -----------------------------------------------------------------------------
@@ -216,7 +306,7 @@ def exchange_code_for_discord_token(code):
     }
     
     try:
-        response = requests.post('https://discord.com/api/oauth2/token', data=token_data)
+        response = http_client.post('discord', DISCORD_TOKEN_URL, data=token_data)
         if response.status_code == 200:
             return response.json()
         print(f"Discord token exchange error: {response.status_code}, {response.text}")
@@ -230,7 +320,7 @@ def get_discord_user(access_token):
     headers = {'Authorization': f'Bearer {access_token}'}
     
     try:
-        response = requests.get('https://discord.com/api/users/@me', headers=headers)
+        response = http_client.get('discord', DISCORD_USER_URL, headers=headers)
         if response.status_code == 200:
             return response.json()
         print(f"Discord user info error: {response.status_code}, {response.text}")
@@ -250,7 +340,7 @@ def exchange_code_for_google_token(code):
     }
     
     try:
-        response = requests.post('https://oauth2.googleapis.com/token', data=token_data)
+        response = http_client.post('google', GOOGLE_TOKEN_URL, data=token_data)
         if response.status_code == 200:
             return response.json()
         print(f"Google token exchange error: {response.status_code}, {response.text}")
@@ -264,7 +354,7 @@ def get_google_user(access_token):
     headers = {'Authorization': f'Bearer {access_token}'}
     
     try:
-        response = requests.get('https://www.googleapis.com/oauth2/v1/userinfo', headers=headers)
+        response = http_client.get('google', GOOGLE_USER_V1_URL, headers=headers)
         if response.status_code == 200:
             return response.json()
         print(f"Google user info error: {response.status_code}, {response.text}")
@@ -295,6 +385,10 @@ def discord_callback():
     if not code:
         return "Authorization code not provided", 400
 
+    # بدء البحث عن الموقع الجغرافي بالتوازي مع تبادل الكود
+    client_ip = get_request_ip(request)
+    geo_future = geo_locator.prefetch(client_ip)
+
     # إستبدال الكود برمز وصول
     token_data = exchange_code_for_discord_token(code)
     if not token_data:
@@ -307,7 +401,6 @@ def discord_callback():
 
     print(f"[DISCORD AUTH] User data from Discord: {user_data}")
 
-    # التحقق من وجود المستخدم في قاعدة البيانات أو إنشاء مستخدم جديد
     discord_id = user_data['id']
     
     # بناء رابط صورة المستخدم في Discord
@@ -317,79 +410,32 @@ def discord_callback():
         avatar_url = f"https://cdn.discordapp.com/avatars/{discord_id}/{user_data['avatar']}.webp"
         print(f"[DISCORD AUTH] Avatar URL: {avatar_url}")
     
-    existing_user = users_collection.find_one({"discord_id": discord_id})
-
-    if existing_user:
-        # تحديث بيانات المستخدم
-        update_data = {
-            "discord_name": user_data['username'],
-            "last_login": datetime.datetime.utcnow(),
-            "ip_address": get_client_ip(request),
-            "ip_info": get_ip_info(get_client_ip(request)),
-            "auth_provider": "discord"
-        }
-        
-        # تحديث صورة المستخدم فقط إذا كان هناك صورة جديدة
-        if avatar_url:
-            update_data["avatar"] = avatar_url
-            
-        users_collection.update_one(
-            {"_id": existing_user["_id"]},
-            {"$set": update_data}
-        )
-        
-        user_id = str(existing_user["_id"])
-        username = existing_user.get("username")
-        email = existing_user.get("email")
-        is_owner = existing_user.get("is_owner", False)
-        is_booster = existing_user.get("is_booster", False)
-        avatar = avatar_url or existing_user.get("avatar")
-        
-        print(f"[DISCORD AUTH] Updated user: {username}, avatar: {avatar}")
-    else:
-        # إنشاء مستخدم جديد
-        new_user = {
-            "discord_id": discord_id,
-            "discord_name": user_data['username'],
-            "username": user_data['username'],
-            "email": user_data.get('email', ''),
-            "avatar": avatar_url,
-            "created_at": datetime.datetime.utcnow(),
-            "last_login": datetime.datetime.utcnow(),
-            "ip_address": get_client_ip(request),
-            "ip_info": get_ip_info(get_client_ip(request)),
-            "auth_provider": "discord",
-            "is_owner": False,  # قيمة افتراضية للمستخدم الجديد
-            "is_booster": False  # قيمة افتراضية للمستخدم الجديد
-        }
-        result = users_collection.insert_one(new_user)
-        user_id = str(result.inserted_id)
-        username = user_data['username']
-        email = user_data.get('email', '')
-        is_owner = False
-        is_booster = False
-        avatar = avatar_url
-        
-        print(f"[DISCORD AUTH] Created new user: {username}, avatar: {avatar}")
-
-    # تحديث حالة المستخدم كمتصل
-    update_user_status(user_id, True)
-
-    # إنشاء رمز JWT بما في ذلك الصورة
-    token = generate_token(
-        user_id, 
-        username=username,
-        email=email,
-        is_owner=is_owner,
-        is_booster=is_booster,
-        avatar=avatar
-    )
+    set_fields = {
+        "discord_name": user_data['username'],
+        "ip_address": client_ip,
+        "auth_provider": "discord"
+    }
+    # تحديث صورة المستخدم فقط إذا كان هناك صورة جديدة
+    if avatar_url:
+        set_fields["avatar"] = avatar_url
+    
+    # إضافة الموقع في نفس عملية الكتابة إذا كان البحث المسبق قد انتهى
+    location = take_prefetched_location(geo_future)
+    if location:
+        set_fields["ip_address"], set_fields["ip_info"] = location
+    
+    # إنشاء المستخدم أو تحديثه بعملية واحدة
+    user, is_new = upsert_oauth_user("discord_id", discord_id, set_fields, {
+        "username": user_data['username'],
+        "email": user_data.get('email', ''),
+        "avatar": avatar_url,
+        "ip_info": None  # يتم تحديثها في الخلفية
+    })
+    
+    action = "Created new" if is_new else "Updated"
+    print(f"[DISCORD AUTH] {action} user: {user.get('username')}, avatar: {user.get('avatar')}")
 
-    # تحديد مسار إعادة التوجيه بشكل صحيح
-    redirect_url = request.cookies.get('redirect_after_login', '/')
-    resp = redirect(redirect_url)
-    set_auth_cookies(resp, token, 60*60*24*30)  # صالح لمدة 30 يوم
-    return resp
+    return finish_oauth_login(user, client_ip, geo_future, location_saved=bool(location))
 
 # -----------------------------------------------------------------------------
 # مسارات Google
@@ -420,6 +466,10 @@ def google_callback():
     if not code:
         return "Authorization code not provided", 400
 
+    # بدء البحث عن الموقع الجغرافي بالتوازي مع تبادل الكود
+    client_ip = get_request_ip(request)
+    geo_future = geo_locator.prefetch(client_ip)
+
     # إستبدال الكود برمز وصول
     token_data = exchange_code_for_google_token(code)
     if not token_data:
@@ -432,86 +482,38 @@ def google_callback():
 
     print(f"[GOOGLE AUTH] User data from Google: {user_data}")
 
-    # التحقق من وجود المستخدم في قاعدة البيانات أو إنشاء مستخدم جديد
     google_id = user_data['id']
     
     # استخدام صورة المستخدم من Google
     avatar_url = user_data.get('picture')
     print(f"[GOOGLE AUTH] Avatar URL: {avatar_url}")
     
-    existing_user = users_collection.find_one({"google_id": google_id})
-
-    if existing_user:
-        # تحديث بيانات المستخدم
-        update_data = {
-            "google_name": user_data['name'],
-            "last_login": datetime.datetime.utcnow(),
-            "ip_address": get_client_ip(request),
-            "ip_info": get_ip_info(get_client_ip(request)),
-            "auth_provider": "google"
-        }
-        
-        # تحديث صورة المستخدم فقط إذا كان هناك صورة جديدة
-        if avatar_url:
-            update_data["avatar"] = avatar_url
-            
-        users_collection.update_one(
-            {"_id": existing_user["_id"]},
-            {"$set": update_data}
-        )
-        
-        user_id = str(existing_user["_id"])
-        username = existing_user.get("username")
-        email = existing_user.get("email")
-        is_owner = existing_user.get("is_owner", False)
-        is_booster = existing_user.get("is_booster", False)
-        avatar = avatar_url or existing_user.get("avatar")
-        
-        print(f"[GOOGLE AUTH] Updated user: {username}, avatar: {avatar}")
-    else:
-        # إنشاء مستخدم جديد
-        new_user = {
-            "google_id": google_id,
-            "google_name": user_data['name'],
-            "username": user_data['name'],
-            "email": user_data.get('email', ''),
-            "avatar": avatar_url,
-            "created_at": datetime.datetime.utcnow(),
-            "last_login": datetime.datetime.utcnow(),
-            "ip_address": get_client_ip(request),
-            "ip_info": get_ip_info(get_client_ip(request)),
-            "auth_provider": "google",
-            "is_owner": False,  # قيمة افتراضية للمستخدم الجديد
-            "is_booster": False  # قيمة افتراضية للمستخدم الجديد
-        }
-        result = users_collection.insert_one(new_user)
-        user_id = str(result.inserted_id)
-        username = user_data['name']
-        email = user_data.get('email', '')
-        is_owner = False
-        is_booster = False
-        avatar = avatar_url
-        
-        print(f"[GOOGLE AUTH] Created new user: {username}, avatar: {avatar}")
-
-    # تحديث حالة المستخدم كمتصل
-    update_user_status(user_id, True)
-
-    # إنشاء رمز JWT بما في ذلك الصورة
-    token = generate_token(
-        user_id, 
-        username=username,
-        email=email,
-        is_owner=is_owner,
-        is_booster=is_booster,
-        avatar=avatar
-    )
+    set_fields = {
+        "google_name": user_data['name'],
+        "ip_address": client_ip,
+        "auth_provider": "google"
+    }
+    # تحديث صورة المستخدم فقط إذا كان هناك صورة جديدة
+    if avatar_url:
+        set_fields["avatar"] = avatar_url
+    
+    # إضافة الموقع في نفس عملية الكتابة إذا كان البحث المسبق قد انتهى
+    location = take_prefetched_location(geo_future)
+    if location:
+        set_fields["ip_address"], set_fields["ip_info"] = location
+    
+    # إنشاء المستخدم أو تحديثه بعملية واحدة
+    user, is_new = upsert_oauth_user("google_id", google_id, set_fields, {
+        "username": user_data['name'],
+        "email": user_data.get('email', ''),
+        "avatar": avatar_url,
+        "ip_info": None  # يتم تحديثها في الخلفية
+    })
+    
+    action = "Created new" if is_new else "Updated"
+    print(f"[GOOGLE AUTH] {action} user: {user.get('username')}, avatar: {user.get('avatar')}")
 
-    # تحديد مسار إعادة التوجيه بشكل صحيح
-    redirect_url = request.cookies.get('redirect_after_login', '/')
-    resp = redirect(redirect_url)
-    set_auth_cookies(resp, token, 60*60*24*30)  # صالح لمدة 30 يوم
-    return resp
+    return finish_oauth_login(user, client_ip, geo_future, location_saved=bool(location))
 
 # -----------------------------------------------------------------------------
 # مسارات المستخدم
@@ -561,14 +563,9 @@ def check_token():
         response.headers.add('Access-Control-Max-Age', '86400')
         return response
         
-    token = request.cookies.get('auth_token')
-    # أيضًا فحص التوكن من هيدر Authorization
-    if not token and 'Authorization' in request.headers:
-        auth_header = request.headers.get('Authorization')
-        if auth_header and auth_header.startswith('Bearer '):
-            token = auth_header.split('Bearer ')[1]
-            
-    if not token:
+    # التحقق من التوكن وجلب المستخدم يتمان مرة واحدة لكل طلب في وحدة الأمان
+    principal = get_principal()
+    if not principal.token:
         print("[AUTH] No token provided in request")
         return jsonify({
             'isAuthenticated': False, 
@@ -576,120 +573,86 @@ def check_token():
             'message': 'No token provided'
         }), 401
 
-    try:
-        user_data = verify_auth_token(token)
-        
-        # التحقق من أن البيانات غير فارغة
-        if user_data is None:
-            print("[AUTH] Invalid or expired token")
-            return jsonify({
-                'isAuthenticated': False,
-                'valid': False, 
-                'message': 'Invalid or expired token'
-            }), 401
-            
-        # تحديث حالة المستخدم
-        user_id = user_data.get('user_id') or user_data.get('sub')
-        if user_id:
-            update_user_status(user_id)
-            
-            # البحث عن المستخدم في قاعدة البيانات للحصول على بيانات إضافية
-            try:
-                user_obj = users_collection.find_one({"_id": ObjectId(user_id)})
-                
-                if user_obj:
-                    # التأكد من وجود صورة المستخدم وإضافتها
-                    avatar = user_obj.get('avatar', '')
-                    print(f"[AUTH] User avatar: {avatar}")
-                    
-                    # إعداد استجابة كاملة بجميع بيانات المستخدم المطلوبة
-                    response_data = {
-                        'isAuthenticated': True,
-                        'valid': True,
-                        'user': {
-                            'id': str(user_id),
-                            'username': user_obj.get('username', user_data.get('username', '')),
-                            'email': user_obj.get('email', user_data.get('email', '')),
-                            'avatar': avatar,
-                            'auth_provider': user_obj.get('auth_provider', 'unknown'),
-                            'is_owner': user_obj.get('is_owner', user_data.get('is_owner', False)),
-                            'is_booster': user_obj.get('is_booster', user_data.get('is_booster', False)),
-                            'online': True
-                        }
-                    }
-                    
-                    print(f"[AUTH] Sending user data: {response_data}")
-                    
-                    # إنشاء توكن جديد لتجديد مدة الصلاحية
-                    new_token = generate_token(user_id)
-                    
-                    # إعداد الاستجابة مع الكوكيز المحدثة
-                    response = jsonify(response_data)
-                    set_auth_cookies(response, new_token, COOKIE_MAX_AGE)
-                    return response
-            except Exception as e:
-                print(f"[AUTH] Error finding user data: {str(e)}")
-        
-        # استجابة بسيطة في حالة عدم وجود بيانات إضافية
-        print("[AUTH] Fallback user data from token")
-        response_data = {
-            'isAuthenticated': True,
-            'valid': True,
-            'user': {
-                'id': str(user_id) if user_id else '',
-                'username': user_data.get('username', ''),
-                'email': user_data.get('email', ''),
-                'avatar': user_data.get('avatar', ''), # التأكد من تضمين الصورة من التوكن أيضًا
-                'is_owner': user_data.get('is_owner', False),
-                'is_booster': user_data.get('is_booster', False)
-            }
-        }
-        
-        # تجديد التوكن
-        if user_id:
-            new_token = generate_token(user_id)
-            response = jsonify(response_data)
-            set_auth_cookies(response, new_token, COOKIE_MAX_AGE)
-            return response
-            
-        return jsonify(response_data)
-    except Exception as e:
-        # تسجيل الخطأ وإعادة استجابة الفشل
-        print(f"[AUTH] Auth check error: {str(e)}")
+    if not principal.is_authenticated:
+        print(f"[AUTH] Auth check error: {principal.error}")
         return jsonify({
-            'isAuthenticated': False, 
+            'isAuthenticated': False,
             'valid': False, 
-            'message': f'Authentication failed: {str(e)}'
+            'message': f'Authentication failed: {principal.error}'
         }), 401
 
-# مجموعة للاحتفاظ بقائمة المستخدمين المتصلين حاليًا
-ONLINE_USERS = {}  # {"user_id": {"last_active": timestamp}}
+    user_data = principal.payload
+    user_obj = principal.user
+    user_id = principal.user_id
+    
+    # التأكد من وجود صورة المستخدم وإضافتها
+    avatar = user_obj.get('avatar', '')
+    print(f"[AUTH] User avatar: {avatar}")
+    
+    # إعداد استجابة كاملة بجميع بيانات المستخدم المطلوبة
+    response_data = {
+        'isAuthenticated': True,
+        'valid': True,
+        'user': {
+            'id': user_id,
+            'username': user_obj.get('username', user_data.get('username', '')),
+            'email': user_obj.get('email', user_data.get('email', '')),
+            'avatar': avatar,
+            'auth_provider': user_obj.get('auth_provider', 'unknown'),
+            'is_owner': user_obj.get('is_owner', user_data.get('is_owner', False)),
+            'is_booster': user_obj.get('is_booster', user_data.get('is_booster', False)),
+            'online': True
+        }
+    }
+    
+    print(f"[AUTH] Sending user data: {response_data}")
+    
+    # تجديد التوكن فقط عند اقتراب انتهاء صلاحيته، باستخدام المستند الذي تم جلبه
+    response = jsonify(response_data)
+    user_info = response_data['user']
+    refresh_auth_cookie_if_needed(
+        response,
+        user_data,
+        user_id,
+        username=user_info['username'],
+        email=user_info['email'],
+        is_owner=user_info['is_owner'],
+        is_booster=user_info['is_booster'],
+        avatar=avatar
+    )
+    return response
+
+# مخزن حالة الاتصال (داخل العملية أو مشترك بين العمليات حسب PRESENCE_BACKEND)
+presence_store = create_presence_store()
 
 def update_user_status(user_id, status=True):
     """تحديث حالة المستخدم (متصل/غير متصل)
     status=True للمتصل، status=False لغير المتصل"""
+    if not user_id:
+        return False
     if status:
-        ONLINE_USERS[str(user_id)] = {"last_active": time.time()}
-    elif str(user_id) in ONLINE_USERS:
-        del ONLINE_USERS[str(user_id)]
+        # نشر الحدث فقط عند الكتابة الفعلية (الكتابات المتقاربة يتم دمجها)
+        if presence_store.touch(user_id):
+            publish_event('presence', {
+                'user_id': str(user_id),
+                'online': True,
+                'last_active': time.time(),
+                'timeout': presence_store.timeout
+            })
+    else:
+        presence_store.remove(user_id)
+        publish_event('presence', {'user_id': str(user_id), 'online': False})
     return True
 
 def is_user_online(user_id):
     """التحقق ما إذا كان المستخدم متصلاً حاليًا"""
-    user_id = str(user_id)
-    if user_id in ONLINE_USERS:
-        # اعتبر المستخدم غير متصل إذا كان آخر نشاط له منذ أكثر من 5 دقائق
-        if time.time() - ONLINE_USERS[user_id]["last_active"] > 300:  # 5 دقائق
-            del ONLINE_USERS[user_id]
-            return False
-        return True
-    return False
+    return presence_store.is_online(user_id)
 
 # تعديل وظيفة verify_auth_token لتحديث حالة المستخدم
 def verify_auth_token(token):
     """التحقق من صحة رمز المصادقة JWT"""
     try:
-        data = jwt.decode(token, JWT_SECRET, algorithms=['HS256'])
+        data = decode_token_cached(token, JWT_SECRET)
         
         # تحديث حالة المستخدم كمتصل
         update_user_status(data.get('user_id'), True)
@@ -712,29 +675,69 @@ def user_status(user_id):
         "timestamp": datetime.datetime.now().isoformat()
     })
 
+# الحد الأقصى لعدد المستخدمين في طلب حالة جماعي واحد
+MAX_STATUS_BATCH = 500
+
+@auth_bp.route('/status', methods=['GET', 'POST'])
+def users_status():
+    """الحصول على حالة مجموعة من المستخدمين في طلب واحد
+    GET /api/auth/status?ids=1,2,3 أو POST {"user_ids": [...]}"""
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        user_ids = body.get('user_ids') or body.get('ids') or []
+    else:
+        user_ids = [uid for uid in request.args.get('ids', '').split(',') if uid]
+    
+    if not isinstance(user_ids, list):
+        return jsonify({"error": "user_ids must be a list"}), 400
+    # إزالة التكرار مع الحفاظ على الترتيب
+    user_ids = list(dict.fromkeys(str(uid) for uid in user_ids))
+    if len(user_ids) > MAX_STATUS_BATCH:
+        return jsonify({"error": f"Too many user ids (max {MAX_STATUS_BATCH})"}), 400
+    
+    last_active = presence_store.last_active_many(user_ids)
+    statuses = {
+        user_id: {
+            "online": last is not None,
+            "last_active": datetime.datetime.utcfromtimestamp(last).isoformat() + 'Z' if last else None
+        }
+        for user_id, last in last_active.items()
+    }
+    
+    # ETag مبني على حالة الاتصال فقط حتى يعيد العميل 304 إذا لم يتغير شيء
+    etag = hashlib.sha1(
+        json.dumps(statuses, sort_keys=True).encode('utf-8')
+    ).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = make_response('', 304)
+        response.set_etag(etag)
+        return response
+    
+    response = jsonify({
+        "statuses": statuses,
+        "timestamp": datetime.datetime.now().isoformat()
+    })
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @auth_bp.route('/me', methods=['GET'])
 @token_required
 def get_user_profile():
     """الحصول على معلومات المستخدم الحالي"""
-    user_id = g.user.get('user_id')
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
+    # المستخدم تم جلبه مرة واحدة أثناء التحقق من التوكن
+    user = dict(get_principal().user)
     
-    if user:
-        # تحديث وقت آخر نشاط
-        update_user_status(user_id, True)
-        
-        # تحويل _id من ObjectId إلى سلسلة نصية
-        user['_id'] = str(user['_id'])
-        # إزالة كلمة المرور من البيانات المُرجعة إن وجدت
-        if 'password' in user:
-            del user['password']
-        
-        # إضافة حالة الاتصال
-        user['online'] = True
-        
-        return jsonify(user)
+    # تحويل _id من ObjectId إلى سلسلة نصية
+    user['_id'] = str(user['_id'])
+    # إزالة كلمة المرور من البيانات المُرجعة إن وجدت
+    if 'password' in user:
+        del user['password']
+    
+    # إضافة حالة الاتصال
+    user['online'] = True
     
-    return jsonify({"error": "User not found"}), 404
+    return jsonify(user)
 
 # إعدادات جلسة المستخدم
 SESSION_TIMEOUT = int(os.getenv('SESSION_TIMEOUT', '300'))  # وقت انتهاء الجلسة بالثواني (5 دقائق افتراضياً)
@@ -0,0 +1,344 @@
+"""
+تحديد الموقع الجغرافي من عنوان IP خارج المسار الحرج لتسجيل الدخول
+
+- ذاكرة مؤقتة مفتاحها عنوان IP مع انتهاء صلاحية، وتخزين سلبي قصير للأخطاء
+- توزيع الطلبات على مفاتيح IPINFO_API_TOKENS مع حساب الاستهلاك لكل مفتاح
+- طابور خلفي محدود الحجم يثري مستند المستخدم لاحقًا بدلاً من حجب الاستجابة
+- جميع الطلبات تمر عبر العميل المشترك backend.http_client
+
+عناوين الخدمات قابلة للتغيير (IPINFO_API_URL و PUBLIC_IP_API_URL) لاختبارها مقابل خادم محلي.
+"""
+import os
+import time
+import queue
+import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from backend.http_client import http_client
+
+IPINFO_API_URL = os.getenv('IPINFO_API_URL', 'https://ipinfo.io')
+PUBLIC_IP_API_URL = os.getenv('PUBLIC_IP_API_URL', 'https://api.ipify.org?format=json')
+# مهلة الاتصال والقراءة لخدمات تحديد الموقع (بالثواني)
+GEO_HTTP_TIMEOUT = float(os.getenv('GEO_HTTP_TIMEOUT', '3'))
+# مدة صلاحية النتائج الناجحة والفاشلة في الذاكرة
+GEO_CACHE_TTL = int(os.getenv('GEO_CACHE_TTL', '86400'))
+GEO_NEGATIVE_CACHE_TTL = int(os.getenv('GEO_NEGATIVE_CACHE_TTL', '300'))
+GEO_CACHE_MAX_SIZE = int(os.getenv('GEO_CACHE_MAX_SIZE', '50000'))
+# الحد اليومي لكل مفتاح (0 = بدون حد)
+IPINFO_TOKEN_DAILY_LIMIT = int(os.getenv('IPINFO_TOKEN_DAILY_LIMIT', '1600'))
+# سعة طابور الإثراء الخلفي
+GEO_QUEUE_SIZE = int(os.getenv('GEO_QUEUE_SIZE', '1000'))
+# قاعدة بيانات GeoIP محلية (CSV أو idx أو mmdb)، والرجوع إلى ipinfo للنطاقات غير الموجودة
+GEOIP_DB_PATH = os.getenv('GEOIP_DB_PATH', '')
+GEOIP_REMOTE_FALLBACK = os.getenv('GEOIP_REMOTE_FALLBACK', 'true').lower() == 'true'
+# عدد الخيوط المخصصة للبحث المسبق أثناء معالجة ردود OAuth
+GEO_PREFETCH_WORKERS = int(os.getenv('GEO_PREFETCH_WORKERS', '4'))
+
+LOCAL_ADDRESSES = ('127.0.0.1', 'localhost', '::1')
+
+
+class GeoCache:
+    """ذاكرة LRU لنتائج تحديد الموقع مع مدة صلاحية مختلفة للنجاح والفشل"""
+
+    def __init__(self, ttl=GEO_CACHE_TTL, negative_ttl=GEO_NEGATIVE_CACHE_TTL, max_size=GEO_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # {ip: (expires_at, info)}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def get(self, ip_address):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(ip_address)
+            if entry is None:
+                self.misses += 1
+                return None
+            if entry[0] <= now:
+                del self._entries[ip_address]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(ip_address)
+            if 'error' in entry[1]:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return dict(entry[1])
+
+    def put(self, ip_address, info):
+        ttl = self.negative_ttl if 'error' in info else self.ttl
+        with self._lock:
+            self._entries[ip_address] = (time.monotonic() + ttl, info)
+            self._entries.move_to_end(ip_address)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            size = len(self._entries)
+        return {
+            'size': size,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+        }
+
+
+class TokenPool:
+    """توزيع الطلبات على مفاتيح ipinfo مع حساب الاستهلاك اليومي لكل مفتاح"""
+
+    def __init__(self, tokens, daily_limit=IPINFO_TOKEN_DAILY_LIMIT):
+        self.tokens = [token for token in tokens if token]
+        self.daily_limit = daily_limit
+        self._lock = threading.Lock()
+        self._window = self._current_window()
+        self._usage = {token: {'requests': 0, 'failures': 0, 'rate_limited': False} for token in self.tokens}
+
+    @staticmethod
+    def _current_window():
+        return int(time.time() // 86400)
+
+    def _reset_if_new_window(self):
+        window = self._current_window()
+        if window != self._window:
+            self._window = window
+            for usage in self._usage.values():
+                usage.update(requests=0, failures=0, rate_limited=False)
+
+    def acquire(self):
+        """اختيار المفتاح الأقل استهلاكًا والمتاح؛ يعيد None إذا استُنفدت جميع المفاتيح"""
+        with self._lock:
+            self._reset_if_new_window()
+            available = [
+                token for token in self.tokens
+                if not self._usage[token]['rate_limited']
+                and (not self.daily_limit or self._usage[token]['requests'] < self.daily_limit)
+            ]
+            if not available:
+                return None
+            least = min(self._usage[token]['requests'] for token in available)
+            token = random.choice([t for t in available if self._usage[t]['requests'] == least])
+            self._usage[token]['requests'] += 1
+            return token
+
+    def report(self, token, status_code):
+        """تسجيل نتيجة الطلب؛ الحالة 429 توقف المفتاح حتى نهاية اليوم"""
+        with self._lock:
+            usage = self._usage.get(token)
+            if usage is None:
+                return
+            if status_code != 200:
+                usage['failures'] += 1
+            if status_code == 429:
+                usage['rate_limited'] = True
+
+    def stats(self):
+        with self._lock:
+            self._reset_if_new_window()
+            # لا نعرض المفاتيح نفسها، فقط آخر أربعة أحرف
+            return {f"...{token[-4:]}": dict(usage) for token, usage in self._usage.items()}
+
+
+class GeoLocator:
+    """البحث عن معلومات IP مع الذاكرة المؤقتة وتوزيع المفاتيح"""
+
+    def __init__(self, tokens, cache=None, api_url=IPINFO_API_URL,
+                 public_ip_url=PUBLIC_IP_API_URL, timeout=GEO_HTTP_TIMEOUT,
+                 db_path=GEOIP_DB_PATH, remote_fallback=GEOIP_REMOTE_FALLBACK):
+        self.offline_db = self._open_offline_db(db_path)
+        self.remote_fallback = remote_fallback
+        self.offline_hits = 0
+        self.cache = cache or GeoCache()
+        self.tokens = TokenPool(tokens)
+        self.api_url = api_url.rstrip('/')
+        self.public_ip_url = public_ip_url
+        self.timeout = timeout
+        self._public_ip = None
+        self._public_ip_checked_at = 0.0
+        self._executor = None
+        self._executor_pid = None
+        self._executor_lock = threading.Lock()
+
+    @staticmethod
+    def _open_offline_db(db_path):
+        if not db_path:
+            return None
+        try:
+            from .geoip_db import open_geoip_database
+            return open_geoip_database(db_path)
+        except Exception as e:
+            print(f"Error loading GeoIP database {db_path}: {e}. Using remote API only")
+            return None
+
+    def resolve_public_ip(self, ip_address):
+        """استبدال عنوان localhost بالعنوان العام للخادم (مع تخزينه لمدة ساعة)"""
+        if ip_address not in LOCAL_ADDRESSES:
+            return ip_address
+        now = time.monotonic()
+        if self._public_ip and now - self._public_ip_checked_at < 3600:
+            return self._public_ip
+        try:
+            response = http_client.get('ipify', self.public_ip_url, timeout=self.timeout)
+            if response.status_code == 200:
+                self._public_ip = response.json()['ip']
+                self._public_ip_checked_at = now
+                return self._public_ip
+        except Exception as e:
+            print(f"Error getting public IP: {str(e)}")
+        return ip_address
+
+    def cached(self, ip_address):
+        """إرجاع النتيجة من القاعدة المحلية أو الذاكرة فقط دون أي طلب شبكة"""
+        if self.offline_db is not None:
+            info = self.offline_db.lookup(ip_address)
+            if info is not None:
+                self.offline_hits += 1
+                return info
+        return self.cache.get(ip_address)
+
+    def lookup(self, ip_address):
+        """الحصول على معلومات الموقع الجغرافي لعنوان IP"""
+        info = self.cached(ip_address)
+        if info is not None:
+            return info
+
+        if self.offline_db is not None and not self.remote_fallback:
+            info = {'ip': ip_address, 'error': 'IP address not found in GeoIP database'}
+            self.cache.put(ip_address, info)
+            return info
+
+        token = self.tokens.acquire()
+        if token is None and self.tokens.tokens:
+            info = {'ip': ip_address, 'error': 'All ipinfo tokens are rate limited'}
+            self.cache.put(ip_address, info)
+            return info
+
+        try:
+            params = {'token': token} if token else None
+            response = http_client.get('ipinfo', f"{self.api_url}/{ip_address}", params=params, timeout=self.timeout)
+            self.tokens.report(token, response.status_code)
+
+            if response.status_code == 200:
+                data = response.json()
+                info = {
+                    'ip': data.get('ip', ''),
+                    'city': data.get('city', ''),
+                    'region': data.get('region', ''),
+                    'country': data.get('country', ''),
+                    'loc': data.get('loc', ''),
+                    'org': data.get('org', ''),
+                    'postal': data.get('postal', ''),
+                    'timezone': data.get('timezone', '')
+                }
+            else:
+                info = {'ip': ip_address, 'error': f"API request failed with status code {response.status_code}"}
+        except Exception as e:
+            self.tokens.report(token, 0)
+            info = {'ip': ip_address, 'error': str(e)}
+
+        self.cache.put(ip_address, info)
+        return info
+
+    def prefetch(self, ip_address):
+        """
+        بدء البحث عن الموقع في خيط منفصل بالتوازي مع باقي خطوات تسجيل الدخول
+
+        Returns:
+            Future: نتيجته (العنوان العام، معلومات الموقع)
+        """
+        return self._get_executor().submit(self._resolve_and_lookup, ip_address)
+
+    def _resolve_and_lookup(self, ip_address):
+        public_ip = self.resolve_public_ip(ip_address)
+        return public_ip, self.lookup(public_ip)
+
+    def _get_executor(self):
+        # مجموعة خيوط جديدة لكل عملية بعد fork
+        with self._executor_lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=GEO_PREFETCH_WORKERS, thread_name_prefix='geo-prefetch')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def stats(self):
+        return {
+            'offline_db': self.offline_db.path if self.offline_db is not None else None,
+            'offline_hits': self.offline_hits,
+            'cache': self.cache.stats(),
+            'tokens': self.tokens.stats(),
+        }
+
+
+class GeoEnricher:
+    """
+    طابور خلفي يثري مستندات المستخدمين بمعلومات الموقع بعد تسجيل الدخول
+
+    on_result(user_id, ip_address, ip_info) تُستدعى من خيط العمل لتحديث قاعدة البيانات.
+    """
+
+    def __init__(self, locator, on_result, maxsize=GEO_QUEUE_SIZE):
+        self.locator = locator
+        self.on_result = on_result
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._worker = None
+        self._worker_lock = threading.Lock()
+        self._pid = None
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+        self.failed = 0
+
+    def enqueue(self, user_id, ip_address):
+        """إضافة مهمة إثراء؛ يعيد False إذا كان الطابور ممتلئًا"""
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait((str(user_id), ip_address))
+            self.enqueued += 1
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _ensure_worker(self):
+        # يتم إنشاء الخيط عند أول استخدام (وبعد fork في كل عملية جديدة)
+        if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+            return
+        with self._worker_lock:
+            if self._worker is not None and self._worker.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._worker = threading.Thread(target=self._run, name='geo-enricher', daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            user_id, ip_address = self._queue.get()
+            try:
+                public_ip = self.locator.resolve_public_ip(ip_address)
+                info = self.locator.lookup(public_ip)
+                self.on_result(user_id, public_ip, info)
+                self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Geo enrichment error for user {user_id}: {str(e)}")
+            finally:
+                self._queue.task_done()
+
+    def join(self):
+        """انتظار انتهاء جميع المهام الحالية (للاختبارات والإيقاف)"""
+        self._queue.join()
+
+    def stats(self):
+        stats = self.locator.stats()
+        stats['queue'] = {
+            'pending': self._queue.qsize(),
+            'enqueued': self.enqueued,
+            'dropped': self.dropped,
+            'processed': self.processed,
+            'failed': self.failed,
+        }
+        return stats
@@ -0,0 +1,201 @@
+"""
+قاعدة بيانات GeoIP محلية (بدون اتصال بالإنترنت)
+
+يتم تحويل ملف CSV لنطاقات IPv4 إلى فهرس ثنائي مضغوط:
+    starts[n], ends[n], record_ids[n]  مصفوفات uint32 مرتبة حسب بداية النطاق
+    record_offsets[m + 1], blob        سجلات الموقع بعد إزالة التكرار
+
+يُفتح الفهرس عبر mmap لذلك تتشارك جميع العمليات نفس الصفحات في الذاكرة،
+والبحث يتم بالبحث الثنائي مباشرة على الصفحات دون تحميل الملف.
+ملفات MaxMind (.mmdb) مدعومة إذا كانت مكتبة maxminddb مثبتة.
+
+بناء الفهرس يدويًا:
+    python -m backend.auth.geoip_db build ranges.csv ranges.idx
+
+أعمدة CSV المدعومة: start_ip و end_ip (أو network بصيغة CIDR)، ثم اختياريًا
+country, region, city, loc, org, postal, timezone
+"""
+import os
+import csv
+import sys
+import mmap
+import socket
+import struct
+import bisect
+import ipaddress
+from array import array
+
+MAGIC = b'EBGEOIP1'
+# ترتيب البايتات محفوظ في الملف لأن المصفوفات تُقرأ بالترتيب الأصلي للجهاز
+HEADER = struct.Struct('=8sBxxxIII8x')
+FIELDS = ('country', 'region', 'city', 'loc', 'org', 'postal', 'timezone')
+BYTE_ORDER = 1 if sys.byteorder == 'little' else 2
+
+
+def ip_to_int(ip_address):
+    """تحويل عنوان IPv4 إلى عدد صحيح؛ يعيد None لغير IPv4"""
+    try:
+        return struct.unpack('!I', socket.inet_aton(ip_address))[0]
+    except (OSError, TypeError):
+        return None
+
+
+def _read_ranges(csv_path):
+    with open(csv_path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            if row.get('network'):
+                try:
+                    network = ipaddress.ip_network(row['network'].strip(), strict=False)
+                except ValueError:
+                    continue
+                if network.version != 4:
+                    continue
+                start, end = int(network.network_address), int(network.broadcast_address)
+            else:
+                start, end = ip_to_int((row.get('start_ip') or '').strip()), ip_to_int((row.get('end_ip') or '').strip())
+                if start is None or end is None:
+                    continue
+            record = '\t'.join((row.get(field) or '').strip() for field in FIELDS)
+            yield start, end, record
+
+
+def build_index(csv_path, index_path):
+    """
+    بناء ملف الفهرس الثنائي من ملف CSV
+
+    Returns:
+        int: عدد النطاقات في الفهرس
+    """
+    ranges = sorted(_read_ranges(csv_path))
+    starts, ends, record_ids = array('I'), array('I'), array('I')
+    record_index = {}
+    blob = bytearray()
+    offsets = array('I', [0])
+
+    last_end = -1
+    for start, end, record in ranges:
+        # تجاهل النطاقات المتداخلة حتى يبقى البحث الثنائي صحيحًا
+        if start <= last_end:
+            continue
+        last_end = end
+        record_id = record_index.get(record)
+        if record_id is None:
+            record_id = len(record_index)
+            record_index[record] = record_id
+            blob += record.encode('utf-8')
+            offsets.append(len(blob))
+        starts.append(start)
+        ends.append(end)
+        record_ids.append(record_id)
+
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, BYTE_ORDER, len(starts), len(record_index), len(blob)))
+        for arr in (starts, ends, record_ids, offsets):
+            arr.tofile(f)
+        f.write(blob)
+    os.replace(tmp_path, index_path)
+    return len(starts)
+
+
+class GeoIPIndex:
+    """فهرس نطاقات IPv4 مفتوح عبر mmap مع بحث ثنائي"""
+
+    def __init__(self, index_path):
+        self.path = index_path
+        self._file = open(index_path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byte_order, n_ranges, n_records, blob_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Invalid GeoIP index file: {index_path}")
+        if byte_order != BYTE_ORDER:
+            raise ValueError("GeoIP index was built on a machine with a different byte order")
+
+        view = memoryview(self._mmap)
+        offset = HEADER.size
+
+        def take(count):
+            nonlocal offset
+            size = count * 4
+            section = view[offset:offset + size].cast('I')
+            offset += size
+            return section
+
+        self.starts = take(n_ranges)
+        self.ends = take(n_ranges)
+        self.record_ids = take(n_ranges)
+        self.record_offsets = take(n_records + 1)
+        self.blob = view[offset:offset + blob_len]
+        self.size = n_ranges
+
+    def lookup(self, ip_address):
+        """البحث عن معلومات IP؛ يعيد None إذا لم يكن العنوان في أي نطاق"""
+        value = ip_to_int(ip_address)
+        if value is None:
+            return None
+        i = bisect.bisect_right(self.starts, value) - 1
+        if i < 0 or value > self.ends[i]:
+            return None
+        record_id = self.record_ids[i]
+        raw = bytes(self.blob[self.record_offsets[record_id]:self.record_offsets[record_id + 1]])
+        info = dict(zip(FIELDS, raw.decode('utf-8').split('\t')))
+        info['ip'] = ip_address
+        return info
+
+
+class MMDBIndex:
+    """قراءة ملفات MaxMind عبر مكتبة maxminddb (وضع mmap)"""
+
+    def __init__(self, path):
+        import maxminddb
+        self._reader = maxminddb.open_database(path, maxminddb.MODE_MMAP)
+        self.path = path
+        self.size = None
+
+    def lookup(self, ip_address):
+        try:
+            data = self._reader.get(ip_address)
+        except ValueError:
+            return None
+        if not data:
+            return None
+        location = data.get('location') or {}
+        subdivisions = data.get('subdivisions') or [{}]
+        loc = ''
+        if 'latitude' in location and 'longitude' in location:
+            loc = f"{location['latitude']},{location['longitude']}"
+        return {
+            'ip': ip_address,
+            'country': (data.get('country') or {}).get('iso_code', ''),
+            'region': (subdivisions[0].get('names') or {}).get('en', ''),
+            'city': ((data.get('city') or {}).get('names') or {}).get('en', ''),
+            'loc': loc,
+            'org': data.get('autonomous_system_organization', ''),
+            'postal': (data.get('postal') or {}).get('code', ''),
+            'timezone': location.get('time_zone', ''),
+        }
+
+
+def open_geoip_database(path):
+    """
+    فتح قاعدة بيانات GeoIP حسب امتداد الملف
+
+    ملف CSV يُحوّل تلقائيًا إلى path + '.idx' إذا لم يكن الفهرس موجودًا أو كان أقدم منه.
+    """
+    if path.endswith('.mmdb'):
+        return MMDBIndex(path)
+    if path.endswith('.csv'):
+        index_path = path + '.idx'
+        if not os.path.exists(index_path) or os.path.getmtime(index_path) < os.path.getmtime(path):
+            count = build_index(path, index_path)
+            print(f"Built GeoIP index with {count} ranges at {index_path}")
+        path = index_path
+    return GeoIPIndex(path)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 4 or sys.argv[1] != 'build':
+        print("Usage: python -m backend.auth.geoip_db build <ranges.csv> <output.idx>")
+        sys.exit(1)
+    total = build_index(sys.argv[2], sys.argv[3])
+    print(f"Wrote {total} ranges to {sys.argv[3]}")
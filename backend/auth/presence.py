@@ -0,0 +1,339 @@
+"""
+مخزن حالة اتصال المستخدمين (Presence)
+
+يوفر واجهة موحدة مع عدة تطبيقات:
+    - memory: داخل العملية، مع عجلة انتهاء صلاحية مقسمة زمنيًا (الكنس بتكلفة O(المنتهية) فقط)
+    - sqlite: ملف SQLite مشترك بين عمليات gunicorn على نفس الجهاز
+    - redis: خادم Redis (أو متوافق معه) لعدة عمليات أو عدة أجهزة
+
+جميع التطبيقات تدمج الكتابات المتكررة: المستخدم الذي يطلب عشر نقاط نهاية في الثانية
+ينتج كتابة واحدة على الأكثر كل PRESENCE_WRITE_INTERVAL ثانية.
+"""
+import os
+import time
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+
+# مدة عدم النشاط التي يعتبر بعدها المستخدم غير متصل (بالثواني)
+PRESENCE_TIMEOUT = int(os.getenv('PRESENCE_TIMEOUT', os.getenv('SESSION_TIMEOUT', '300')))
+# أقل مدة بين كتابتين لنفس المستخدم
+PRESENCE_WRITE_INTERVAL = float(os.getenv('PRESENCE_WRITE_INTERVAL', '5'))
+# نوع المخزن: memory أو sqlite أو redis
+PRESENCE_BACKEND = os.getenv('PRESENCE_BACKEND', 'memory')
+PRESENCE_SQLITE_PATH = os.getenv('PRESENCE_SQLITE_PATH', '/tmp/eloboostpro_presence.db')
+PRESENCE_REDIS_URL = os.getenv('PRESENCE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+
+
+class PresenceStore(ABC):
+    """الواجهة الأساسية لمخازن حالة الاتصال مع دمج الكتابات المتكررة"""
+
+    def __init__(self, timeout=PRESENCE_TIMEOUT, write_interval=PRESENCE_WRITE_INTERVAL):
+        self.timeout = timeout
+        self.write_interval = write_interval
+        self._last_write = {}  # {user_id: آخر وقت كتابة من هذه العملية}
+        self._coalesce_lock = threading.Lock()
+        self._last_coalesce_prune = time.time()
+        self.writes = 0
+        self.coalesced = 0
+
+    def touch(self, user_id, now=None):
+        """تسجيل نشاط المستخدم (مع تجاهل الكتابات المتقاربة)"""
+        user_id = str(user_id)
+        now = time.time() if now is None else now
+        with self._coalesce_lock:
+            last = self._last_write.get(user_id)
+            if last is not None and now - last < self.write_interval:
+                self.coalesced += 1
+                return False
+            self._last_write[user_id] = now
+            self.writes += 1
+            self._prune_coalesce_map(now)
+        self._write(user_id, now)
+        return True
+
+    def remove(self, user_id):
+        """تسجيل المستخدم كغير متصل"""
+        user_id = str(user_id)
+        with self._coalesce_lock:
+            self._last_write.pop(user_id, None)
+        self._delete(user_id)
+
+    def is_online(self, user_id, now=None):
+        """التحقق ما إذا كان المستخدم متصلاً حاليًا"""
+        return self.last_active(user_id, now) is not None
+
+    def last_active(self, user_id, now=None):
+        """آخر وقت نشاط للمستخدم أو None إذا كان غير متصل"""
+        now = time.time() if now is None else now
+        last = self._read(str(user_id))
+        if last is None or now - last > self.timeout:
+            return None
+        return last
+
+    def last_active_many(self, user_ids, now=None):
+        """آخر وقت نشاط لمجموعة مستخدمين في استدعاء واحد {user_id: timestamp أو None}"""
+        now = time.time() if now is None else now
+        user_ids = [str(user_id) for user_id in user_ids]
+        result = {}
+        for user_id, last in self._read_many(user_ids).items():
+            result[user_id] = last if last is not None and now - last <= self.timeout else None
+        return result
+
+    def _read_many(self, user_ids):
+        # تطبيق افتراضي؛ المخازن الخارجية تستبدله باستعلام واحد
+        return {user_id: self._read(user_id) for user_id in user_ids}
+
+    def stats(self):
+        """إحصائيات المخزن"""
+        return {
+            'backend': self.name,
+            'writes': self.writes,
+            'coalesced': self.coalesced,
+        }
+
+    def _prune_coalesce_map(self, now):
+        # يجب استدعاؤها مع الاحتفاظ بالقفل؛ تحذف السجلات الأقدم من فترة الدمج
+        if now - self._last_coalesce_prune < self.write_interval * 10:
+            return
+        cutoff = now - self.write_interval
+        self._last_write = {uid: ts for uid, ts in self._last_write.items() if ts >= cutoff}
+        self._last_coalesce_prune = now
+
+    # الوظائف التالية يجب أن تنفذها التطبيقات الفرعية
+    name = 'base'
+
+    @abstractmethod
+    def _write(self, user_id, timestamp):
+        """حفظ وقت آخر نشاط للمستخدم"""
+
+    @abstractmethod
+    def _delete(self, user_id):
+        """حذف المستخدم من المخزن"""
+
+    @abstractmethod
+    def _read(self, user_id):
+        """وقت آخر نشاط أو None"""
+
+    @abstractmethod
+    def sweep(self, now=None):
+        """حذف المستخدمين المنتهية صلاحيتهم، ويعيد عددهم"""
+
+    @abstractmethod
+    def count(self):
+        """عدد المستخدمين في المخزن"""
+
+
+class MemoryPresenceStore(PresenceStore):
+    """
+    مخزن داخل العملية مع عجلة انتهاء صلاحية
+
+    كل مستخدم يوضع في "دلو" حسب وقت آخر نشاط له (بدقة bucket_size ثانية).
+    الكنس يمر فقط على الدلاء التي انتهت صلاحيتها بالكامل، لذلك تكلفته تتناسب
+    مع عدد المستخدمين المنتهية صلاحيتهم وليس مع عدد جميع المستخدمين.
+    """
+
+    name = 'memory'
+
+    def __init__(self, timeout=PRESENCE_TIMEOUT, write_interval=PRESENCE_WRITE_INTERVAL, bucket_size=None):
+        super().__init__(timeout, write_interval)
+        self.bucket_size = bucket_size or max(1, int(timeout // 30))
+        self._last_active = {}  # {user_id: timestamp}
+        self._buckets = {}      # {bucket_index: set(user_id)}
+        self._oldest_bucket = None
+        self._lock = threading.Lock()
+
+    def _bucket(self, timestamp):
+        return int(timestamp // self.bucket_size)
+
+    def _write(self, user_id, timestamp):
+        with self._lock:
+            previous = self._last_active.get(user_id)
+            if previous is not None:
+                self._unlink(user_id, self._bucket(previous))
+            self._last_active[user_id] = timestamp
+            index = self._bucket(timestamp)
+            self._buckets.setdefault(index, set()).add(user_id)
+            if self._oldest_bucket is None or index < self._oldest_bucket:
+                self._oldest_bucket = index
+        self.sweep(timestamp)
+
+    def _delete(self, user_id):
+        with self._lock:
+            previous = self._last_active.pop(user_id, None)
+            if previous is not None:
+                self._unlink(user_id, self._bucket(previous))
+
+    def _read(self, user_id):
+        return self._last_active.get(user_id)
+
+    def _unlink(self, user_id, index):
+        bucket = self._buckets.get(index)
+        if bucket is not None:
+            bucket.discard(user_id)
+            if not bucket:
+                del self._buckets[index]
+
+    def sweep(self, now=None):
+        """حذف المستخدمين المنتهية صلاحيتهم؛ يعيد عدد المحذوفين"""
+        now = time.time() if now is None else now
+        # الدلو الذي ينتهي قبل هذا الحد يكون منتهي الصلاحية بالكامل
+        cutoff = self._bucket(now - self.timeout)
+        removed = 0
+        with self._lock:
+            if self._oldest_bucket is None or self._oldest_bucket >= cutoff:
+                return 0
+            for index in range(self._oldest_bucket, cutoff):
+                bucket = self._buckets.pop(index, None)
+                if not bucket:
+                    continue
+                for user_id in bucket:
+                    del self._last_active[user_id]
+                    removed += 1
+            self._oldest_bucket = cutoff if self._buckets else None
+        return removed
+
+    def count(self):
+        return len(self._last_active)
+
+
+class SQLitePresenceStore(PresenceStore):
+    """
+    مخزن مشترك بين عمليات متعددة على نفس الجهاز عبر ملف SQLite (وضع WAL)
+
+    الفهرس على last_active يجعل الكنس بتكلفة O(المنتهية).
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path=PRESENCE_SQLITE_PATH, timeout=PRESENCE_TIMEOUT,
+                 write_interval=PRESENCE_WRITE_INTERVAL):
+        super().__init__(timeout, write_interval)
+        self.path = path
+        self._local = threading.local()
+        self._last_sweep = 0.0
+        conn = self._conn()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS presence ('
+            'user_id TEXT PRIMARY KEY, last_active REAL NOT NULL)'
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS presence_last_active ON presence(last_active)')
+
+    def _conn(self):
+        # اتصال منفصل لكل خيط (ولكل عملية بعد fork)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _write(self, user_id, timestamp):
+        self._conn().execute(
+            'INSERT INTO presence (user_id, last_active) VALUES (?, ?) '
+            'ON CONFLICT(user_id) DO UPDATE SET last_active = excluded.last_active',
+            (user_id, timestamp)
+        )
+        # كنس دوري بدلاً من الكنس مع كل كتابة
+        if timestamp - self._last_sweep > self.timeout / 10:
+            self._last_sweep = timestamp
+            self.sweep(timestamp)
+
+    def _delete(self, user_id):
+        self._conn().execute('DELETE FROM presence WHERE user_id = ?', (user_id,))
+
+    def _read(self, user_id):
+        row = self._conn().execute(
+            'SELECT last_active FROM presence WHERE user_id = ?', (user_id,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _read_many(self, user_ids):
+        result = dict.fromkeys(user_ids)
+        # تقسيم الاستعلام حتى لا نتجاوز حد المتغيرات في SQLite
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            rows = self._conn().execute(
+                f'SELECT user_id, last_active FROM presence WHERE user_id IN ({placeholders})', chunk
+            )
+            for user_id, last in rows:
+                result[user_id] = last
+        return result
+
+    def sweep(self, now=None):
+        now = time.time() if now is None else now
+        cursor = self._conn().execute(
+            'DELETE FROM presence WHERE last_active < ?', (now - self.timeout,)
+        )
+        return cursor.rowcount
+
+    def count(self):
+        return self._conn().execute('SELECT COUNT(*) FROM presence').fetchone()[0]
+
+
+class RedisPresenceStore(PresenceStore):
+    """
+    مخزن في Redis باستخدام مجموعة مرتبة (sorted set) نتيجتها وقت آخر نشاط
+
+    يتطلب مكتبة redis (pip install redis).
+    """
+
+    name = 'redis'
+    KEY = 'presence:last_active'
+
+    def __init__(self, url=PRESENCE_REDIS_URL, timeout=PRESENCE_TIMEOUT,
+                 write_interval=PRESENCE_WRITE_INTERVAL):
+        super().__init__(timeout, write_interval)
+        import redis
+        self._redis = redis.Redis.from_url(url)
+        self._last_sweep = 0.0
+
+    def _write(self, user_id, timestamp):
+        self._redis.zadd(self.KEY, {user_id: timestamp})
+        if timestamp - self._last_sweep > self.timeout / 10:
+            self._last_sweep = timestamp
+            self.sweep(timestamp)
+
+    def _delete(self, user_id):
+        self._redis.zrem(self.KEY, user_id)
+
+    def _read(self, user_id):
+        return self._redis.zscore(self.KEY, user_id)
+
+    def _read_many(self, user_ids):
+        if not user_ids:
+            return {}
+        pipe = self._redis.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.zscore(self.KEY, user_id)
+        return dict(zip(user_ids, pipe.execute()))
+
+    def sweep(self, now=None):
+        now = time.time() if now is None else now
+        return self._redis.zremrangebyscore(self.KEY, '-inf', now - self.timeout)
+
+    def count(self):
+        return self._redis.zcard(self.KEY)
+
+
+PRESENCE_BACKENDS = {
+    'memory': MemoryPresenceStore,
+    'sqlite': SQLitePresenceStore,
+    'redis': RedisPresenceStore,
+}
+
+
+def create_presence_store(backend=PRESENCE_BACKEND):
+    """إنشاء مخزن حالة الاتصال حسب الإعدادات، مع الرجوع إلى الذاكرة عند الفشل"""
+    store_class = PRESENCE_BACKENDS.get(backend)
+    if store_class is None:
+        print(f"Unknown presence backend '{backend}', using memory")
+        return MemoryPresenceStore()
+    try:
+        return store_class()
+    except Exception as e:
+        print(f"Error initializing {backend} presence store: {e}. Using memory")
+        return MemoryPresenceStore()
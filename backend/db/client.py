@@ -0,0 +1,214 @@
+"""
+اتصال MongoDB مشترك لكل عملية (auth و security و orders)
+
+- MongoClient واحد لكل عملية يُنشأ عند أول استعلام، وليس عند الاستيراد، فلا يرث عمال
+  gunicorn اتصالات العملية الرئيسية؛ بعد fork يُهمل العميل الموروث ويُنشأ عميل جديد
+- إعدادات التجمع والمهل من config.env (القيمة الفارغة = الافتراضي في pymongo)
+- مستمع أحداث التجمع (CMAP) ينشر زمن انتظار الحصول على اتصال وعدد الاتصالات
+  المستخدمة والمفتوحة في /metrics
+"""
+import os
+import time
+import threading
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from pymongo.monitoring import ConnectionPoolListener
+from backend.observability.metrics import metrics
+
+dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'config.env')
+load_dotenv(dotenv_path)
+
+
+def _optional_int(name, default=None):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+MONGODB_URI = os.getenv('MONGODB_URI')
+DATABASE_NAME = 'elo_boost_pro'
+MONGODB_MAX_POOL_SIZE = _optional_int('MONGODB_MAX_POOL_SIZE', 100)
+MONGODB_MIN_POOL_SIZE = _optional_int('MONGODB_MIN_POOL_SIZE', 0)
+# إغلاق الاتصالات الخاملة بعد هذه المدة (بالمللي ثانية)
+MONGODB_MAX_IDLE_TIME_MS = _optional_int('MONGODB_MAX_IDLE_TIME_MS')
+# أقصى انتظار لاتصال متاح عندما يكون التجمع ممتلئًا
+MONGODB_WAIT_QUEUE_TIMEOUT_MS = _optional_int('MONGODB_WAIT_QUEUE_TIMEOUT_MS')
+MONGODB_SERVER_SELECTION_TIMEOUT_MS = _optional_int('MONGODB_SERVER_SELECTION_TIMEOUT_MS')
+MONGODB_CONNECT_TIMEOUT_MS = _optional_int('MONGODB_CONNECT_TIMEOUT_MS')
+MONGODB_SOCKET_TIMEOUT_MS = _optional_int('MONGODB_SOCKET_TIMEOUT_MS')
+
+
+def pool_options():
+    """خيارات MongoClient من الإعدادات (تُحذف القيم غير المحددة)"""
+    options = {
+        'maxPoolSize': MONGODB_MAX_POOL_SIZE,
+        'minPoolSize': MONGODB_MIN_POOL_SIZE,
+        'maxIdleTimeMS': MONGODB_MAX_IDLE_TIME_MS,
+        'waitQueueTimeoutMS': MONGODB_WAIT_QUEUE_TIMEOUT_MS,
+        'serverSelectionTimeoutMS': MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        'connectTimeoutMS': MONGODB_CONNECT_TIMEOUT_MS,
+        'socketTimeoutMS': MONGODB_SOCKET_TIMEOUT_MS,
+    }
+    return {key: value for key, value in options.items() if value is not None}
+
+
+class PoolMonitor(ConnectionPoolListener):
+    """
+    مستمع أحداث تجمع الاتصالات (CMAP)
+
+    يسجل زمن الانتظار من بدء طلب الاتصال حتى الحصول عليه (في نفس الخيط) في المدرج
+    mongodb_pool_checkout_wait_seconds، ويحتفظ لكل خادم بعدد الاتصالات المستخدمة
+    والمفتوحة والطلبات المنتظرة.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pools = {}
+
+    def _pool(self, address):
+        pool = self._pools.get(address)
+        if pool is None:
+            pool = self._pools.setdefault(address, {'in_use': 0, 'open': 0, 'waiting': 0})
+        return pool
+
+    def _change(self, address, **deltas):
+        with self._lock:
+            pool = self._pool(address)
+            for key, delta in deltas.items():
+                pool[key] += delta
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        metrics.increment('mongodb_pool_cleared_total', address=_address(event.address))
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(event.address, None)
+
+    def connection_created(self, event):
+        self._change(event.address, open=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._change(event.address, open=-1)
+
+    def connection_check_out_started(self, event):
+        self._local.started = time.perf_counter()
+        self._change(event.address, waiting=1)
+
+    def connection_check_out_failed(self, event):
+        self._local.started = None
+        self._change(event.address, waiting=-1)
+        metrics.increment('mongodb_pool_checkout_failures_total', address=_address(event.address),
+                          reason=event.reason)
+
+    def connection_checked_out(self, event):
+        started = getattr(self._local, 'started', None)
+        self._local.started = None
+        self._change(event.address, waiting=-1, in_use=1)
+        if started is not None:
+            metrics.observe('mongodb_pool_checkout_wait_seconds', time.perf_counter() - started,
+                            address=_address(event.address))
+
+    def connection_checked_in(self, event):
+        self._change(event.address, in_use=-1)
+
+    def stats(self):
+        """لكل خادم: {'in_use', 'open', 'waiting'}"""
+        with self._lock:
+            return {_address(address): dict(pool) for address, pool in self._pools.items()}
+
+
+def _address(address):
+    host, port = address
+    return f'{host}:{port}'
+
+
+_client = None
+_monitor = None
+_client_lock = threading.Lock()
+
+
+def get_client():
+    """MongoClient الخاص بهذه العملية (يُنشأ عند أول استدعاء)"""
+    global _client, _monitor
+    client = _client
+    if client is None:
+        with _client_lock:
+            if _client is None:
+                _monitor = PoolMonitor()
+                _client = MongoClient(MONGODB_URI, event_listeners=[_monitor], **pool_options())
+            client = _client
+    return client
+
+
+def get_database(name=DATABASE_NAME):
+    return get_client().get_database(name)
+
+
+def get_collection(name):
+    """مجموعة في قاعدة البيانات الرئيسية (تُقرأ في كل مرة حتى تستخدم عميل العملية الحالية)"""
+    return get_database()[name]
+
+
+def reset_client():
+    """
+    إهمال العميل الحالي؛ العميل التالي يُنشأ عند أول استعلام
+
+    يُستدعى تلقائيًا في العملية الابنة بعد fork: العميل الموروث لا يُستخدم ولا يُغلق
+    (اتصالاته وخيوط مراقبته تخص العملية الأم).
+    """
+    global _client, _monitor, _client_lock
+    _client = None
+    _monitor = None
+    _client_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_client)
+
+
+def pool_stats():
+    """إعدادات التجمع وحالة الاتصالات في هذه العملية"""
+    return {
+        'pid': os.getpid(),
+        'connected': _client is not None,
+        'options': pool_options(),
+        'pools': _monitor.stats() if _monitor is not None else {},
+    }
+
+
+def _pool_gauges():
+    pools = _monitor.stats() if _monitor is not None else {}
+    for address, pool in pools.items():
+        for key, value in pool.items():
+            yield f'mongodb_pool_connections_{key}', {'address': address}, value
+
+
+metrics.register_gauges(_pool_gauges)
+
+
+class LazyCollection:
+    """
+    مرجع ثابت لمجموعة يمكن حفظه في متغير على مستوى الوحدة (users_collection = ...)
+
+    كل استخدام يمر إلى المجموعة في عميل العملية الحالية، فلا يُنشأ أي اتصال عند الاستيراد.
+    """
+    __slots__ = ('_name',)
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attribute):
+        return getattr(get_collection(self._name), attribute)
+
+    def __repr__(self):
+        return f'LazyCollection({self._name!r})'
@@ -0,0 +1,191 @@
+"""
+إنشاء فهارس MongoDB عند بدء التشغيل وفحص خطط الاستعلامات
+
+- فهارس فريدة على discord_id و google_id (تسجيل دخول OAuth يبحث بهما في كل مرة)،
+  جزئية حتى لا يتعارض المستخدمون الذين ليس لديهم أحد الحقلين
+- فهارس TTL لمجموعة sessions: انتهاء مطلق (expires_at) وانتهاء بعد عدم النشاط (last_activity)
+- فهارس الطلبات (ensure_order_indexes)
+- create_indexes آمنة للتكرار: الفهرس الموجود بنفس المواصفات لا يُعاد بناؤه
+
+فحص الخطط (يشغل explain() على كل شكل استعلام في auth.py و security.py ويحدد COLLSCAN):
+
+    python -m backend.db.indexes --explain
+    python -m backend.db.indexes --create --explain
+"""
+import os
+import sys
+import threading
+from bson import ObjectId
+from pymongo import MongoClient, ASCENDING
+from pymongo.errors import OperationFailure, PyMongoError
+from .client import MONGODB_URI, DATABASE_NAME
+
+# إنشاء الفهارس تلقائيًا عند بدء الخادم
+DB_CREATE_INDEXES = os.getenv('DB_CREATE_INDEXES', 'true').lower() == 'true'
+# مهلة اختيار الخادم لعملية الإنشاء عند بدء التشغيل (بالمللي ثانية)
+DB_INDEX_TIMEOUT_MS = int(os.getenv('DB_INDEX_TIMEOUT_MS', '10000'))
+# مدة الجلسة بدون نشاط قبل حذفها تلقائيًا (بالثواني)
+SESSION_TIMEOUT = int(os.getenv('SESSION_TIMEOUT', '300'))
+
+DUPLICATE_KEY_ERROR = 11000
+INDEX_CONFLICT_ERRORS = (85, 86)  # IndexOptionsConflict, IndexKeySpecsConflict
+
+# المجموعة -> (الاسم، المفاتيح، الخيارات)
+INDEXES = {
+    'users': (
+        ('discord_id_unique', [('discord_id', ASCENDING)],
+         {'unique': True, 'partialFilterExpression': {'discord_id': {'$exists': True}}}),
+        ('google_id_unique', [('google_id', ASCENDING)],
+         {'unique': True, 'partialFilterExpression': {'google_id': {'$exists': True}}}),
+    ),
+    'sessions': (
+        ('user_id', [('user_id', ASCENDING)], {}),
+        # يحذف MongoDB الجلسة عند الوصول إلى expires_at
+        ('expires_at_ttl', [('expires_at', ASCENDING)], {'expireAfterSeconds': 0}),
+        # ويحذفها أيضًا بعد SESSION_TIMEOUT ثانية من آخر نشاط
+        ('last_activity_ttl', [('last_activity', ASCENDING)], {'expireAfterSeconds': SESSION_TIMEOUT}),
+    ),
+}
+
+# أشكال الاستعلامات المستخدمة في auth.py و security.py: (الوصف، المجموعة، شرط البحث)
+QUERY_SHAPES = (
+    ('users by _id (find_one, update_one)', 'users', {'_id': ObjectId()}),
+    ('users by discord_id (OAuth upsert)', 'users', {'discord_id': '0'}),
+    ('users by google_id (OAuth upsert)', 'users', {'google_id': '0'}),
+)
+
+
+def _report_duplicates(collection, field):
+    """طباعة أمثلة للقيم المكررة التي تمنع إنشاء الفهرس الفريد"""
+    pipeline = [
+        {'$match': {field: {'$exists': True}}},
+        {'$group': {'_id': f'${field}', 'count': {'$sum': 1}, 'ids': {'$push': '$_id'}}},
+        {'$match': {'count': {'$gt': 1}}},
+        {'$limit': 5},
+    ]
+    for group in collection.aggregate(pipeline):
+        print(f"[DB] Duplicate {collection.name}.{field}={group['_id']!r}: {[str(i) for i in group['ids']]}")
+
+
+def create_indexes(db):
+    """
+    إنشاء فهارس users و sessions و orders (آمنة للتكرار)
+
+    Args:
+        db: قاعدة البيانات (Database)
+
+    Returns:
+        dict: المجموعة -> أسماء الفهارس الجاهزة
+    """
+    from backend.orders.ingest import ensure_order_indexes
+    ready = {}
+    for collection_name, specs in INDEXES.items():
+        collection = db[collection_name]
+        ready[collection_name] = []
+        for name, keys, options in specs:
+            try:
+                collection.create_index(keys, name=name, **options)
+                ready[collection_name].append(name)
+            except OperationFailure as e:
+                if e.code == DUPLICATE_KEY_ERROR:
+                    print(f"[DB] Cannot create unique index {collection_name}.{name}: duplicate values exist")
+                    _report_duplicates(collection, keys[0][0])
+                elif e.code in INDEX_CONFLICT_ERRORS:
+                    print(f"[DB] Index {collection_name}.{name} exists with different options; "
+                          f"drop it to recreate: {e}")
+                else:
+                    raise
+    ensure_order_indexes(db.orders)
+    ready['orders'] = [name for name in db.orders.index_information() if name != '_id_']
+    return ready
+
+
+def _plan_stages(plan):
+    """كل مراحل الخطة الفائزة (بما في ذلك المراحل الداخلية)"""
+    stages, pending = [], [plan]
+    while pending:
+        stage = pending.pop()
+        stages.append(stage)
+        if stage.get('inputStage'):
+            pending.append(stage['inputStage'])
+        pending.extend(stage.get('inputStages', ()))
+    return stages
+
+
+def explain_query_shapes(db, shapes=QUERY_SHAPES):
+    """
+    تشغيل explain() على كل شكل استعلام
+
+    Returns:
+        list: لكل شكل {'shape', 'collection', 'stages', 'indexes', 'collscan'}
+    """
+    results = []
+    for label, collection_name, query in shapes:
+        plan = db[collection_name].find(query).limit(1).explain()
+        winning = plan.get('queryPlanner', {}).get('winningPlan', {})
+        # في MongoDB 7+ قد تكون الخطة داخل queryPlan
+        winning = winning.get('queryPlan', winning)
+        stages = _plan_stages(winning)
+        results.append({
+            'shape': label,
+            'collection': collection_name,
+            'stages': [stage.get('stage') for stage in stages],
+            'indexes': [stage['indexName'] for stage in stages if stage.get('indexName')],
+            'collscan': any(stage.get('stage') == 'COLLSCAN' for stage in stages),
+        })
+    return results
+
+
+def bootstrap_indexes():
+    """إنشاء الفهارس باتصال مؤقت خاص (لا يُشارك مع العمال بعد fork) ثم إغلاقه"""
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=DB_INDEX_TIMEOUT_MS)
+    try:
+        ready = create_indexes(client.get_database(DATABASE_NAME))
+        print("[DB] Indexes ready: " + ', '.join(f"{name}({len(names)})" for name, names in ready.items()))
+    except PyMongoError as e:
+        print(f"[DB] Could not create indexes: {e}")
+    finally:
+        client.close()
+
+
+def start_index_bootstrap():
+    """إنشاء الفهارس في الخلفية حتى لا ينتظر بدء الخادم (إذا كان DB_CREATE_INDEXES مفعلًا)"""
+    if not DB_CREATE_INDEXES:
+        return None
+    thread = threading.Thread(target=bootstrap_indexes, name='index-bootstrap', daemon=True)
+    thread.start()
+    return thread
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Create MongoDB indexes and check query plans')
+    parser.add_argument('--create', action='store_true', help='create the indexes first')
+    parser.add_argument('--explain', action='store_true', help='explain every auth/security query shape')
+    args = parser.parse_args()
+    if not args.create and not args.explain:
+        args.explain = True
+
+    client = MongoClient(MONGODB_URI, serverSelectionTimeoutMS=DB_INDEX_TIMEOUT_MS)
+    db = client.get_database(DATABASE_NAME)
+    collscans = 0
+    try:
+        if args.create:
+            for name, indexes in create_indexes(db).items():
+                print(f"{name}: {', '.join(indexes)}")
+        if args.explain:
+            for result in explain_query_shapes(db):
+                status = 'COLLSCAN' if result['collscan'] else 'ok'
+                collscans += result['collscan']
+                print(f"[{status:>8}] {result['shape']:<40} {' > '.join(result['stages'])} "
+                      f"{','.join(result['indexes'])}")
+    except PyMongoError as e:
+        print(f"[DB] {e}")
+        return 2
+    finally:
+        client.close()
+    return 1 if collscans else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
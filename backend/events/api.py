@@ -0,0 +1,81 @@
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from backend.security.security import get_principal
+from backend.auth.auth import refresh_auth_cookie_if_needed
+from .hub import event_hub, event_bridge
+
+# إنشاء Blueprint لقناة الأحداث الفورية
+events_bp = Blueprint('events_bp', __name__)
+
+@events_bp.route('/stream', methods=['GET'])
+def stream():
+    """
+    قناة Server-Sent Events واحدة لكل تبويب بدلاً من الاستعلام الدوري
+
+    الأحداث: presence (للمالك)، order (للمالك ولصاحب الطلب)، resync
+    """
+    # يضيف Flask طريقة HEAD تلقائيًا لمسارات GET، ولا معنى لها في قناة بث
+    if request.method != 'GET':
+        response = jsonify({'message': 'Method not allowed'})
+        response.status_code = 405
+        response.headers['Allow'] = 'GET'
+        return response
+
+    principal = get_principal()
+    if not principal.token:
+        return jsonify({'message': 'Authentication required'}), 401
+    if not principal.is_authenticated:
+        return jsonify({'message': principal.error}), 401
+
+    user_data = principal.user
+    payload = principal.payload
+    user_id = principal.user_id
+
+    # مفاتيح الجمهور الخاصة بهذا المشترك
+    keys = {f'user:{user_id}', principal.role}
+
+    # استئناف البث من آخر حدث استلمه المتصفح
+    last_event_id = request.headers.get('Last-Event-ID')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+
+    if event_bridge is not None:
+        event_bridge.ensure_listener()
+
+    # فحص مبدئي فقط؛ المكان يُحجز داخل مولد البث عند بدء إرسال الجسم
+    if event_hub.is_full:
+        response = jsonify({'message': 'Too many event subscribers'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+
+    response = Response(mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'  # تعطيل التخزين المؤقت في nginx
+
+    # تجديد الكوكي عند إعادة الاتصال بدلاً من استعلام check-token الدوري
+    refresh_auth_cookie_if_needed(
+        response,
+        payload,
+        user_id,
+        username=user_data.get('username', ''),
+        email=user_data.get('email', ''),
+        is_owner=user_data.get('is_owner', False),
+        is_booster=user_data.get('is_booster', False),
+        avatar=user_data.get('avatar')
+    )
+
+    # يُنشأ مولد البث في النهاية حتى لا يبقى مولد معلّق إذا فشل ما قبله
+    response.response = stream_with_context(event_hub.stream(keys, last_event_id))
+    return response
+
+def register_event_endpoints(app, url_prefix='/api/events'):
+    """
+    تسجيل نقاط نهاية الأحداث الفورية مع تطبيق Flask
+
+    Args:
+        app: تطبيق Flask
+        url_prefix: بادئة عنوان URL (افتراضيًا: /api/events)
+    """
+    app.register_blueprint(events_bp, url_prefix=url_prefix)
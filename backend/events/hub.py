@@ -0,0 +1,262 @@
+"""
+موزع الأحداث الفورية (Server-Sent Events)
+
+كل حدث يُنسّق مرة واحدة عند النشر ويُضاف إلى سجل دائري مشترك برقم تسلسلي.
+كل مشترك يحتفظ فقط بمؤشر (آخر رقم قرأه)، لذلك النشر بتكلفة O(1) ولا توجد
+طوابير أو خيوط منفصلة لكل مشترك؛ المشترك المتأخر عن سعة السجل يتلقى حدث resync.
+
+مع عامل gevent (الافتراضي في gunicorn) كل اتصال مفتوح هو greenlet ينتظر على
+الموزع، فالحد الأقصى للمشتركين في العملية ثلاثة أرباع WEB_WORKER_CONNECTIONS ويبقى
+الربع لطلبات /api. مع الخيوط (gthread أو waitress) كل اتصال يحجز خيطًا، فالحد
+نصف WEB_THREADS. المشترك الزائد يتلقى 503 مع Retry-After.
+
+مع عدة عمليات (gunicorn) يجب تعيين EVENTS_REDIS_URL: كل حدث يُنشر عبر Redis pub/sub
+برقم تسلسلي عام (INCR في نفس السكربت) وتستقبله كل العمليات بنفس الترتيب، وبدونه يصل
+الحدث فقط للمشتركين المتصلين بنفس العملية التي نشرته.
+"""
+import os
+import json
+import time
+import threading
+import itertools
+from collections import deque
+
+# سعة السجل الدائري للأحداث
+EVENTS_BUFFER_SIZE = int(os.getenv('EVENTS_BUFFER_SIZE', '2048'))
+# الفاصل بين رسائل keepalive (بالثواني)
+EVENTS_HEARTBEAT = int(os.getenv('EVENTS_HEARTBEAT', '15'))
+# أقصى عمر للاتصال قبل أن يعيد المتصفح الاتصال (لإعادة التحقق من التوكن)
+EVENTS_STREAM_MAX_AGE = int(os.getenv('EVENTS_STREAM_MAX_AGE', '600'))
+
+
+def _default_max_subscribers():
+    # يُستدعى عند الاستيراد، أي بعد monkey.patch_all() في wsgi.py عند استخدام gevent
+    try:
+        from gevent import monkey
+        green = monkey.is_module_patched('threading')
+    except ImportError:
+        green = False
+    if green:
+        return max(1, int(os.getenv('WEB_WORKER_CONNECTIONS') or 1000) * 3 // 4)
+    return max(1, int(os.getenv('WEB_THREADS') or 4) // 2)
+
+
+# الحد الأقصى لعدد المشتركين المتزامنين في العملية (الافتراضي حسب نوع العامل)
+EVENTS_MAX_SUBSCRIBERS = int(os.getenv('EVENTS_MAX_SUBSCRIBERS') or _default_max_subscribers())
+# المدة التي ينتظرها المتصفح قبل إعادة الاتصال (بالميلي ثانية)
+EVENTS_RETRY_MS = int(os.getenv('EVENTS_RETRY_MS', '10000'))
+# مدة الانتظار قبل إعادة الاتصال عند امتلاء الأماكن (بالميلي ثانية، نفس Retry-After)
+EVENTS_FULL_RETRY_MS = 30000
+# خادم Redis لتوزيع الأحداث بين العمليات (فارغ = داخل العملية فقط)
+EVENTS_REDIS_URL = os.getenv('EVENTS_REDIS_URL', '')
+EVENTS_REDIS_CHANNEL = os.getenv('EVENTS_REDIS_CHANNEL', 'events')
+
+
+class EventHub:
+    """سجل أحداث دائري مشترك مع مؤشرات قراءة لكل مشترك"""
+
+    def __init__(self, capacity=EVENTS_BUFFER_SIZE, max_subscribers=EVENTS_MAX_SUBSCRIBERS):
+        self.max_subscribers = max_subscribers
+        self._events = deque(maxlen=capacity)  # [(seq, audience, frame)]
+        self._seq = 0
+        self._cond = threading.Condition()
+        self._subscribers = 0
+        self.published = 0
+
+    @property
+    def last_id(self):
+        return self._seq
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    def publish(self, name, data, audience=('owner',), seq=None):
+        """
+        نشر حدث لجميع المشتركين المعنيين
+
+        Args:
+            name (str): اسم الحدث (presence, order, ...)
+            data (dict): بيانات الحدث
+            audience (iterable): الجمهور المستهدف مثل 'owner' أو 'user:<id>' أو '*'
+            seq (int): الرقم التسلسلي العام للحدث القادم من Redis (None = الرقم التالي محليًا)
+
+        Returns:
+            int: الرقم التسلسلي للحدث
+        """
+        payload = json.dumps(data, default=str, separators=(',', ':'))
+        with self._cond:
+            if seq is None:
+                self._seq += 1
+            elif seq <= self._seq:
+                # حدث مكرر أو أقدم من آخر حدث مستلم
+                return self._seq
+            else:
+                self._seq = seq
+            frame = f"id: {self._seq}\nevent: {name}\ndata: {payload}\n\n"
+            self._events.append((self._seq, frozenset(audience), frame))
+            self.published += 1
+            self._cond.notify_all()
+            return self._seq
+
+    @property
+    def is_full(self):
+        return self._subscribers >= self.max_subscribers
+
+    def try_subscribe(self):
+        """حجز مكان لمشترك جديد؛ يعيد False إذا تم الوصول إلى الحد الأقصى"""
+        with self._cond:
+            if self._subscribers >= self.max_subscribers:
+                return False
+            self._subscribers += 1
+            return True
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers = max(0, self._subscribers - 1)
+
+    def stream(self, keys, last_event_id=None, heartbeat=EVENTS_HEARTBEAT,
+               max_age=EVENTS_STREAM_MAX_AGE):
+        """
+        مولد إطارات SSE لمشترك واحد
+
+        المكان يُحجز عند بدء تنفيذ المولد ويُحرر في finally، فالاستجابة التي لا يُقرأ
+        جسمها أبدًا (HEAD، أو خطأ قبل إرسالها) لا تحجز مكانًا.
+
+        Args:
+            keys (set): مفاتيح الجمهور الخاصة بالمشترك
+            last_event_id (int): آخر حدث استلمه المتصفح (للاستئناف بعد إعادة الاتصال)
+        """
+        if not self.try_subscribe():
+            # امتلأت الأماكن بين فحص نقطة النهاية وبدء البث: يعيد المتصفح الاتصال لاحقًا
+            yield f"retry: {EVENTS_FULL_RETRY_MS}\n\n"
+            return
+        keys = frozenset(keys) | {'*'}
+        deadline = time.monotonic() + max_age
+        try:
+            with self._cond:
+                cursor = self._seq
+                if last_event_id is not None and 0 <= last_event_id <= self._seq:
+                    cursor = last_event_id
+
+            yield f"retry: {EVENTS_RETRY_MS}\n\n"
+
+            while time.monotonic() < deadline:
+                with self._cond:
+                    if self._seq <= cursor:
+                        self._cond.wait(timeout=heartbeat)
+                    frames, cursor, lagged = self._read_since(cursor, keys)
+
+                if lagged:
+                    yield "event: resync\ndata: {}\n\n"
+                if frames:
+                    yield ''.join(frames)
+                elif not lagged:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe()
+
+    def _read_since(self, cursor, keys):
+        # يجب استدعاؤها مع الاحتفاظ بالقفل
+        if not self._events or self._seq <= cursor:
+            return [], cursor, False
+        first_seq = self._events[0][0]
+        lagged = cursor + 1 < first_seq
+        start = max(cursor + 1 - first_seq, 0)
+        frames = [
+            frame for _, audience, frame in itertools.islice(self._events, start, None)
+            if audience & keys
+        ]
+        return frames, self._seq, lagged
+
+    def stats(self):
+        return {
+            'subscribers': self._subscribers,
+            'published': self.published,
+            'last_id': self._seq,
+        }
+
+
+class RedisEventBridge:
+    """
+    توزيع الأحداث بين العمليات عبر Redis pub/sub
+
+    النشر يتم بسكربت واحد (INCR ثم PUBLISH) فيحصل كل حدث على رقم تسلسلي عام ويصل
+    لكل العمليات بنفس ترتيب الأرقام، فيبقى Last-Event-ID صالحًا عند إعادة الاتصال
+    بعامل آخر. كل عملية تستقبل الأحداث في خيط واحد يبدأ عند أول مشترك فيها (بعد fork).
+    """
+
+    PUBLISH_SCRIPT = """
+local seq = redis.call('INCR', KEYS[1])
+redis.call('PUBLISH', ARGV[1], seq .. ' ' .. ARGV[2])
+return seq
+"""
+
+    def __init__(self, hub, url=EVENTS_REDIS_URL, channel=EVENTS_REDIS_CHANNEL):
+        self.hub = hub
+        self.url = url
+        self.channel = channel
+        self._lock = threading.Lock()
+        self._pid = None
+        self._listener_pid = None
+        self._redis = None
+        self._script = None
+
+    def _client(self):
+        # عميل Redis خاص بكل عملية (لا يُستخدم عميل العملية الأم بعد fork)
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    import redis
+                    self._redis = redis.Redis.from_url(self.url)
+                    self._script = self._redis.register_script(self.PUBLISH_SCRIPT)
+                    self._pid = os.getpid()
+        return self._redis
+
+    def publish(self, name, data, audience):
+        """نشر الحدث لكل العمليات؛ يعيد الرقم التسلسلي العام"""
+        message = json.dumps([name, data, list(audience)], default=str, separators=(',', ':'))
+        self._client()
+        return self._script(keys=[f'{self.channel}:seq'], args=[self.channel, message])
+
+    def ensure_listener(self):
+        """بدء خيط الاستقبال في هذه العملية إذا لم يكن قد بدأ"""
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            threading.Thread(target=self._listen, name='events-redis', daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    self.receive(message['data'])
+            except Exception as e:
+                print(f"[EVENTS] Redis subscription failed: {e}. Retrying in 1s")
+                time.sleep(1)
+
+    def receive(self, raw):
+        """تسليم رسالة من Redis ("<seq> <json>") للموزع المحلي"""
+        seq, body = raw.split(b' ', 1)
+        name, data, audience = json.loads(body)
+        return self.hub.publish(name, data, audience, seq=int(seq))
+
+
+# نسخة مشتركة على مستوى العملية
+event_hub = EventHub()
+event_bridge = RedisEventBridge(event_hub) if EVENTS_REDIS_URL else None
+
+
+def publish_event(name, data, audience=('owner',)):
+    """نشر حدث عبر الموزع المشترك (وعبر Redis لكل العمليات إذا كان مفعلًا)"""
+    if event_bridge is not None:
+        try:
+            return event_bridge.publish(name, data, audience)
+        except Exception as e:
+            print(f"[EVENTS] Redis publish failed, delivering in this process only: {e}")
+    return event_hub.publish(name, data, audience)
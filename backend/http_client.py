@@ -0,0 +1,273 @@
+"""
+عميل HTTP مشترك لجميع الطلبات الخارجية (Discord و Google و ipinfo ...)
+
+- جلسة requests لكل مزود مع تجمع اتصالات keep-alive لكل مضيف
+- مهلة اتصال ومهلة قراءة لكل طلب
+- إعادة محاولة محدودة مع تأخير عشوائي (jitter)؛ طلبات POST لا تعاد إلا إذا فشل الاتصال نفسه
+- قاطع دائرة (circuit breaker) لكل مزود حتى لا يحجز مزود بطيء خيوط العمل
+- مدرج تكراري (histogram) لزمن الاستجابة لكل مزود
+"""
+import os
+import time
+import random
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from backend.observability.metrics import record_span
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '10'))
+HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '2'))
+HTTP_RETRY_BACKOFF = float(os.getenv('HTTP_RETRY_BACKOFF', '0.2'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '20'))
+# عدد الأخطاء المتتالية التي تفتح القاطع، ومدة بقائه مفتوحًا (بالثواني)
+HTTP_BREAKER_THRESHOLD = int(os.getenv('HTTP_BREAKER_THRESHOLD', '5'))
+HTTP_BREAKER_COOLDOWN = float(os.getenv('HTTP_BREAKER_COOLDOWN', '30'))
+
+# حدود فئات المدرج التكراري بالميلي ثانية
+LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+RETRY_STATUS_CODES = (429, 502, 503, 504)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def connection_not_established(error):
+    """
+    هل فشل الطلب قبل فتح الاتصال (فلم يُرسل شيء للمزود)؟
+
+    فقط مهلة الاتصال أو تعذر فتح الاتصال (رفض، DNS). أخطاء مثل "Connection aborted"
+    أو RemoteDisconnected قد تحدث بعد إرسال الطلب، فلا تُعاد فيها طلبات POST
+    (مثل تبادل رمز OAuth الذي يُستخدم مرة واحدة).
+    """
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    if isinstance(error, requests.ConnectionError) and error.args:
+        return isinstance(getattr(error.args[0], 'reason', None), NewConnectionError)
+    return False
+
+
+class CircuitOpenError(requests.RequestException):
+    """يُرفع عندما يكون قاطع الدائرة مفتوحًا لمزود معين"""
+
+
+class CircuitBreaker:
+    """قاطع دائرة بسيط: مغلق ← مفتوح بعد أخطاء متتالية ← نصف مفتوح بعد فترة التهدئة"""
+
+    def __init__(self, threshold=HTTP_BREAKER_THRESHOLD, cooldown=HTTP_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half_open'
+        return 'open'
+
+    def allow(self):
+        """هل يُسمح بإرسال الطلب؟ في الحالة نصف المفتوحة يمر طلب تجريبي واحد فقط"""
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+class LatencyHistogram:
+    """مدرج تكراري لزمن الاستجابة بفئات ثابتة"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS_MS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total_ms = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, elapsed_ms):
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if elapsed_ms <= bound:
+                index = i
+                break
+        with self._lock:
+            self.counts[index] += 1
+            self.total_ms += elapsed_ms
+            self.count += 1
+
+    def percentile(self, fraction):
+        """تقدير النسبة المئوية من حدود الفئات"""
+        with self._lock:
+            counts, total = list(self.counts), self.count
+        if not total:
+            return 0.0
+        target = fraction * total
+        running = 0
+        for i, count in enumerate(counts):
+            running += count
+            if running >= target:
+                return float(self.buckets[i]) if i < len(self.buckets) else float('inf')
+        return float('inf')
+
+    def snapshot(self):
+        with self._lock:
+            counts, total, total_ms = list(self.counts), self.count, self.total_ms
+        labels = [f"le_{bound}ms" for bound in self.buckets] + ['le_inf']
+        return {
+            'count': total,
+            'avg_ms': round(total_ms / total, 2) if total else 0.0,
+            'p50_ms': self.percentile(0.5),
+            'p99_ms': self.percentile(0.99),
+            'buckets': dict(zip(labels, counts)),
+        }
+
+
+class HttpClient:
+    """عميل HTTP مع جلسة وقاطع دائرة ومدرج تكراري لكل مزود"""
+
+    def __init__(self, connect_timeout=HTTP_CONNECT_TIMEOUT, read_timeout=HTTP_READ_TIMEOUT,
+                 max_retries=HTTP_MAX_RETRIES, backoff=HTTP_RETRY_BACKOFF, pool_maxsize=HTTP_POOL_MAXSIZE):
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.pool_maxsize = pool_maxsize
+        self._sessions = {}
+        self._breakers = {}
+        self._histograms = {}
+        self._errors = {}
+        self._pid = os.getpid()
+        self._lock = threading.Lock()
+
+    def _provider(self, provider):
+        # الجلسات لا تُشارك بين العمليات بعد fork
+        with self._lock:
+            if self._pid != os.getpid():
+                self._sessions.clear()
+                self._pid = os.getpid()
+            session = self._sessions.get(provider)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=self.pool_maxsize, max_retries=0)
+                session.mount('https://', adapter)
+                session.mount('http://', adapter)
+                self._sessions[provider] = session
+                self._breakers.setdefault(provider, CircuitBreaker())
+                self._histograms.setdefault(provider, LatencyHistogram())
+                self._errors.setdefault(provider, 0)
+            return session, self._breakers[provider], self._histograms[provider]
+
+    def request(self, provider, method, url, **kwargs):
+        """
+        إرسال طلب إلى مزود خارجي
+
+        Args:
+            provider (str): اسم المزود (discord, google, ipinfo ...)
+            method (str): GET أو POST ...
+            url (str): العنوان
+
+        Returns:
+            requests.Response
+
+        Raises:
+            CircuitOpenError: إذا كان القاطع مفتوحًا
+            requests.RequestException: بعد استنفاد المحاولات
+        """
+        session, breaker, histogram = self._provider(provider)
+        if not breaker.allow():
+            raise CircuitOpenError(f"Circuit open for provider '{provider}'")
+
+        kwargs.setdefault('timeout', self.timeout)
+        method = method.upper()
+        idempotent = method in IDEMPOTENT_METHODS
+        attempt = 0
+
+        while True:
+            started = time.perf_counter()
+            try:
+                response = session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                elapsed = time.perf_counter() - started
+                histogram.observe(elapsed * 1000)
+                record_span(f'http.{provider}', elapsed)
+                # إعادة المحاولة آمنة دائمًا إذا فشل الاتصال قبل إرسال الطلب
+                retryable = connection_not_established(e)
+                if attempt < self.max_retries and (retryable or idempotent):
+                    attempt += 1
+                    self._sleep(attempt)
+                    continue
+                self._record_error(provider, breaker)
+                raise
+            except Exception:
+                # أي خطأ آخر (مثل خطأ في الشهادة أو في معاملات الطلب) يُسجل كفشل حتى
+                # لا يبقى الطلب التجريبي محجوزًا ويتوقف القاطع عن السماح بأي طلب
+                self._record_error(provider, breaker)
+                raise
+
+            elapsed = time.perf_counter() - started
+            histogram.observe(elapsed * 1000)
+            record_span(f'http.{provider}', elapsed)
+            if response.status_code in RETRY_STATUS_CODES or response.status_code >= 500:
+                if idempotent and attempt < self.max_retries:
+                    attempt += 1
+                    self._sleep(attempt, response)
+                    continue
+                self._record_error(provider, breaker)
+            else:
+                breaker.record_success()
+            return response
+
+    def get(self, provider, url, **kwargs):
+        return self.request(provider, 'GET', url, **kwargs)
+
+    def post(self, provider, url, **kwargs):
+        return self.request(provider, 'POST', url, **kwargs)
+
+    def _record_error(self, provider, breaker):
+        breaker.record_failure()
+        with self._lock:
+            self._errors[provider] = self._errors.get(provider, 0) + 1
+
+    def _sleep(self, attempt, response=None):
+        delay = self.backoff * (2 ** (attempt - 1))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, float(retry_after))
+        # تأخير عشوائي حتى لا تعيد جميع الخيوط المحاولة في نفس اللحظة
+        time.sleep(min(delay * random.uniform(0.5, 1.5), 5.0))
+
+    def stats(self):
+        """إحصائيات كل مزود: زمن الاستجابة وحالة القاطع وعدد الأخطاء"""
+        with self._lock:
+            providers = list(self._histograms)
+        return {
+            provider: {
+                'latency': self._histograms[provider].snapshot(),
+                'breaker': self._breakers[provider].state,
+                'errors': self._errors.get(provider, 0),
+            }
+            for provider in providers
+        }
+
+
+# نسخة مشتركة على مستوى العملية
+http_client = HttpClient()
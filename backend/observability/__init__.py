@@ -0,0 +1 @@
+# Observability package initialization
\ No newline at end of file
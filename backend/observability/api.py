@@ -0,0 +1,70 @@
+import os
+import time
+from flask import Blueprint, Response, request, jsonify, g
+from .metrics import metrics
+from backend.security.security import get_principal
+
+# إنشاء Blueprint لنقطة نهاية المقاييس
+metrics_bp = Blueprint('metrics_bp', __name__)
+
+# إذا تم تعيينه يجب إرسال Authorization: Bearer <METRICS_TOKEN> لقراءة المقاييس،
+# وإلا فالقراءة مسموحة فقط من نفس الجهاز (بدون وكيل) أو للمالك
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
+LOCAL_ADDRESSES = ('127.0.0.1', '::1')
+
+def _metrics_denied():
+    """None إذا كان مسموحًا بقراءة المقاييس، أو استجابة الخطأ"""
+    if METRICS_TOKEN:
+        if request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+            return jsonify({'message': 'Authentication required'}), 401
+        return None
+    # الطلبات القادمة عبر وكيل عكسي تصل من 127.0.0.1 أيضًا، لذلك لا تُعتبر محلية
+    if request.remote_addr in LOCAL_ADDRESSES and 'X-Forwarded-For' not in request.headers:
+        return None
+    principal = get_principal()
+    if not principal.is_authenticated:
+        return jsonify({'message': 'Authentication required'}), 401
+    if principal.role != 'owner':
+        return jsonify({'message': 'Owner privileges required'}), 403
+    return None
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """
+    المقاييس بصيغة Prometheus النصية (أو JSON مختصر عبر ?format=json)
+    """
+    denied = _metrics_denied()
+    if denied is not None:
+        return denied
+    if request.args.get('format') == 'json':
+        return jsonify(metrics.summary())
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
+
+def _start_timer():
+    g._request_started = time.perf_counter()
+
+def _record_request(response):
+    started = g.pop('_request_started', None)
+    if started is None:
+        return response
+    duration = time.perf_counter() - started
+    # يقرأه سجل الطلبات لإضافة المدة إلى السطر
+    g.request_duration = duration
+    endpoint = request.endpoint or 'unmatched'
+    metrics.observe('http_request_duration_seconds', duration, endpoint=endpoint, method=request.method)
+    metrics.increment('http_requests_total', endpoint=endpoint, method=request.method,
+                      status=f'{response.status_code // 100}xx')
+    return response
+
+def register_metrics_endpoints(app, url_prefix=''):
+    """
+    تسجيل قياس زمن الطلبات ونقطة نهاية /metrics مع تطبيق Flask
+
+    Args:
+        app: تطبيق Flask
+        url_prefix: بادئة عنوان URL (افتراضيًا بدون بادئة: /metrics)
+    """
+    app.before_request(_start_timer)
+    app.after_request(_record_request)
+    app.register_blueprint(metrics_bp, url_prefix=url_prefix)
@@ -0,0 +1,389 @@
+"""
+مقاييس زمن الاستجابة لكل مسار وعمليات فرعية (jwt.decode، MongoDB، الطلبات الخارجية)
+
+المدرجات التكرارية بأسلوب HDR: فئات خطية داخل كل قوة للعدد 2 (16 فئة فرعية)،
+أي خطأ نسبي أقصى ~6% في أي مدى من الميكروثانية حتى الدقائق، وتسجيل القيمة
+عبارة عن حساب فهرس وزيادة عدادين تحت قفل غير متنازع عليه تقريبًا.
+
+النتائج متاحة بصيغة Prometheus النصية عبر /metrics.
+
+المدرجات والعدادات خاصة بكل عملية. مع عدة عمال gunicorn يكتب كل عامل نسخة من
+مقاييسه في METRICS_MULTIPROC_DIR كل METRICS_FLUSH_INTERVAL ثانية، والعامل الذي
+يستقبل /metrics يجمع نسخ جميع العمال مع قيمه الحالية (الفئات تُجمع بدون فقد
+للدقة، فالنسب المئوية تُحسب على كل الطلبات). مقاييس العامل المنتهي تُضاف إلى
+ملف أرشيف حتى تبقى العدادات متزايدة.
+"""
+import os
+import json
+import time
+import threading
+import functools
+from contextlib import contextmanager
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+# النسب المئوية المعروضة في /metrics
+METRICS_QUANTILES = tuple(float(q) for q in os.getenv('METRICS_QUANTILES', '0.5,0.9,0.99').split(','))
+# مجلد مشترك لتجميع مقاييس عمال gunicorn (فارغ = مقاييس العملية الحالية فقط)
+METRICS_MULTIPROC_DIR = os.getenv('METRICS_MULTIPROC_DIR', '')
+# الفاصل بين كتابة نسخة مقاييس العامل في المجلد المشترك (بالثواني)
+METRICS_FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', '5'))
+# ملف مقاييس العمال المنتهين داخل المجلد المشترك
+ARCHIVE_FILE = 'archive.json'
+
+SUB_BUCKET_BITS = 4
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+# أكبر قيمة مسجلة: 2^36 ميكروثانية (~19 ساعة)، القيم الأكبر تُسجل في آخر فئة
+MAX_EXPONENT = 36 - SUB_BUCKET_BITS
+BUCKET_COUNT = SUB_BUCKETS * (MAX_EXPONENT + 2)
+
+
+def _bucket_index(value_us):
+    """فهرس الفئة لقيمة بالميكروثانية"""
+    if value_us < 2 * SUB_BUCKETS:
+        return value_us if value_us > 0 else 0
+    exponent = value_us.bit_length() - (SUB_BUCKET_BITS + 1)
+    index = SUB_BUCKETS * exponent + (value_us >> exponent)
+    return index if index < BUCKET_COUNT else BUCKET_COUNT - 1
+
+
+def _bucket_upper(index):
+    """الحد الأعلى للفئة بالميكروثانية"""
+    if index < 2 * SUB_BUCKETS:
+        return index
+    exponent = index // SUB_BUCKETS - 1
+    mantissa = index - SUB_BUCKETS * exponent
+    return ((mantissa + 1) << exponent) - 1
+
+
+class Histogram:
+    """مدرج تكراري لزمن التنفيذ (بالثواني) بفئات لوغاريتمية-خطية"""
+    __slots__ = ('counts', 'count', 'total', 'max', '_lock')
+
+    def __init__(self):
+        self.counts = [0] * BUCKET_COUNT
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = _bucket_index(int(seconds * 1e6))
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def snapshot(self):
+        with self._lock:
+            return list(self.counts), self.count, self.total, self.max
+
+    @staticmethod
+    def quantiles(counts, count, fractions):
+        """تقدير النسب المئوية (بالثواني) من نسخة من الفئات"""
+        results = {}
+        if not count:
+            return {fraction: 0.0 for fraction in fractions}
+        pending = sorted(fractions)
+        running = 0
+        for index, bucket in enumerate(counts):
+            if not bucket:
+                continue
+            running += bucket
+            while pending and running >= pending[0] * count:
+                results[pending.pop(0)] = _bucket_upper(index) / 1e6
+            if not pending:
+                break
+        for fraction in pending:
+            results[fraction] = _bucket_upper(BUCKET_COUNT - 1) / 1e6
+        return results
+
+
+class MetricsRegistry:
+    """سجل المدرجات والعدادات على مستوى العملية"""
+
+    def __init__(self):
+        self._histograms = {}
+        self._counters = {}
+        self._gauge_sources = []
+        self._lock = threading.Lock()
+        self.shared_dir = None
+        self._flusher = None
+
+    def histogram(self, name, labels):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(key, Histogram())
+        return histogram
+
+    def observe(self, name, seconds, **labels):
+        """تسجيل مدة (بالثواني) في المدرج name بالتسميات المعطاة"""
+        if METRICS_ENABLED:
+            self.histogram(name, tuple(sorted(labels.items()))).observe(seconds)
+
+    def increment(self, name, amount=1, **labels):
+        if not METRICS_ENABLED:
+            return
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def register_gauges(self, source):
+        """
+        تسجيل مصدر قيم لحظية تُقرأ عند التصدير
+
+        Args:
+            source: دالة تعيد (الاسم، التسميات dict، القيمة) لكل قيمة
+        """
+        self._gauge_sources.append(source)
+
+    def gauges(self):
+        """القيم اللحظية الحالية: الاسم -> [(التسميات، القيمة)]"""
+        result = {}
+        for source in list(self._gauge_sources):
+            for name, labels, value in source():
+                result.setdefault(name, []).append((tuple(sorted(labels.items())), value))
+        return result
+
+    def _snapshot(self, include_gauges=True):
+        """نسخة من مقاييس هذه العملية: (المدرجات، العدادات، القيم اللحظية) بمفاتيح (الاسم، التسميات)"""
+        histograms = {key: histogram.snapshot() for key, histogram in list(self._histograms.items())}
+        with self._lock:
+            counters = dict(self._counters)
+        gauges = {}
+        if include_gauges:
+            for name, values in self.gauges().items():
+                for labels, value in values:
+                    gauges[(name, labels)] = value
+        return histograms, counters, gauges
+
+    def collect(self):
+        """مقاييس هذه العملية مع نسخ باقي العمال من المجلد المشترك (إن كان مفعلًا)"""
+        histograms, counters, gauges = self._snapshot()
+        if self.shared_dir:
+            own = f'{os.getpid()}.json'
+            try:
+                names = sorted(os.listdir(self.shared_dir))
+            except OSError:
+                names = []
+            for file_name in names:
+                if file_name == own or not file_name.endswith('.json'):
+                    continue
+                data = _read_json(os.path.join(self.shared_dir, file_name))
+                if data:
+                    _merge(histograms, counters, gauges, data)
+        return histograms, counters, gauges
+
+    def start_sharing(self, directory, interval=METRICS_FLUSH_INTERVAL):
+        """
+        بدء كتابة مقاييس العامل في المجلد المشترك (يُستدعى بعد fork في كل عامل)
+
+        القيم الموروثة من العملية الأم تُحذف حتى لا تُحسب مرة لكل عامل.
+        """
+        with self._lock:
+            self._counters.clear()
+        self._histograms.clear()
+        self.shared_dir = directory
+        os.makedirs(directory, exist_ok=True)
+
+        def run():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"[METRICS] Error writing worker metrics: {e}")
+
+        self._flusher = threading.Thread(target=run, name='metrics-flusher', daemon=True)
+        self._flusher.start()
+
+    def flush(self):
+        """كتابة نسخة مقاييس هذه العملية في المجلد المشترك"""
+        if not self.shared_dir:
+            return
+        histograms, counters, gauges = self._snapshot()
+        _write_json(os.path.join(self.shared_dir, f'{os.getpid()}.json'), _serialize(histograms, counters, gauges))
+
+    def summary(self):
+        """ملخص مختصر (للاستخدام في JSON): العدد والنسب المئوية بالميلي ثانية"""
+        histograms, counters, gauges = self.collect()
+        result = {}
+        for (name, labels), (counts, count, total, maximum) in sorted(histograms.items()):
+            quantiles = Histogram.quantiles(counts, count, METRICS_QUANTILES)
+            label_text = ','.join(f'{k}={v}' for k, v in labels)
+            result[f'{name}{{{label_text}}}'] = {
+                'count': count,
+                'avg_ms': round(total / count * 1000, 3) if count else 0.0,
+                'max_ms': round(maximum * 1000, 3),
+                **{f'p{int(q * 100)}_ms': round(v * 1000, 3) for q, v in quantiles.items()},
+            }
+        for (name, labels), value in sorted(gauges.items()):
+            label_text = ','.join(f'{k}={v}' for k, v in labels)
+            result[f'{name}{{{label_text}}}'] = value
+        return result
+
+    def render_prometheus(self):
+        """تصدير جميع المقاييس بصيغة Prometheus النصية"""
+        histograms, counter_values, gauge_values = self.collect()
+        lines = []
+        by_name = {}
+        for (name, labels), snapshot in histograms.items():
+            by_name.setdefault(name, []).append((labels, snapshot))
+        for name in sorted(by_name):
+            lines.append(f'# HELP {name} {METRIC_HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} summary')
+            for labels, (counts, count, total, _) in sorted(by_name[name], key=lambda item: item[0]):
+                for fraction, value in sorted(Histogram.quantiles(counts, count, METRICS_QUANTILES).items()):
+                    lines.append(f'{name}{_format_labels(labels + (("quantile", str(fraction)),))} {value:.6f}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {total:.6f}')
+                lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+        counters = {}
+        for (name, labels), value in counter_values.items():
+            counters.setdefault(name, []).append((labels, value))
+        for name in sorted(counters):
+            lines.append(f'# HELP {name} {METRIC_HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} counter')
+            for labels, value in sorted(counters[name]):
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+
+        gauges = {}
+        for (name, labels), value in gauge_values.items():
+            gauges.setdefault(name, []).append((labels, value))
+        for name in sorted(gauges):
+            lines.append(f'# HELP {name} {METRIC_HELP.get(name, name)}')
+            lines.append(f'# TYPE {name} gauge')
+            for labels, value in sorted(gauges[name]):
+                lines.append(f'{name}{_format_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _serialize(histograms, counters, gauges):
+    """تحويل نسخة المقاييس إلى JSON (الفئات الفارغة لا تُكتب)"""
+    return {
+        'histograms': [
+            [name, labels, {index: n for index, n in enumerate(counts) if n}, count, total, maximum]
+            for (name, labels), (counts, count, total, maximum) in histograms.items()
+        ],
+        'counters': [[name, labels, value] for (name, labels), value in counters.items()],
+        'gauges': [[name, labels, value] for (name, labels), value in gauges.items()],
+    }
+
+
+def _merge(histograms, counters, gauges, data):
+    """إضافة نسخة مقاييس عملية أخرى (من JSON) إلى القيم المجمعة"""
+    for name, labels, buckets, count, total, maximum in data.get('histograms', []):
+        key = (name, tuple(map(tuple, labels)))
+        merged = histograms.get(key)
+        counts = list(merged[0]) if merged else [0] * BUCKET_COUNT
+        for index, n in buckets.items():
+            counts[int(index)] += n
+        if merged:
+            count, total, maximum = merged[1] + count, merged[2] + total, max(merged[3], maximum)
+        histograms[key] = (counts, count, total, maximum)
+    for table, section in ((counters, 'counters'), (gauges, 'gauges')):
+        for name, labels, value in data.get(section, []):
+            key = (name, tuple(map(tuple, labels)))
+            table[key] = table.get(key, 0) + value
+
+
+def _read_json(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(path, data):
+    # كتابة ذرية حتى لا يقرأ عامل آخر ملفًا نصف مكتوب
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(temp_path, path)
+
+
+def archive_process(directory, pid):
+    """
+    دمج مقاييس عامل منتهٍ في ملف الأرشيف ثم حذف ملفه (يُستدعى من العملية الأم)
+
+    القيم اللحظية للعامل المنتهي لا تُؤرشف.
+    """
+    path = os.path.join(directory, f'{pid}.json')
+    data = _read_json(path)
+    if data:
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        histograms, counters, gauges = {}, {}, {}
+        _merge(histograms, counters, gauges, _read_json(archive_path) or {})
+        _merge(histograms, counters, gauges, data)
+        _write_json(archive_path, _serialize(histograms, counters, {}))
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def reset_shared_dir(directory):
+    """تفريغ المجلد المشترك من مقاييس تشغيل سابق (يُستدعى من العملية الأم قبل بدء العمال)"""
+    os.makedirs(directory, exist_ok=True)
+    for file_name in os.listdir(directory):
+        if file_name.endswith(('.json', '.tmp')):
+            try:
+                os.remove(os.path.join(directory, file_name))
+            except OSError:
+                pass
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels) + '}'
+
+
+METRIC_HELP = {
+    'http_request_duration_seconds': 'Request latency per Flask endpoint',
+    'http_requests_total': 'Requests per Flask endpoint and status class',
+    'span_duration_seconds': 'Latency of operations inside a request (jwt, mongo, outbound http)',
+    'mongodb_pool_checkout_wait_seconds': 'Time spent waiting for a MongoDB connection from the pool',
+    'mongodb_pool_checkout_failures_total': 'MongoDB connection checkouts that failed (timeout, pool closed, error)',
+    'mongodb_pool_cleared_total': 'MongoDB connection pools cleared after a network error',
+    'mongodb_pool_connections_in_use': 'MongoDB connections currently checked out',
+    'mongodb_pool_connections_open': 'MongoDB connections currently open (in use or idle)',
+    'mongodb_pool_connections_waiting': 'Threads waiting for a MongoDB connection',
+}
+
+# نسخة مشتركة على مستوى العملية
+metrics = MetricsRegistry()
+
+
+@contextmanager
+def span(name):
+    """قياس زمن عملية فرعية: with span('mongo.users.find_one'): ..."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.observe('span_duration_seconds', time.perf_counter() - started, span=name)
+
+
+def timed(name):
+    """مزخرف لقياس زمن دالة كعملية فرعية"""
+    def decorator(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def record_span(name, seconds):
+    """تسجيل مدة عملية فرعية تم قياسها مسبقًا"""
+    metrics.observe('span_duration_seconds', seconds, span=name)
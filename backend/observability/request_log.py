@@ -0,0 +1,184 @@
+"""
+سجل طلبات HTTP غير متزامن
+
+خيط الطلب يقوم فقط بفحوصات رخيصة ثم يضع سجلاً في حلقة محدودة (deque)،
+وخيط خلفي واحد يقوم بالتنسيق (ملون أو JSON lines) والكتابة إلى stdout.
+
+- تجاهل ملفات الواجهة بمطابقة مترجمة مسبقًا (تعبير نمطي واحد بدلاً من any())
+- إزالة التكرار: نفس الطريقة والمسار لا يُسجلان أكثر من مرة خلال النافذة (خريطة محدودة الحجم)
+- أخذ عينات للمسارات كثيرة الطلبات (أخطاء الخادم تُسجل دائمًا)
+- عند امتلاء الحلقة تُحذف أقدم السجلات ويُحسب عددها بدلاً من إبطاء الطلبات
+"""
+import os
+import re
+import sys
+import json
+import time
+import atexit
+import random
+import threading
+from collections import deque, OrderedDict
+from termcolor import colored
+
+REQUEST_LOG_FORMAT = os.getenv('REQUEST_LOG_FORMAT', 'text').lower()  # text أو json
+REQUEST_LOG_BUFFER = int(os.getenv('REQUEST_LOG_BUFFER', '4096'))
+# نافذة إزالة التكرار بالثواني (0 لتعطيلها) وحجم الخريطة الأقصى
+REQUEST_LOG_DEDUP_WINDOW = float(os.getenv('REQUEST_LOG_DEDUP_WINDOW', '5'))
+REQUEST_LOG_DEDUP_MAX = int(os.getenv('REQUEST_LOG_DEDUP_MAX', '2048'))
+# المسارات كثيرة الطلبات (بادئات مفصولة بفواصل) ونسبة ما يُسجل منها
+REQUEST_LOG_SAMPLED_PATHS = tuple(
+    p.strip() for p in os.getenv('REQUEST_LOG_SAMPLED_PATHS', '/api/auth/check-token,/api/auth/status').split(',') if p.strip()
+)
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv('REQUEST_LOG_SAMPLE_RATE', '0.1'))
+
+# المسارات التي لا نريد تسجيلها (ملفات الواجهة)
+IGNORED_SUFFIXES = ('.js', '.css', '.png', '.jpg', '.svg')
+IGNORED_PATHS = (
+    'favicon.ico', 'manifest.json', 'static/', 'images/', 'logo192.png',
+    'favicon-sw.js', '.js', '.css', '.png', '.jpg', '.svg'
+)
+_IGNORED = re.compile('|'.join(re.escape(p) for p in IGNORED_PATHS))
+
+STATUS_STYLES = (
+    (300, 'green', 'OK'),
+    (400, 'cyan', 'REDIRECT'),
+    (500, 'yellow', 'CLIENT ERROR'),
+)
+
+
+def _status_style(status_code):
+    for upper, color, text in STATUS_STYLES:
+        if status_code < upper:
+            return color, text
+    return 'red', 'SERVER ERROR'
+
+
+class RequestLogger:
+    """سجل طلبات بحلقة محدودة وخيط كتابة خلفي"""
+
+    def __init__(self, fmt=REQUEST_LOG_FORMAT, buffer_size=REQUEST_LOG_BUFFER,
+                 dedup_window=REQUEST_LOG_DEDUP_WINDOW, dedup_max=REQUEST_LOG_DEDUP_MAX,
+                 sampled_paths=REQUEST_LOG_SAMPLED_PATHS, sample_rate=REQUEST_LOG_SAMPLE_RATE,
+                 stream=None):
+        self.fmt = fmt
+        self.dedup_window = dedup_window
+        self.dedup_max = dedup_max
+        self.sampled_paths = sampled_paths
+        self.sample_rate = sample_rate
+        self.stream = stream
+        self._buffer = deque(maxlen=buffer_size)
+        self._dedup = OrderedDict()
+        self._dedup_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._writer = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self.stats_counters = {'enqueued': 0, 'written': 0, 'dropped': 0, 'ignored': 0, 'deduplicated': 0, 'sampled_out': 0}
+
+    def _should_log(self, method, path, status_code, now):
+        """الفحوصات التي تتم على خيط الطلب (بدون تنسيق أو كتابة)"""
+        if path.endswith(IGNORED_SUFFIXES) or _IGNORED.search(path):
+            self.stats_counters['ignored'] += 1
+            return False
+
+        # أخطاء الخادم تُسجل دائمًا
+        if status_code >= 500:
+            return True
+
+        if self.sampled_paths and path.startswith(self.sampled_paths) and random.random() >= self.sample_rate:
+            self.stats_counters['sampled_out'] += 1
+            return False
+
+        if self.dedup_window > 0:
+            key = (method, path)
+            with self._dedup_lock:
+                last = self._dedup.get(key)
+                if last is not None and now - last < self.dedup_window:
+                    self.stats_counters['deduplicated'] += 1
+                    return False
+                self._dedup[key] = now
+                self._dedup.move_to_end(key)
+                # الخريطة محدودة الحجم: حذف أقدم المسارات
+                while len(self._dedup) > self.dedup_max:
+                    self._dedup.popitem(last=False)
+        return True
+
+    def log(self, method, path, status_code, duration_ms=None, **fields):
+        """تسجيل طلب (يُستدعى من after_request)"""
+        now = time.time()
+        if not self._should_log(method, path, status_code, now):
+            return False
+        self._ensure_writer()
+        if len(self._buffer) == self._buffer.maxlen:
+            self.stats_counters['dropped'] += 1
+        self._buffer.append((now, method, path, status_code, duration_ms, fields))
+        self.stats_counters['enqueued'] += 1
+        self._wakeup.set()
+        return True
+
+    def _ensure_writer(self):
+        # الخيط لا ينتقل إلى العمليات الفرعية بعد fork
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._writer = threading.Thread(target=self._run, name='request-logger', daemon=True)
+            self._writer.start()
+            self._pid = os.getpid()
+
+    def _format(self, record):
+        timestamp, method, path, status_code, duration_ms, fields = record
+        if self.fmt == 'json':
+            entry = {
+                'ts': round(timestamp, 3),
+                'method': method,
+                'path': path,
+                'status': status_code,
+            }
+            if duration_ms is not None:
+                entry['duration_ms'] = round(duration_ms, 2)
+            entry.update(fields)
+            return json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+        color, status_text = _status_style(status_code)
+        line = f"[{method}] {path} → {status_code} {status_text}"
+        if duration_ms is not None:
+            line += f" ({duration_ms:.1f}ms)"
+        return colored(line, color)
+
+    def flush(self):
+        """كتابة كل السجلات المنتظرة"""
+        lines = []
+        while True:
+            try:
+                lines.append(self._format(self._buffer.popleft()))
+            except IndexError:
+                break
+        if lines:
+            stream = self.stream or sys.stdout
+            try:
+                stream.write('\n'.join(lines) + '\n')
+                stream.flush()
+            except (OSError, ValueError):
+                return
+            self.stats_counters['written'] += len(lines)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"[LOGGER] Error writing request log: {e}")
+
+    def stats(self):
+        stats = dict(self.stats_counters)
+        stats['pending'] = len(self._buffer)
+        stats['dedup_entries'] = len(self._dedup)
+        return stats
+
+
+# نسخة مشتركة على مستوى العملية
+request_logger = RequestLogger()
+atexit.register(request_logger.flush)
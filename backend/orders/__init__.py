@@ -0,0 +1 @@
+# Orders package initialization
\ No newline at end of file
@@ -0,0 +1,185 @@
+from bson import ObjectId
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING
+from flask import Blueprint, request, jsonify
+from backend.security.security import get_principal, owner_required
+from .schema import validate_order, serialize_order
+from .queries import build_filter, list_orders, OrderQueryError, DEFAULT_PAGE_SIZE
+from .ingest import (
+    get_orders_collection, order_writer, OrderQueueFull, ORDERS_ACK_MODE, ORDERS_ACK_TIMEOUT, MAX_IDEMPOTENCY_KEY_LENGTH,
+)
+from .pricing import (
+    quote_order, quote_orders, verify_price, pricing_stats, PricingError, PRICING_MAX_BATCH, PRICING_VERIFY,
+)
+
+# إنشاء Blueprint لاستقبال الطلبات
+orders_bp = Blueprint('orders_bp', __name__)
+# إنشاء Blueprint لقائمة طلبات المالك (api/owner/orders في API_PERMISSIONS)
+owner_orders_bp = Blueprint('owner_orders_bp', __name__)
+
+def _busy(message, retry_after):
+    response = jsonify({'status': 'error', 'message': message})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@orders_bp.route('/submit-order', methods=['POST'])
+def submit_order():
+    """
+    استقبال طلب جديد
+
+    الهيدر Idempotency-Key (اختياري) يجعل إعادة الإرسال آمنة: نفس المفتاح من نفس المستخدم
+    يعيد نفس الطلب بدلاً من إنشاء طلب جديد. يُقبل فقط مع مستخدم مسجل لأن المفاتيح
+    محصورة بـ user_id، والطلبات المجهولة كلها تشترك في user_id=None.
+
+    Returns:
+        201 بعد حفظ الطلب (sync)، 202 بعد قبوله في الطابور (async، أو sync بدون مفتاح إذا
+        انتهت مهلة الانتظار)، 200 لطلب مكرر، 503 إذا انتهت المهلة مع Idempotency-Key
+    """
+    principal = get_principal()
+    if principal.token and not principal.is_authenticated:
+        return jsonify({'status': 'error', 'message': principal.error}), 401
+
+    idempotency_key = request.headers.get('Idempotency-Key', '').strip() or None
+    if idempotency_key and len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        return jsonify({'status': 'error', 'message': 'Idempotency-Key is too long'}), 400
+    if idempotency_key and not principal.is_authenticated:
+        # مفتاح مجهول قد يطابق طلب عميل مجهول آخر ويعيد له بيانات ذلك الطلب
+        return jsonify({'status': 'error', 'message': 'Idempotency-Key requires authentication'}), 400
+
+    data = request.get_json(silent=True)
+    order, errors = validate_order(data)
+    if errors:
+        return jsonify({'status': 'error', 'message': 'Invalid order', 'errors': errors}), 400
+
+    # السعر يُحسب على الخادم؛ السعر المرسل من الواجهة يُقارن فقط
+    quote, matches = verify_price(data, order['price'])
+    if not matches:
+        if PRICING_VERIFY == 'reject':
+            return jsonify({'status': 'error', 'message': 'Price has changed', 'quote': quote}), 409
+        order['client_price'] = order['price']
+    order['price'] = quote['price']
+    order['discount'] = quote['discount']
+    order['estimated_time'] = quote['estimated_time']
+    order['user_id'] = ObjectId(principal.user_id) if principal.user_id else None
+    if principal.user:
+        order['client_name'] = principal.user.get('username', '')
+
+    try:
+        ticket, replayed = order_writer.submit(order, idempotency_key)
+    except OrderQueueFull:
+        return _busy('Too many orders are being processed, please retry', 1)
+
+    if ORDERS_ACK_MODE == 'async' and not replayed:
+        return jsonify({'status': 'accepted', 'order': serialize_order(ticket.order)}), 202
+
+    if not ticket.wait(ORDERS_ACK_TIMEOUT):
+        if not idempotency_key:
+            # الطلب ما زال في الطابور وسيُحفظ؛ إعادة الإرسال بدون مفتاح تنشئ طلبًا ثانيًا
+            return jsonify({'status': 'accepted', 'order': serialize_order(ticket.order)}), 202
+        # إعادة المحاولة بنفس المفتاح تعيد نفس الطلب
+        return _busy('Order is still being saved, please retry', 2)
+    if ticket.error:
+        return jsonify({'status': 'error', 'message': ticket.error}), 500
+
+    saved = ticket.order
+    if ticket.duplicate and idempotency_key:
+        # حُفظ طلب بنفس المفتاح سابقًا (في عملية أخرى أو قبل إعادة التشغيل)
+        saved = order_writer.find_existing(order['user_id'], idempotency_key) or saved
+    if replayed or ticket.duplicate:
+        return jsonify({'status': 'success', 'duplicate': True, 'order': serialize_order(saved)}), 200
+    return jsonify({'status': 'success', 'order': serialize_order(saved)}), 201
+
+@orders_bp.route('/orders/quote', methods=['POST'])
+def quote():
+    """
+    تسعير طلب واحد أو دفعة طلبات
+
+    الجسم: طلب واحد بصيغة الواجهة (currentRank, desiredRank, options)
+    أو {"orders": [...]} حتى PRICING_MAX_BATCH طلب
+    """
+    data = request.get_json(silent=True)
+    if isinstance(data, dict) and 'orders' in data:
+        orders = data['orders']
+        if not isinstance(orders, list):
+            return jsonify({'status': 'error', 'message': 'orders must be a list'}), 400
+        if len(orders) > PRICING_MAX_BATCH:
+            return jsonify({'status': 'error', 'message': f'At most {PRICING_MAX_BATCH} orders per request'}), 413
+        return jsonify({'status': 'success', 'quotes': quote_orders(orders)})
+    try:
+        return jsonify({'status': 'success', 'quote': quote_order(data)})
+    except PricingError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+@orders_bp.route('/orders/stats', methods=['GET'])
+@owner_required
+def orders_stats():
+    """إحصائيات طابور الطلبات والتسعير في هذه العملية"""
+    return jsonify({'ingest': order_writer.stats(), 'pricing': pricing_stats()})
+
+def _parse_bool(value):
+    if value is None or value == '':
+        return None
+    if value.lower() in ('true', '1'):
+        return True
+    if value.lower() in ('false', '0'):
+        return False
+    raise OrderQueryError('chat_activity must be true or false')
+
+@owner_orders_bp.route('', methods=['GET'])
+@owner_required
+def owner_list_orders():
+    """
+    قائمة الطلبات للمالك مع التصفية والترتيب والتقسيم إلى صفحات على الخادم
+
+    المعاملات: status (قيمة أو عدة قيم مفصولة بفواصل)، payment_status، chat_activity،
+    booster_id، q (بحث بالبادئة)، sort، direction (asc/desc)، limit، cursor
+    """
+    args = request.args
+    try:
+        query = build_filter(
+            status=args.get('status'),
+            payment_status=args.get('payment_status'),
+            chat_activity=_parse_bool(args.get('chat_activity')),
+            booster_id=args.get('booster_id'),
+            search=args.get('q'),
+        )
+        direction = {'asc': ASCENDING, 'desc': DESCENDING}.get(args.get('direction', '').lower())
+        orders, next_cursor = list_orders(
+            get_orders_collection(),
+            query,
+            sort=args.get('sort', 'created_at'),
+            direction=direction,
+            limit=args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+            cursor=args.get('cursor'),
+        )
+    except OrderQueryError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+    return jsonify({
+        'status': 'success',
+        'orders': [serialize_order(order) for order in orders],
+        'next_cursor': next_cursor,
+    })
+
+@owner_orders_bp.route('/<order_id>', methods=['GET'])
+@owner_required
+def owner_get_order(order_id):
+    """تفاصيل طلب واحد (جميع الحقول)"""
+    try:
+        order = get_orders_collection().find_one({'_id': ObjectId(order_id)}, {'search_keys': 0})
+    except InvalidId:
+        order = None
+    if order is None:
+        return jsonify({'status': 'error', 'message': 'Order not found'}), 404
+    return jsonify({'status': 'success', 'order': serialize_order(order)})
+
+def register_order_endpoints(app, url_prefix='/api'):
+    """
+    تسجيل نقاط نهاية الطلبات مع تطبيق Flask
+
+    Args:
+        app: تطبيق Flask
+        url_prefix: بادئة عنوان URL (افتراضيًا: /api)
+    """
+    app.register_blueprint(orders_bp, url_prefix=url_prefix)
+    app.register_blueprint(owner_orders_bp, url_prefix=f'{url_prefix}/owner/orders')
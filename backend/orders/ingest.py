@@ -0,0 +1,274 @@
+"""
+استقبال الطلبات: طابور كتابة محدود داخل العملية مع إدراج دفعات في مجموعة orders
+
+- خيط الطلب يتحقق من البيانات ثم يضع المستند في طابور محدود ويعود فورًا (async)
+  أو ينتظر حتى يؤكد MongoDB الكتابة (sync، الافتراضي)
+- خيط كتابة واحد لكل عملية يجمع ما يصل خلال ORDERS_FLUSH_INTERVAL_MS (حتى ORDERS_BATCH_SIZE)
+  ويكتبه بعملية insert_many واحدة (ordered=False)، فتتقاسم الطلبات المتزامنة رحلة واحدة إلى القاعدة
+- عند امتلاء الطابور يُرفض الطلب فورًا (503 مع Retry-After) بدلاً من تراكم الخيوط المنتظرة
+- مفاتيح التكرار (Idempotency-Key): خريطة محدودة في الذاكرة للطلبات الحديثة والجارية،
+  وفهرس فريد على (user_id, idempotency_key) يمنع التكرار بين العمليات وبعد إعادة التشغيل
+"""
+import os
+import time
+import queue
+import threading
+from datetime import datetime
+from collections import OrderedDict
+from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import BulkWriteError, PyMongoError
+from backend.observability.metrics import span, record_span
+from backend.db.client import get_collection
+from .schema import search_keys
+
+# sync: الاستجابة بعد تأكيد الكتابة (201)، async: الاستجابة بعد الإضافة إلى الطابور (202)
+ORDERS_ACK_MODE = os.getenv('ORDERS_ACK_MODE', 'sync').lower()
+ORDERS_QUEUE_SIZE = int(os.getenv('ORDERS_QUEUE_SIZE', '10000'))
+ORDERS_BATCH_SIZE = int(os.getenv('ORDERS_BATCH_SIZE', '500'))
+# المدة التي ينتظرها خيط الكتابة لتجميع دفعة بعد وصول أول طلب
+ORDERS_FLUSH_INTERVAL_MS = float(os.getenv('ORDERS_FLUSH_INTERVAL_MS', '5'))
+# أقصى انتظار لتأكيد الكتابة في وضع sync (بالثواني)
+ORDERS_ACK_TIMEOUT = float(os.getenv('ORDERS_ACK_TIMEOUT', '5'))
+# عدد محاولات إعادة كتابة الدفعة عند فشل الاتصال بالقاعدة
+ORDERS_WRITE_RETRIES = int(os.getenv('ORDERS_WRITE_RETRIES', '3'))
+ORDERS_IDEMPOTENCY_CACHE = int(os.getenv('ORDERS_IDEMPOTENCY_CACHE', '10000'))
+MAX_IDEMPOTENCY_KEY_LENGTH = 128
+DUPLICATE_KEY_ERROR = 11000
+
+
+class OrderQueueFull(Exception):
+    """الطابور ممتلئ؛ يجب على العميل إعادة المحاولة لاحقًا"""
+
+
+def get_orders_collection():
+    """مجموعة الطلبات في عميل العملية الحالية (تُقرأ في كل مرة لأن العامل يُنشئ عميلًا جديدًا بعد fork)"""
+    return get_collection('orders')
+
+
+def ensure_order_indexes(collection):
+    """فهرس مفاتيح التكرار الفريد (الطلبات بدون مفتاح غير مشمولة) وفهارس قائمة طلبات المالك"""
+    from .queries import ORDER_LIST_INDEXES
+    collection.create_index(
+        [('user_id', ASCENDING), ('idempotency_key', ASCENDING)],
+        name='user_idempotency_key',
+        unique=True,
+        partialFilterExpression={'idempotency_key': {'$type': 'string'}},
+    )
+    for name, keys in ORDER_LIST_INDEXES:
+        collection.create_index(keys, name=name)
+
+
+class OrderTicket:
+    """طلب في الطابور ينتظر تأكيد الكتابة"""
+    __slots__ = ('order', 'enqueued_at', 'done', 'error', 'duplicate')
+
+    def __init__(self, order):
+        self.order = order
+        self.enqueued_at = time.perf_counter()
+        self.done = threading.Event()
+        self.error = None
+        self.duplicate = False
+
+    def resolve(self, error=None, duplicate=False):
+        self.error = error
+        self.duplicate = duplicate
+        self.done.set()
+        record_span('orders.ack', time.perf_counter() - self.enqueued_at)
+
+    def wait(self, timeout=ORDERS_ACK_TIMEOUT):
+        return self.done.wait(timeout)
+
+
+class OrderWriter:
+    """طابور كتابة محدود مع خيط إدراج دفعات لكل عملية"""
+
+    def __init__(self, collection_factory=get_orders_collection, queue_size=ORDERS_QUEUE_SIZE,
+                 batch_size=ORDERS_BATCH_SIZE, flush_interval=ORDERS_FLUSH_INTERVAL_MS / 1000.0,
+                 retries=ORDERS_WRITE_RETRIES, idempotency_cache=ORDERS_IDEMPOTENCY_CACHE,
+                 on_inserted=None):
+        self.collection_factory = collection_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retries = retries
+        self.idempotency_cache = idempotency_cache
+        self.on_inserted = on_inserted
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._recent = OrderedDict()  # (user_id, key) -> OrderTicket
+        self._recent_lock = threading.Lock()
+        self._writer = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._indexes_ready = False
+        self.stats_counters = {
+            'accepted': 0, 'inserted': 0, 'duplicates': 0, 'replayed': 0,
+            'rejected_full': 0, 'failed': 0, 'batches': 0,
+        }
+
+    def _ensure_writer(self):
+        # الخيط لا ينتقل إلى العمليات الفرعية بعد fork
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._writer = threading.Thread(target=self._run, name='order-writer', daemon=True)
+            self._writer.start()
+            self._pid = os.getpid()
+
+    def submit(self, order, idempotency_key=None):
+        """
+        إضافة طلب إلى طابور الكتابة
+
+        Args:
+            order (dict): مستند الطلب بعد التحقق (بدون _id)
+            idempotency_key (str): مفتاح التكرار الذي أرسله العميل
+
+        Returns:
+            tuple: (OrderTicket، هل هو طلب مكرر لطلب سابق في هذه العملية)
+
+        Raises:
+            OrderQueueFull: إذا كان الطابور ممتلئًا
+        """
+        now = datetime.utcnow()
+        document = {
+            'client_name': '', 'booster_id': None, 'booster_name': '', 'progress': 0,
+            'payment_status': 'pending', 'chat_activity': False,
+            **order,
+            '_id': ObjectId(), 'status': 'pending', 'created_at': now, 'updated_at': now,
+        }
+        document['search_keys'] = search_keys(document)
+        if idempotency_key:
+            document['idempotency_key'] = idempotency_key
+            cache_key = (document.get('user_id'), idempotency_key)
+            with self._recent_lock:
+                previous = self._recent.get(cache_key)
+                # الطلب السابق الفاشل لا يمنع إعادة المحاولة
+                if previous is not None and not (previous.done.is_set() and previous.error):
+                    self._recent.move_to_end(cache_key)
+                    self.stats_counters['replayed'] += 1
+                    return previous, True
+                ticket = OrderTicket(document)
+                self._enqueue(ticket)
+                self._recent[cache_key] = ticket
+                while len(self._recent) > self.idempotency_cache:
+                    self._recent.popitem(last=False)
+            return ticket, False
+
+        ticket = OrderTicket(document)
+        self._enqueue(ticket)
+        return ticket, False
+
+    def _enqueue(self, ticket):
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(ticket)
+        except queue.Full:
+            self.stats_counters['rejected_full'] += 1
+            raise OrderQueueFull()
+        self.stats_counters['accepted'] += 1
+
+    def _next_batch(self):
+        """انتظار أول طلب ثم تجميع ما يصل خلال فترة التجميع"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.flush_interval
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                self.write_batch(batch)
+            except Exception as e:
+                print(f"[ORDERS] Unexpected error writing orders: {e}")
+                for ticket in batch:
+                    if not ticket.done.is_set():
+                        ticket.resolve(error=str(e))
+
+    def write_batch(self, batch):
+        """كتابة دفعة بعملية insert_many واحدة وتأكيد كل طلب فيها"""
+        collection = self.collection_factory()
+        if not self._indexes_ready:
+            try:
+                ensure_order_indexes(collection)
+                self._indexes_ready = True
+            except PyMongoError as e:
+                print(f"[ORDERS] Could not create order indexes: {e}")
+
+        failed = {}
+        attempt = 0
+        while True:
+            try:
+                with span('mongo.orders.insert_many'):
+                    collection.insert_many([ticket.order for ticket in batch], ordered=False)
+                break
+            except BulkWriteError as e:
+                # ordered=False: باقي المستندات كُتبت، الأخطاء لكل مستند على حدة
+                failed = {error['index']: error for error in e.details.get('writeErrors', [])}
+                break
+            except PyMongoError as e:
+                attempt += 1
+                if attempt > self.retries:
+                    self.stats_counters['failed'] += len(batch)
+                    print(f"[ORDERS] Failed to write {len(batch)} orders: {e}")
+                    for ticket in batch:
+                        ticket.resolve(error='Order could not be saved')
+                    return
+                time.sleep(min(0.05 * 2 ** attempt, 1.0))
+
+        self.stats_counters['batches'] += 1
+        inserted = []
+        for index, ticket in enumerate(batch):
+            error = failed.get(index)
+            # خطأ تكرار على _id يعني أن محاولة سابقة لنفس الدفعة كتبت المستند بالفعل
+            if error is None or (error.get('code') == DUPLICATE_KEY_ERROR and '_id' in error.get('keyPattern', {})):
+                inserted.append(ticket.order)
+                ticket.resolve()
+            elif error.get('code') == DUPLICATE_KEY_ERROR:
+                self.stats_counters['duplicates'] += 1
+                ticket.resolve(duplicate=True)
+            else:
+                self.stats_counters['failed'] += 1
+                ticket.resolve(error=error.get('errmsg', 'Order could not be saved'))
+        self.stats_counters['inserted'] += len(inserted)
+        if inserted and self.on_inserted is not None:
+            try:
+                self.on_inserted(inserted)
+            except Exception as e:
+                print(f"[ORDERS] Error in on_inserted callback: {e}")
+
+    def find_existing(self, user_id, idempotency_key):
+        """الطلب المحفوظ سابقًا بنفس مفتاح التكرار (بعد خطأ مفتاح مكرر)"""
+        return self.collection_factory().find_one({'user_id': user_id, 'idempotency_key': idempotency_key})
+
+    def stats(self):
+        stats = dict(self.stats_counters)
+        stats['queued'] = self._queue.qsize()
+        stats['idempotency_entries'] = len(self._recent)
+        stats['ack_mode'] = ORDERS_ACK_MODE
+        return stats
+
+
+def _publish_created(orders):
+    from backend.events.hub import publish_event
+    from .schema import serialize_order
+    for order in orders:
+        audience = ('owner', f"user:{order['user_id']}") if order.get('user_id') else ('owner',)
+        publish_event('order', {'event': 'created', 'order': serialize_order(order)}, audience)
+
+
+# نسخة مشتركة على مستوى العملية
+order_writer = OrderWriter(on_inserted=_publish_created)
@@ -0,0 +1,254 @@
+"""
+محرك التسعير على الخادم (نفس قواعد صفحة BoostingOrder.tsx)
+
+- قيمة الرتبة = المستوى × 4 + القسم (36 قيمة)، والسعر الأساسي 5$ لكل قسم
+- مضاعفات الخيارات متسلسلة، لذلك يُحسب مسبقًا المضاعف الكلي لكل تركيبة خيارات (2^7 = 128)
+- جداول الرتب والأسعار تُحسب مرة واحدة عند التحميل (انظر _build_tables)
+- تسعير دفعة من آلاف الطلبات هو مرور واحد من القراءات في الجداول (quote_orders)، أو عملية
+  متجهة واحدة على مصفوفات الفهارس (price_batch مع NumPy إذا كان مثبتًا)
+- التسعير الفردي يُخزن مؤقتًا (lru_cache)
+"""
+import os
+import math
+from functools import lru_cache
+from .schema import TIERS, DIVISIONS, APEX_TIERS
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+PRICING_PER_DIVISION = float(os.getenv('PRICING_PER_DIVISION', '5'))
+# الخصم المطبق على كل الطلبات (بالنسبة المئوية)
+PRICING_DISCOUNT_PERCENT = float(os.getenv('PRICING_DISCOUNT_PERCENT', '20'))
+PRICING_MAX_BATCH = int(os.getenv('PRICING_MAX_BATCH', '10000'))
+PRICING_CACHE_SIZE = int(os.getenv('PRICING_CACHE_SIZE', '4096'))
+# reprice: يُحفظ سعر الخادم دائمًا، reject: رفض الطلب إذا اختلف السعر المرسل (409)
+PRICING_VERIFY = os.getenv('PRICING_VERIFY', 'reprice').lower()
+# الفرق المسموح بين السعر المرسل من الواجهة وسعر الخادم
+PRICE_TOLERANCE = 0.01
+
+# مضاعفات الخيارات بنفس ترتيب تطبيقها في الواجهة
+OPTION_MULTIPLIERS = (
+    ('priorityBoost', 1.25),
+    ('soloOnly', 1.2),
+    ('streaming', 1.15),
+    ('championsSelection', 1.1),
+    ('duoBoost', 1.3),
+    ('voiceDuo', 1.1),
+    ('ghostDuo', 1.15),
+)
+HOURS_PER_DIVISION = 2
+PRIORITY_TIME_FACTOR = 0.75
+
+TIER_INDEX = {tier: index for index, tier in enumerate(TIERS)}
+DIVISION_INDEX = {division: index for index, division in enumerate(DIVISIONS)}
+RANK_COUNT = len(TIERS) * 4
+OPTION_COUNT = len(OPTION_MULTIPLIERS)
+PRIORITY_BIT = 1
+# (المستوى، القسم) -> فهرس الرتبة؛ المستويات العليا تقبل أي قسم
+RANK_LOOKUP = {
+    (tier, division): TIER_INDEX[tier] * 4 + (0 if tier in APEX_TIERS else DIVISION_INDEX[division])
+    for tier in TIERS
+    for division in (DIVISIONS + (None,) if tier in APEX_TIERS else DIVISIONS)
+}
+OPTION_BITS = tuple((name, 1 << bit) for bit, (name, _) in enumerate(OPTION_MULTIPLIERS))
+
+
+def _frontend_price(divisions, mask):
+    """نفس خطوات الواجهة حرفيًا (ضرب متسلسل، خصم، Math.round) حتى يطابق السعر ما عرضته للعميل"""
+    price = divisions * PRICING_PER_DIVISION
+    for bit, (_, factor) in enumerate(OPTION_MULTIPLIERS):
+        if mask & (1 << bit):
+            price *= factor
+    total = price - price * PRICING_DISCOUNT_PERCENT / 100
+    return price, math.floor(total * 100 + 0.5) / 100
+
+
+def _build_tables():
+    """
+    الجداول المحسوبة مسبقًا:
+    - عدد الأقسام بين كل رتبة حالية ورتبة مطلوبة (36×36)
+    - المضاعف الكلي لكل تركيبة خيارات (128)
+    - السعر قبل الخصم والسعر النهائي لكل عدد أقسام × تركيبة خيارات (36×128)،
+      فيكون تسعير الدفعة مجرد قراءة من الجداول ويطابق التسعير الفردي حتى آخر سنت
+    """
+    divisions = [[max(0, desired - current) for desired in range(RANK_COUNT)] for current in range(RANK_COUNT)]
+    multipliers = []
+    for mask in range(1 << OPTION_COUNT):
+        multiplier = 1.0
+        for bit, (_, factor) in enumerate(OPTION_MULTIPLIERS):
+            if mask & (1 << bit):
+                multiplier *= factor
+        multipliers.append(multiplier)
+    subtotals, prices = [], []
+    for count in range(RANK_COUNT):
+        row = [_frontend_price(count, mask) for mask in range(1 << OPTION_COUNT)]
+        subtotals.append([subtotal for subtotal, _ in row])
+        prices.append([price for _, price in row])
+    return divisions, multipliers, subtotals, prices
+
+
+DIVISION_TABLE, MULTIPLIER_TABLE, SUBTOTAL_TABLE, PRICE_TABLE = _build_tables()
+if np is not None:
+    DIVISION_ARRAY = np.array(DIVISION_TABLE, dtype=np.intp)
+    PRICE_ARRAY = np.array(PRICE_TABLE, dtype=np.float64)
+
+
+class PricingError(ValueError):
+    """بيانات غير صالحة للتسعير"""
+
+
+def rank_index(rank):
+    """فهرس الرتبة في الجداول (المستوى × 4 + القسم)"""
+    if not isinstance(rank, dict):
+        raise PricingError('rank must be an object')
+    tier, division = rank.get('tier'), rank.get('division')
+    # القيم غير النصية (قائمة أو كائن من JSON) لا يمكن البحث بها في الجداول
+    if not isinstance(tier, str) or tier not in TIER_INDEX:
+        raise PricingError('rank.tier must be one of ' + ', '.join(TIERS))
+    if division is not None and not isinstance(division, str):
+        raise PricingError('rank.division must be one of ' + ', '.join(DIVISIONS))
+    index = RANK_LOOKUP.get((tier, division))
+    if index is not None:
+        return index
+    if tier in APEX_TIERS:
+        return TIER_INDEX[tier] * 4
+    raise PricingError('rank.division must be one of ' + ', '.join(DIVISIONS))
+
+
+def options_mask(options):
+    """تحويل الخيارات المفعلة إلى رقم (بت لكل خيار)"""
+    mask = 0
+    if options:
+        for bit, (name, _) in enumerate(OPTION_MULTIPLIERS):
+            if options.get(name):
+                mask |= 1 << bit
+    return mask
+
+
+def encode_order(order):
+    """(فهرس الرتبة الحالية، فهرس الرتبة المطلوبة، رقم الخيارات) لطلب بصيغة الواجهة"""
+    if not isinstance(order, dict):
+        raise PricingError('order must be an object')
+    options = order.get('options') or {}
+    if not isinstance(options, dict):
+        raise PricingError('options must be an object')
+    return rank_index(order.get('currentRank')), rank_index(order.get('desiredRank')), options_mask(options)
+
+
+def _estimated_time(divisions, mask):
+    """نفس نص المدة التقديرية المعروض في الواجهة"""
+    hours = max(1, divisions * HOURS_PER_DIVISION)
+    if mask & PRIORITY_BIT:
+        if hours < 24:
+            return f'~{max(1, int(hours * PRIORITY_TIME_FACTOR))} Hours'
+        days = math.ceil(hours * PRIORITY_TIME_FACTOR / 24)
+        return '~1 Day' if days == 1 else f'~{days} Days'
+    if hours < 24:
+        return f'~{hours} Hours'
+    if hours < 48:
+        return '~1 Day'
+    return f'~{math.ceil(hours / 24)} Days'
+
+
+def _quote(divisions, mask, subtotal, total):
+    return {
+        'divisions': divisions,
+        'base_price': round(divisions * PRICING_PER_DIVISION, 2),
+        'multiplier': round(MULTIPLIER_TABLE[mask], 6),
+        'subtotal': round(subtotal, 2),
+        'discount': PRICING_DISCOUNT_PERCENT,
+        'price': total,
+        'estimated_time': _estimated_time(divisions, mask),
+    }
+
+
+@lru_cache(maxsize=PRICING_CACHE_SIZE)
+def quote_indexes(current, desired, mask):
+    """تسعير طلب واحد من الفهارس (مخزن مؤقتًا)"""
+    divisions = DIVISION_TABLE[current][desired]
+    return _quote(divisions, mask, SUBTOTAL_TABLE[divisions][mask], PRICE_TABLE[divisions][mask])
+
+
+def quote_order(order):
+    """
+    تسعير طلب واحد بصيغة الواجهة (currentRank, desiredRank, options)
+
+    Raises:
+        PricingError: إذا كانت الرتب أو الخيارات غير صالحة
+    """
+    return dict(quote_indexes(*encode_order(order)))
+
+
+def price_batch(current, desired, masks):
+    """
+    تسعير دفعة من الفهارس بعملية متجهة واحدة
+
+    Args:
+        current, desired, masks: قوائم (أو مصفوفات) بنفس الطول
+
+    Returns:
+        list: السعر النهائي لكل طلب بعد الخصم
+    """
+    if np is not None:
+        divisions = DIVISION_ARRAY[np.asarray(current, dtype=np.intp), np.asarray(desired, dtype=np.intp)]
+        return PRICE_ARRAY[divisions, np.asarray(masks, dtype=np.intp)].tolist()
+    return [PRICE_TABLE[DIVISION_TABLE[c][d]][m] for c, d, m in zip(current, desired, masks)]
+
+
+def quote_orders(orders):
+    """
+    تسعير قائمة طلبات بصيغة الواجهة في مرور واحد من القراءات في الجداول
+
+    تحويل JSON إلى مصفوفات NumPy أبطأ من القراءة المباشرة من الجداول، لذلك تُستخدم
+    price_batch فقط عندما تكون الفهارس مصفوفات جاهزة.
+
+    Returns:
+        list: لكل طلب {'price': ...} أو {'error': ...} بنفس الترتيب
+    """
+    results = []
+    lookup, option_bits = RANK_LOOKUP, OPTION_BITS
+    division_table, price_table = DIVISION_TABLE, PRICE_TABLE
+    for order in orders:
+        try:
+            from_rank, to_rank = order['currentRank'], order['desiredRank']
+            c = lookup[from_rank['tier'], from_rank.get('division')]
+            d = lookup[to_rank['tier'], to_rank.get('division')]
+            options = order.get('options') or {}
+            mask = 0
+            for name, bit in option_bits:
+                if options.get(name):
+                    mask |= bit
+        except (KeyError, TypeError, AttributeError):
+            # المسار البطيء فقط لإنتاج رسالة الخطأ (TypeError: مستوى أو قسم غير نصي)
+            try:
+                c, d, mask = encode_order(order)
+            except PricingError as e:
+                results.append({'error': str(e)})
+                continue
+        divisions = division_table[c][d]
+        results.append({'price': price_table[divisions][mask], 'divisions': divisions})
+    return results
+
+
+def verify_price(order, submitted_price):
+    """
+    إعادة تسعير طلب مرسل ومقارنته بالسعر الذي عرضته الواجهة
+
+    Returns:
+        tuple: (عرض السعر من الخادم، هل يطابق السعر المرسل)
+    """
+    quote = quote_order(order)
+    matches = submitted_price is not None and abs(quote['price'] - submitted_price) <= PRICE_TOLERANCE
+    return quote, matches
+
+
+def pricing_stats():
+    info = quote_indexes.cache_info()
+    return {
+        'vectorized': np is not None,
+        'cache_hits': info.hits,
+        'cache_misses': info.misses,
+        'cache_size': info.currsize,
+    }
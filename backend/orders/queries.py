@@ -0,0 +1,171 @@
+"""
+استعلامات قائمة طلبات المالك: التصفية والترتيب والتقسيم إلى صفحات على الخادم
+
+- التقسيم بمؤشر (keyset): كل صفحة تبدأ بعد آخر (قيمة الترتيب، _id) في الصفحة السابقة،
+  فتكلفة الصفحة رقم 1000 مثل تكلفة الصفحة الأولى (بدلاً من skip الذي يمر على كل ما قبلها)
+- _id يكسر التعادل في قيم الترتيب حتى لا يتكرر أو يضيع طلب بين الصفحات
+- الإسقاط (projection) يعيد حقول القائمة فقط
+- البحث بالبادئة في حقل search_keys المفهرس (رقم الطلب وكلمات أسماء العميل والمعزز والخدمة)
+- الفهارس المركبة في ORDER_LIST_INDEXES: حقول المساواة أولاً ثم حقل الترتيب ثم _id
+"""
+import re
+import base64
+from datetime import datetime
+from bson import ObjectId, json_util
+from bson.errors import InvalidId
+from pymongo import ASCENDING, DESCENDING
+from .schema import ORDER_STATUSES, PAYMENT_STATUSES
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 100
+MAX_SEARCH_LENGTH = 64
+
+# حقل الترتيب -> الاتجاه الافتراضي
+SORT_FIELDS = {
+    'created_at': DESCENDING,
+    'price': DESCENDING,
+    'client_name': ASCENDING,
+    'status': ASCENDING,
+}
+
+ORDER_LIST_INDEXES = (
+    ('created_at_id', [('created_at', DESCENDING), ('_id', DESCENDING)]),
+    ('status_created_at_id', [('status', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)]),
+    ('chat_status_created_at_id', [('chat_activity', ASCENDING), ('status', ASCENDING),
+                                   ('created_at', DESCENDING), ('_id', DESCENDING)]),
+    ('price_id', [('price', DESCENDING), ('_id', DESCENDING)]),
+    ('status_price_id', [('status', ASCENDING), ('price', DESCENDING), ('_id', DESCENDING)]),
+    ('client_name_id', [('client_name', ASCENDING), ('_id', ASCENDING)]),
+    ('status_id', [('status', ASCENDING), ('_id', ASCENDING)]),
+    ('search_keys_created_at_id', [('search_keys', ASCENDING), ('created_at', DESCENDING), ('_id', DESCENDING)]),
+)
+
+# حقول القائمة (تفاصيل الخيارات ومفاتيح البحث لا تُعاد)
+LIST_PROJECTION = {
+    'client_name': 1, 'booster_id': 1, 'booster_name': 1, 'service': 1, 'status': 1,
+    'progress': 1, 'price': 1, 'payment_status': 1, 'chat_activity': 1, 'current_rank': 1,
+    'desired_rank': 1, 'estimated_time': 1, 'created_at': 1, 'updated_at': 1,
+}
+
+
+class OrderQueryError(ValueError):
+    """معاملات استعلام غير صالحة"""
+
+
+def _is_cursor_value(value):
+    """قيمة ترتيب بسيطة فقط: لا قواميس (مثل {"$ne": null}) ولا تعابير $regex تصل إلى الشرط"""
+    if value is None or isinstance(value, (str, datetime)):
+        return True
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def encode_cursor(order, field, direction):
+    """مؤشر الصفحة التالية: (حقل الترتيب، الاتجاه، قيمة الترتيب، _id) لآخر طلب في الصفحة"""
+    raw = json_util.dumps([field, direction, order.get(field), order['_id']])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, field, direction):
+    """
+    قراءة مؤشر الصفحة التالية
+
+    Raises:
+        OrderQueryError: إذا كان المؤشر تالفًا أو من ترتيب آخر (حقل أو اتجاه مختلف)
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        data = json_util.loads(raw)
+    except (ValueError, TypeError):
+        raise OrderQueryError('Invalid cursor')
+    if not isinstance(data, list) or len(data) != 4:
+        raise OrderQueryError('Invalid cursor')
+    cursor_field, cursor_direction, value, last_id = data
+    if cursor_field != field or cursor_direction != direction:
+        raise OrderQueryError('Invalid cursor')
+    if not isinstance(last_id, ObjectId) or not _is_cursor_value(value):
+        raise OrderQueryError('Invalid cursor')
+    return value, last_id
+
+
+def _after(field, direction, value, last_id):
+    """شرط "بعد آخر طلب" حسب اتجاه الترتيب (القيم الفارغة null تأتي أولاً تصاعديًا)"""
+    op = '$gt' if direction == ASCENDING else '$lt'
+    if value is None:
+        if direction == ASCENDING:
+            return {'$or': [{field: {'$ne': None}}, {field: None, '_id': {op: last_id}}]}
+        return {field: None, '_id': {op: last_id}}
+    conditions = [{field: {op: value}}, {field: value, '_id': {op: last_id}}]
+    if direction == DESCENDING:
+        conditions.append({field: None})
+    return {'$or': conditions}
+
+
+def build_filter(status=None, payment_status=None, chat_activity=None, booster_id=None, search=None):
+    """
+    بناء شرط التصفية
+
+    Raises:
+        OrderQueryError: إذا كانت القيم غير صالحة
+    """
+    query = {}
+    if status:
+        statuses = status.split(',')
+        if not all(value in ORDER_STATUSES for value in statuses):
+            raise OrderQueryError(f'status must be one of {", ".join(ORDER_STATUSES)}')
+        query['status'] = statuses[0] if len(statuses) == 1 else {'$in': statuses}
+    if payment_status:
+        if payment_status not in PAYMENT_STATUSES:
+            raise OrderQueryError(f'payment_status must be one of {", ".join(PAYMENT_STATUSES)}')
+        query['payment_status'] = payment_status
+    if chat_activity is not None:
+        query['chat_activity'] = chat_activity
+    if booster_id:
+        try:
+            query['booster_id'] = ObjectId(booster_id)
+        except (InvalidId, TypeError):
+            raise OrderQueryError('Invalid booster_id')
+    if search:
+        search = search.strip().lower()
+        if len(search) > MAX_SEARCH_LENGTH:
+            raise OrderQueryError('Search text is too long')
+        if search:
+            # بادئة ثابتة (^) بحساسية لحالة الأحرف = نطاق في الفهرس
+            query['search_keys'] = {'$regex': '^' + re.escape(search)}
+    return query
+
+
+def list_orders(collection, query, sort='created_at', direction=None, limit=DEFAULT_PAGE_SIZE, cursor=None):
+    """
+    صفحة واحدة من الطلبات
+
+    Args:
+        collection: مجموعة orders
+        query (dict): شرط التصفية (من build_filter)
+        sort (str): حقل الترتيب (SORT_FIELDS)
+        direction (int): ASCENDING أو DESCENDING (الافتراضي حسب الحقل)
+        limit (int): حجم الصفحة (حتى MAX_PAGE_SIZE)
+        cursor (str): مؤشر الصفحة التالية من الاستجابة السابقة
+
+    Returns:
+        tuple: (قائمة الطلبات، مؤشر الصفحة التالية أو None)
+    """
+    if sort not in SORT_FIELDS:
+        raise OrderQueryError(f'sort must be one of {", ".join(SORT_FIELDS)}')
+    if direction is None:
+        direction = SORT_FIELDS[sort]
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+
+    if cursor:
+        value, last_id = decode_cursor(cursor, sort, direction)
+        query = {'$and': [query, _after(sort, direction, value, last_id)]} if query else _after(sort, direction, value, last_id)
+
+    documents = list(
+        collection.find(query, LIST_PROJECTION)
+        .sort([(sort, direction), ('_id', direction)])
+        .limit(limit + 1)
+    )
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1], sort, direction)
+    return documents, next_cursor
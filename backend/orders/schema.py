@@ -0,0 +1,169 @@
+"""
+التحقق من بيانات الطلب القادمة من صفحة BoostingOrder / CheckoutFlow وتحويلها إلى مستند MongoDB
+
+الحقول غير المعروفة تُهمل، وبيانات حساب اللعبة (accountDetails) لا تُخزن مع الطلب.
+"""
+
+GAME_TYPES = ('lol', 'valorant', 'wild-rift')
+BOOST_TYPES = ('solo', 'duo')
+TIERS = ('iron', 'bronze', 'silver', 'gold', 'platinum', 'diamond', 'master', 'grandmaster', 'challenger')
+DIVISIONS = ('IV', 'III', 'II', 'I')
+# المستويات التي ليس لها أقسام
+APEX_TIERS = ('master', 'grandmaster', 'challenger')
+BOOLEAN_OPTIONS = (
+    'priorityBoost', 'soloOnly', 'streaming', 'championsSelection',
+    'offlineMode', 'duoBoost', 'voiceDuo', 'ghostDuo',
+)
+LIST_OPTIONS = ('specificRoles', 'specificChampions')
+MAX_LIST_OPTION_ITEMS = 10
+MAX_TEXT_LENGTH = 64
+MAX_PRICE = 100000
+
+ORDER_STATUSES = ('pending', 'in_progress', 'completed', 'cancelled', 'paused')
+PAYMENT_STATUSES = ('paid', 'pending', 'refunded')
+# حقول داخلية لا تُعاد في الاستجابات
+SERIALIZE_SKIPPED_FIELDS = ('_id', 'created_at', 'updated_at', 'search_keys', 'idempotency_key')
+
+
+def rank_value(rank):
+    """قيمة الرتبة كما في الواجهة: المستوى × 4 + القسم"""
+    division = DIVISIONS.index(rank['division']) if rank.get('division') else 0
+    return TIERS.index(rank['tier']) * 4 + division
+
+
+def _text(value, field, errors, required=False):
+    if value is None:
+        if required:
+            errors.append(f'{field} is required')
+        return None
+    if not isinstance(value, str) or not value.strip() or len(value) > MAX_TEXT_LENGTH:
+        errors.append(f'{field} must be a non-empty string of at most {MAX_TEXT_LENGTH} characters')
+        return None
+    return value.strip()
+
+
+def _number(value, field, errors, minimum, maximum, required=False):
+    if value is None:
+        if required:
+            errors.append(f'{field} is required')
+        return None
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not minimum <= value <= maximum:
+        errors.append(f'{field} must be a number between {minimum} and {maximum}')
+        return None
+    return value
+
+
+def _rank(value, field, errors):
+    if not isinstance(value, dict):
+        errors.append(f'{field} is required')
+        return None
+    tier = value.get('tier')
+    division = value.get('division')
+    if tier not in TIERS:
+        errors.append(f'{field}.tier must be one of {", ".join(TIERS)}')
+        return None
+    if tier in APEX_TIERS:
+        division = None
+    elif division not in DIVISIONS:
+        errors.append(f'{field}.division must be one of {", ".join(DIVISIONS)}')
+        return None
+    lp = value.get('lp', 0)
+    if isinstance(lp, bool) or not isinstance(lp, int) or not 0 <= lp <= 100:
+        errors.append(f'{field}.lp must be an integer between 0 and 100')
+        return None
+    return {'tier': tier, 'division': division, 'lp': lp}
+
+
+def _options(value, errors):
+    if value is None:
+        value = {}
+    if not isinstance(value, dict):
+        errors.append('options must be an object')
+        return None
+    options = {}
+    for name in BOOLEAN_OPTIONS:
+        flag = value.get(name, False)
+        if not isinstance(flag, bool):
+            errors.append(f'options.{name} must be a boolean')
+            continue
+        options[name] = flag
+    for name in LIST_OPTIONS:
+        items = value.get(name, [])
+        if (not isinstance(items, list) or len(items) > MAX_LIST_OPTION_ITEMS
+                or not all(isinstance(item, str) and 0 < len(item) <= MAX_TEXT_LENGTH for item in items)):
+            errors.append(f'options.{name} must be a list of at most {MAX_LIST_OPTION_ITEMS} names')
+            continue
+        options[name] = items
+    return options
+
+
+def validate_order(data):
+    """
+    التحقق من بيانات الطلب
+
+    Args:
+        data (dict): جسم الطلب (JSON)
+
+    Returns:
+        tuple: (الحقول بعد التحويل إلى أسماء المستند، قائمة الأخطاء)
+    """
+    if not isinstance(data, dict):
+        return None, ['Request body must be a JSON object']
+
+    errors = []
+    game_type = data.get('gameType', 'lol')
+    if game_type not in GAME_TYPES:
+        errors.append(f'gameType must be one of {", ".join(GAME_TYPES)}')
+    boost_type = data.get('boostType', 'solo')
+    if boost_type not in BOOST_TYPES:
+        errors.append(f'boostType must be one of {", ".join(BOOST_TYPES)}')
+
+    current_rank = _rank(data.get('currentRank'), 'currentRank', errors)
+    desired_rank = _rank(data.get('desiredRank'), 'desiredRank', errors)
+    if current_rank and desired_rank and rank_value(desired_rank) <= rank_value(current_rank):
+        errors.append('desiredRank must be higher than currentRank')
+
+    order = {
+        'game_type': game_type,
+        'boost_type': boost_type,
+        'current_rank': current_rank,
+        'desired_rank': desired_rank,
+        'server': _text(data.get('server'), 'server', errors, required=True),
+        'service': _text(data.get('service'), 'service', errors),
+        'options': _options(data.get('options'), errors),
+        'price': _number(data.get('price'), 'price', errors, 0, MAX_PRICE, required=True),
+        'discount': _number(data.get('discount', 0), 'discount', errors, 0, 100),
+        'estimated_time': _text(data.get('estimatedTime'), 'estimatedTime', errors),
+    }
+    if errors:
+        return None, errors
+    return order, []
+
+
+def search_keys(order):
+    """
+    كلمات البحث بأحرف صغيرة (رقم الطلب، اسم العميل، اسم المعزز، الخدمة)
+
+    تُخزن كمصفوفة مفهرسة فيتم البحث بالبادئة عبر الفهرس بدلاً من فحص كل الطلبات.
+    """
+    keys = {str(order['_id'])}
+    for field in ('client_name', 'booster_name', 'service'):
+        value = order.get(field)
+        if value:
+            value = value.lower()
+            keys.add(value)
+            keys.update(value.split())
+    return sorted(keys)
+
+
+def serialize_order(order):
+    """تحويل مستند الطلب إلى JSON للاستجابة"""
+    result = {key: value for key, value in order.items() if key not in SERIALIZE_SKIPPED_FIELDS}
+    result['id'] = str(order['_id'])
+    for key in ('created_at', 'updated_at'):
+        if order.get(key) is not None:
+            result[key] = order[key].isoformat() + 'Z'
+    for key in ('user_id', 'booster_id'):
+        if result.get(key) is not None:
+            result[key] = str(result[key])
+    return result
@@ -1,10 +1,35 @@
 from flask import Blueprint, request, jsonify, make_response
-from .security import verify_auth_token, secure_api_endpoint
-from .routes import get_route_permission
+from .security import secure_api_endpoint, owner_required, get_auth_stats, get_principal
+from .user_cache import get_cache_stats
+from .token_cache import get_token_cache_stats, get_token_refresh_stats
+from backend.auth.auth import geo_enricher
+from backend.http_client import http_client
+from .routes import get_route_permission, get_role_permission_map, get_permissions_version
 
 # إنشاء Blueprint للمسارات المتعلقة بالأمان
 security_bp = Blueprint('security_bp', __name__)
 
+# الحد الأقصى لعدد المسارات في طلب فحص جماعي واحد
+MAX_ACCESS_BATCH = 100
+# مدة تخزين خريطة الصلاحيات في المتصفح (بالثواني)
+ACCESS_MAP_MAX_AGE = 300
+
+def _etag_matches(if_none_match, etag):
+    """
+    مقارنة ETag مع قيم هيدر If-None-Match (مقارنة ضعيفة كما في RFC 9110)
+
+    Args:
+        if_none_match (str): قيمة الهيدر، قائمة مفصولة بفواصل أو '*'
+        etag (str): الـ ETag الحالي بين علامتي تنصيص
+    """
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == '*' or candidate == etag:
+            return True
+    return False
+
 @security_bp.route('/check-role', methods=['GET'])
 @secure_api_endpoint
 def check_role():
@@ -81,6 +106,69 @@ def access_check(route_path):
     
     return jsonify(response)
 
+@security_bp.route('/access-map', methods=['GET', 'POST'])
+@secure_api_endpoint
+def access_map():
+    """
+    خريطة صلاحيات الصفحات لدور المستخدم الحالي مع نتيجة الفحص لقائمة مسارات اختيارية
+
+    يمكن تمرير المسارات عبر ?paths=a,b أو في جسم الطلب {"paths": [...]}.
+    الاستجابة تعتمد على الدور فقط لذلك يخزنها المتصفح مع ETag ويقرر محليًا عند التنقل.
+    """
+    user_role = get_principal().role
+
+    if request.method == 'POST':
+        paths = (request.get_json(silent=True) or {}).get('paths') or []
+    else:
+        paths = [path for path in request.args.get('paths', '').split(',') if path]
+
+    if not isinstance(paths, list) or len(paths) > MAX_ACCESS_BATCH:
+        return jsonify({'message': f'paths must be a list of at most {MAX_ACCESS_BATCH} items'}), 400
+
+    etag = f'"{get_permissions_version()}-{user_role}"'
+    cacheable = request.method == 'GET'
+
+    if cacheable and _etag_matches(request.headers.get('If-None-Match', ''), etag):
+        response = make_response('', 304)
+    else:
+        decisions = {}
+        for path in paths:
+            required_role = get_route_permission(str(path))
+            decisions[path] = {
+                'access_granted': required_role is None or required_role == user_role,
+                'required_role': required_role
+            }
+        response = jsonify({
+            'user_role': user_role,
+            'version': get_permissions_version(),
+            'rules': get_role_permission_map(user_role),
+            'decisions': decisions
+        })
+
+    if cacheable:
+        response.headers['ETag'] = etag
+        response.headers['Cache-Control'] = f'private, max-age={ACCESS_MAP_MAX_AGE}'
+        # الدور مرتبط بالتوكن، لذلك تختلف الاستجابة باختلاف الكوكيز أو هيدر التصريح
+        response.headers['Vary'] = 'Cookie, Authorization'
+    else:
+        response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@security_bp.route('/cache-stats', methods=['GET'])
+@owner_required
+def cache_stats():
+    """
+    إحصائيات الذاكرة المؤقتة للمستخدمين والتوكنات (للمالك فقط)
+    """
+    return jsonify({
+        'user_cache': get_cache_stats(),
+        'token_cache': get_token_cache_stats(),
+        'token_refresh': get_token_refresh_stats(),
+        'auth': get_auth_stats(),
+        'geo': geo_enricher.stats(),
+        'upstreams': http_client.stats()
+    })
+
 def register_security_endpoints(app, url_prefix='/api/security'):
     """
     تسجيل نقاط نهاية API الأمان مع تطبيق Flask
@@ -1,6 +1,14 @@
 """
 ملف تكوين الوجهات والصلاحيات للوصول
+
+صيغ المسارات المدعومة:
+    'owner/settings'       مسار ثابت
+    'booster/orders/:id'   مقطع متغير يطابق أي قيمة لمقطع واحد
+    'api/owner/*'          يطابق المسار نفسه وجميع المسارات تحته
+عند تطابق أكثر من قاعدة يُختار الأكثر تحديدًا (المقاطع الثابتة أولاً، ثم المتغيرة، ثم *).
 """
+import hashlib
+import functools
 
 # Dictionary of route paths and their required roles
 ROUTE_PERMISSIONS = {
@@ -70,6 +78,116 @@ API_PERMISSIONS = {
     'api/client/payments': 'client',
 }
 
+# أوزان المقاطع عند المفاضلة بين القواعد المتطابقة
+_LITERAL, _PARAM, _WILDCARD, _END = 2, 1, 0, 3
+
+# حجم ذاكرة LRU للمسارات التي تم فحصها
+ROUTE_CACHE_SIZE = 4096
+
+class _RouteNode:
+    """عقدة في شجرة المقاطع"""
+    __slots__ = ('children', 'param', 'wildcard', 'role', 'terminal')
+
+    def __init__(self):
+        self.children = {}
+        self.param = None
+        self.wildcard = None   # (role,) إذا وُجدت قاعدة * عند هذه العقدة
+        self.role = None
+        self.terminal = False
+
+def _split(route_path):
+    return [segment for segment in route_path.strip('/').split('/') if segment]
+
+def _compile(tables):
+    root = _RouteNode()
+    for table in tables:
+        for pattern, role in table.items():
+            node = root
+            segments = _split(pattern)
+            if segments and segments[-1] == '*':
+                segments, wildcard = segments[:-1], True
+            else:
+                wildcard = False
+            for segment in segments:
+                if segment.startswith(':'):
+                    if node.param is None:
+                        node.param = _RouteNode()
+                    node = node.param
+                else:
+                    node = node.children.setdefault(segment, _RouteNode())
+            if wildcard:
+                if node.wildcard is None:
+                    node.wildcard = (role,)
+            elif not node.terminal:
+                # الجدول الأول (الصفحات) له الأولوية كما في الإصدار السابق
+                node.terminal = True
+                node.role = role
+    return root
+
+def _match(node, segments, index):
+    """إرجاع (الوزن، الدور) لأفضل قاعدة مطابقة أو None"""
+    best = None
+    if index == len(segments):
+        if node.terminal:
+            best = ((_END,), node.role)
+    else:
+        candidates = []
+        child = node.children.get(segments[index])
+        if child is not None:
+            candidates.append((_LITERAL, child))
+        if node.param is not None:
+            candidates.append((_PARAM, node.param))
+        for weight, next_node in candidates:
+            result = _match(next_node, segments, index + 1)
+            if result is not None:
+                result = ((weight,) + result[0], result[1])
+                if best is None or result[0] > best[0]:
+                    best = result
+    if node.wildcard is not None:
+        result = ((_WILDCARD,), node.wildcard[0])
+        if best is None or result[0] > best[0]:
+            best = result
+    return best
+
+_route_trie = None
+_permissions_version = None
+_role_maps = {}
+
+def compile_permissions():
+    """بناء شجرة الصلاحيات من الجداول (يجب استدعاؤها بعد أي تعديل على الجداول)"""
+    global _route_trie, _permissions_version
+    _route_trie = _compile((ROUTE_PERMISSIONS, API_PERMISSIONS))
+    # بصمة الجداول تُستخدم كـ ETag حتى يعرف المتصفح متى تتغير الصلاحيات
+    fingerprint = repr((sorted(ROUTE_PERMISSIONS.items()), sorted(API_PERMISSIONS.items())))
+    _permissions_version = hashlib.sha1(fingerprint.encode('utf-8')).hexdigest()[:16]
+    _role_maps.clear()
+    _lookup.cache_clear()
+
+def get_permissions_version():
+    """بصمة جداول الصلاحيات الحالية"""
+    return _permissions_version
+
+def get_role_permission_map(role):
+    """
+    خريطة صلاحيات الصفحات مقيّمة لدور معين
+    
+    Args:
+        role (str): دور المستخدم ('owner', 'booster', 'client', 'anonymous')
+        
+    Returns:
+        dict: {نمط المسار: True إذا كان الوصول مسموحًا}؛ المسارات غير الموجودة عامة
+    """
+    permission_map = _role_maps.get(role)
+    if permission_map is None:
+        permission_map = {pattern: required_role is None or required_role == role for pattern, required_role in ROUTE_PERMISSIONS.items()}
+        _role_maps[role] = permission_map
+    return permission_map
+
+@functools.lru_cache(maxsize=ROUTE_CACHE_SIZE)
+def _lookup(normalized_path):
+    result = _match(_route_trie, normalized_path.split('/') if normalized_path else [], 0)
+    return result[1] if result is not None else None
+
 def get_route_permission(route_path):
     """
     تحديد الصلاحية المطلوبة للوصول إلى مسار معين
@@ -80,23 +198,7 @@ def get_route_permission(route_path):
     Returns:
         str or None: الدور المطلوب للوصول أو None إذا كان مسارًا عامًا
     """
-    # تنظيف المسار
-    route_path = route_path.strip('/')
-    
-    # التحقق مما إذا كان المسار في تكوين مسارات الصفحات
-    if route_path in ROUTE_PERMISSIONS:
-        return ROUTE_PERMISSIONS[route_path]
-    
-    # التحقق مما إذا كان المسار في تكوين مسارات API
-    if route_path in API_PERMISSIONS:
-        return API_PERMISSIONS[route_path]
-    
-    # التعامل مع مسارات API الديناميكية
-    for api_path, role in API_PERMISSIONS.items():
-        if api_path.endswith('/*'):
-            base_path = api_path[:-2]  # إزالة '/*'
-            if route_path.startswith(base_path):
-                return role
-    
-    # إذا لم يتم العثور على مطابقة، اعتبره صفحة عامة
-    return None 
\ No newline at end of file
+    # تنظيف المسار ثم البحث في الشجرة المبنية مسبقًا (مع ذاكرة LRU)
+    return _lookup('/'.join(_split(route_path)))
+
+compile_permissions()
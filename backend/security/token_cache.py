@@ -0,0 +1,121 @@
+"""
+ذاكرة مؤقتة لتوكنات JWT التي تم التحقق منها
+
+المفتاح هو بصمة SHA-256 للتوكن الخام، والقيمة هي الحمولة (payload) بعد فك التشفير.
+تنتهي صلاحية كل عنصر عند قيمة exp الخاصة بالتوكن نفسه، لذلك لا يُقبل توكن منتهي
+الصلاحية من الذاكرة أبدًا. تستخدمها وحدتا auth و security معًا.
+"""
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+import jwt
+from backend.observability.metrics import span
+
+TOKEN_CACHE_MAX_SIZE = int(os.getenv('TOKEN_CACHE_MAX_SIZE', '10000'))
+# الحد الأقصى لبقاء توكن لا يحتوي على exp في الذاكرة
+TOKEN_CACHE_MAX_TTL = int(os.getenv('TOKEN_CACHE_MAX_TTL', '300'))
+
+
+class TokenCache:
+    """ذاكرة LRU محدودة الحجم للحمولات التي تم التحقق من توقيعها"""
+
+    def __init__(self, max_size=TOKEN_CACHE_MAX_SIZE, max_ttl=TOKEN_CACHE_MAX_TTL):
+        self.max_size = max_size
+        self.max_ttl = max_ttl
+        self._entries = OrderedDict()  # {digest: (expires_at, payload)}
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0}
+
+    def decode(self, token, secret):
+        """
+        فك تشفير التوكن مع الاستفادة من الذاكرة
+
+        Args:
+            token (str): توكن JWT الخام
+            secret (str): المفتاح السري
+
+        Returns:
+            dict: نسخة من حمولة التوكن
+
+        Raises:
+            jwt.ExpiredSignatureError, jwt.InvalidTokenError: نفس استثناءات jwt.decode
+        """
+        if isinstance(token, str):
+            raw = token.encode('utf-8')
+        else:
+            raw = token
+        # المفتاح السري جزء من البصمة حتى لا تُقبل حمولة تم التحقق منها بمفتاح آخر
+        digest = hashlib.sha256(raw + b'\x00' + str(secret).encode('utf-8')).digest()
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                # نفس قاعدة jwt.decode: التوكن منتهي الصلاحية عندما exp <= الوقت الحالي
+                if now < entry[0]:
+                    self._entries.move_to_end(digest)
+                    self._stats['hits'] += 1
+                    return dict(entry[1])
+                # انتهت صلاحية التوكن: نحذفه ونترك jwt.decode يرفع الاستثناء المناسب
+                del self._entries[digest]
+                self._stats['expired'] += 1
+            self._stats['misses'] += 1
+
+        with span('jwt.decode'):
+            payload = jwt.decode(token, secret, algorithms=['HS256'])
+
+        exp = payload.get('exp')
+        expires_at = exp if isinstance(exp, (int, float)) else now + self.max_ttl
+        with self._lock:
+            self._entries[digest] = (expires_at, payload)
+            self._entries.move_to_end(digest)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return dict(payload)
+
+    def clear(self):
+        """مسح الذاكرة بالكامل"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """إحصائيات الإصابة والإخفاق في الذاكرة"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# نسخة مشتركة على مستوى العملية
+token_cache = TokenCache()
+
+# عدادات تجديد التوكن في /api/auth/check-token
+_refresh_stats = {'reissued': 0, 'reused': 0}
+_refresh_lock = threading.Lock()
+
+
+def decode_token_cached(token, secret):
+    """فك تشفير توكن JWT مرة واحدة لكل عملية خلال مدة صلاحيته"""
+    return token_cache.decode(token, secret)
+
+
+def get_token_cache_stats():
+    """إحصائيات ذاكرة التوكنات المؤقتة"""
+    return token_cache.stats()
+
+
+def record_token_refresh(reissued):
+    """تسجيل ما إذا تم إصدار توكن جديد أو إعادة استخدام التوكن الحالي"""
+    with _refresh_lock:
+        _refresh_stats['reissued' if reissued else 'reused'] += 1
+
+
+def get_token_refresh_stats():
+    """عدد التوكنات التي أعيد إصدارها مقابل التي أعيد استخدامها"""
+    with _refresh_lock:
+        return dict(_refresh_stats)
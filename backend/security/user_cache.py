@@ -0,0 +1,162 @@
+"""
+طبقة التخزين المؤقت لمستندات المستخدمين
+
+تتكون من مستويين:
+    1. ذاكرة خاصة بالطلب الحالي داخل flask.g (نفس المستخدم لا يُجلب مرتين في الطلب الواحد)
+    2. ذاكرة على مستوى العملية محدودة الحجم ومنتهية الصلاحية (TTL) مفتاحها معرف المستخدم و iat للتوكن
+
+يجب استدعاء invalidate_user بعد أي تعديل على مستند المستخدم في قاعدة البيانات.
+ملاحظة: الإبطال يتم داخل العملية الحالية فقط، أما العمليات الأخرى فتعتمد على مدة TTL.
+"""
+import os
+import time
+import threading
+from collections import OrderedDict
+from flask import g, has_app_context
+
+# مدة صلاحية العنصر بالثواني والحد الأقصى لعدد العناصر
+USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', '30'))
+USER_CACHE_MAX_SIZE = int(os.getenv('USER_CACHE_MAX_SIZE', '10000'))
+
+
+class UserCache:
+    """ذاكرة مؤقتة لمستندات المستخدمين مع إخلاء LRU وانتهاء صلاحية TTL"""
+
+    def __init__(self, ttl=USER_CACHE_TTL, max_size=USER_CACHE_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # {(user_id, iat): (expires_at, user)}
+        self._keys_by_user = {}        # {user_id: set((user_id, iat))}
+        self._lock = threading.Lock()
+        self._stats = {
+            'request_hits': 0,
+            'hits': 0,
+            'misses': 0,
+            'expired': 0,
+            'evictions': 0,
+            'invalidations': 0,
+        }
+
+    def get_user(self, user_id, iat, loader):
+        """
+        إرجاع مستند المستخدم من الذاكرة أو تحميله باستخدام loader
+
+        Args:
+            user_id (str): معرف المستخدم
+            iat: وقت إصدار التوكن (جزء من المفتاح)
+            loader: دالة بدون معاملات تعيد مستند المستخدم من قاعدة البيانات
+
+        Returns:
+            dict or None: مستند المستخدم
+        """
+        user_id = str(user_id)
+
+        # المستوى الأول: ذاكرة الطلب الحالي
+        request_memo = self._request_memo()
+        if request_memo is not None and user_id in request_memo:
+            with self._lock:
+                self._stats['request_hits'] += 1
+            return request_memo[user_id]
+
+        # المستوى الثاني: ذاكرة العملية
+        key = (user_id, iat)
+        now = time.monotonic()
+        user = None
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    user = entry[1]
+                else:
+                    self._remove(key)
+                    self._stats['expired'] += 1
+
+        if user is None:
+            with self._lock:
+                self._stats['misses'] += 1
+            user = loader()
+            # لا نخزن نتيجة فارغة حتى لا يبقى مستخدم جديد "غير موجود"
+            if user is None:
+                return None
+            self._store(key, user, now)
+
+        # نسخة مستقلة لكل طلب حتى لا تتسرب التعديلات بين الطلبات
+        user = dict(user)
+        if request_memo is not None:
+            request_memo[user_id] = user
+        return user
+
+    def invalidate(self, user_id):
+        """حذف جميع النسخ المخزنة لمستخدم معين"""
+        user_id = str(user_id)
+        with self._lock:
+            for key in list(self._keys_by_user.get(user_id, ())):
+                self._remove(key)
+            self._stats['invalidations'] += 1
+
+        request_memo = self._request_memo()
+        if request_memo is not None:
+            request_memo.pop(user_id, None)
+
+    def clear(self):
+        """مسح الذاكرة بالكامل"""
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def stats(self):
+        """إحصائيات الإصابة والإخفاق في الذاكرة"""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        lookups = stats['request_hits'] + stats['hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['request_hits'] + stats['hits']) / lookups, 4) if lookups else 0.0
+        return stats
+
+    def _store(self, key, user, now):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self._entries[key] = (now + self.ttl, user)
+            self._keys_by_user.setdefault(key[0], set()).add(key)
+
+            # إخلاء الأقدم استخدامًا عند تجاوز الحد الأقصى
+            while len(self._entries) > self.max_size:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self._stats['evictions'] += 1
+
+    def _remove(self, key):
+        # يجب استدعاؤها مع الاحتفاظ بالقفل
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+    @staticmethod
+    def _request_memo():
+        if not has_app_context():
+            return None
+        memo = getattr(g, '_user_cache_memo', None)
+        if memo is None:
+            memo = {}
+            g._user_cache_memo = memo
+        return memo
+
+
+# نسخة مشتركة على مستوى العملية
+user_cache = UserCache()
+
+
+def invalidate_user(user_id):
+    """إبطال بيانات المستخدم المخزنة بعد تحديثها في قاعدة البيانات"""
+    user_cache.invalidate(user_id)
+
+
+def get_cache_stats():
+    """إحصائيات ذاكرة المستخدمين المؤقتة"""
+    return user_cache.stats()
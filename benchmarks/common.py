@@ -0,0 +1,67 @@
+"""
+Shared helpers for the benchmark scripts in this directory.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Values used when config.env leaves a setting empty
+BENCH_DEFAULTS = {
+    'SERVER_HOST': '127.0.0.1',
+    'SERVER_PORT': '5000',
+    'DEBUG_MODE': 'false',
+    'JWT_SECRET': 'benchmark-secret',
+    'JWT_EXPIRATION': '86400',
+    'COOKIE_MAX_AGE': '2592000',
+    'COOKIE_SAMESITE': 'Lax',
+    'COOKIE_PATH': '/',
+    'CORS_ALLOW_CREDENTIALS': 'true',
+    'MONGODB_URI': 'mongodb://127.0.0.1:27017/?serverSelectionTimeoutMS=2000',
+}
+
+
+def prepare_environment(**overrides):
+    """Fill in settings before the app is imported and put the repo root on sys.path"""
+    for key, value in BENCH_DEFAULTS.items():
+        if not os.environ.get(key):
+            os.environ[key] = value
+    for key, value in overrides.items():
+        os.environ[key] = str(value)
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+
+
+def use_mongomock(*modules, mongodb_uri=None):
+    """
+    Point the users collection of the given modules at a local mongod
+    (when mongodb_uri is set) or at an in-memory mongomock database
+    (pip install mongomock).
+    """
+    if mongodb_uri:
+        from pymongo import MongoClient
+        client = MongoClient(mongodb_uri)
+    else:
+        import mongomock
+        client = mongomock.MongoClient()
+    db = client.get_database('elo_boost_pro_bench')
+    for module in modules:
+        module.users_collection = db.users
+    return db
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(label, samples_ms):
+    """Print p50/p95/p99 for a list of latencies in milliseconds"""
+    print(f"{label:<32} n={len(samples_ms):<6} "
+          f"p50={percentile(samples_ms, 0.50):8.2f}ms "
+          f"p95={percentile(samples_ms, 0.95):8.2f}ms "
+          f"p99={percentile(samples_ms, 0.99):8.2f}ms")
@@ -0,0 +1,158 @@
+"""
+Throughput of the development launcher (app.run, one process) against the
+production launcher (wsgi.py: gunicorn gthread workers, or waitress).
+
+Each server is started as a subprocess on its own port, then hit by
+--clients concurrent keep-alive connections for --seconds per route:
+
+  /api/hello              small JSON response
+  /                       SPA index.html
+  /<main bundle>          largest static/js file, Accept-Encoding: br
+
+    python benchmarks/load_test.py --clients 32 --seconds 5 --workers 4 --threads 4
+
+The client is itself Python; on small machines run it on a separate host
+(--skip-launch --url http://host:port) so it does not compete with the server.
+"""
+import os
+import sys
+import time
+import argparse
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+
+from common import ROOT, prepare_environment, percentile
+
+
+def find_main_bundle():
+    folder = os.path.join(ROOT, 'build', 'static', 'js')
+    if not os.path.isdir(folder):
+        return None
+    bundles = [name for name in os.listdir(folder) if name.endswith('.js')]
+    if not bundles:
+        return None
+    largest = max(bundles, key=lambda name: os.path.getsize(os.path.join(folder, name)))
+    return f'/static/js/{largest}'
+
+
+def launch(kind, port, args):
+    env = dict(os.environ, SERVER_PORT=str(port), SERVER_HOST='127.0.0.1',
+               WEB_WORKERS=str(args.workers), WEB_THREADS=str(args.threads),
+               STATIC_WATCH='false', REQUEST_LOG_SAMPLE_RATE='0')
+    if kind == 'dev':
+        # what `python server.py` does after the frontend build
+        command = [sys.executable, '-c',
+                   'import server; server.app.run(host="127.0.0.1", port=%d, debug=False, use_reloader=False)' % port]
+    else:
+        command = [sys.executable, os.path.join(ROOT, 'wsgi.py')]
+    process = subprocess.Popen(command, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            connection.request('GET', '/api/hello')
+            connection.getresponse().read()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f'{kind} server did not start on port {port}')
+
+
+def stop(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def hammer(base_url, path, headers, clients, seconds):
+    """Run `clients` keep-alive connections against one path; return (requests, errors, latencies_ms)"""
+    parts = urlsplit(base_url)
+    stop_at = time.perf_counter() + seconds
+    results = []
+    lock = threading.Lock()
+
+    def client():
+        connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+        latencies, errors = [], 0
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                if response.status >= 400:
+                    errors += 1
+            except (OSError, http.client.HTTPException):
+                errors += 1
+                connection.close()
+                connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=10)
+                continue
+            latencies.append((time.perf_counter() - started) * 1000)
+        connection.close()
+        with lock:
+            results.append((latencies, errors))
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    latencies = [value for samples, _ in results for value in samples]
+    errors = sum(count for _, count in results)
+    return len(latencies) / elapsed, errors, latencies
+
+
+def run_routes(label, base_url, args):
+    routes = [('/api/hello', {}), ('/', {'Accept-Encoding': 'gzip, br'})]
+    bundle = find_main_bundle()
+    if bundle:
+        routes.append((bundle, {'Accept-Encoding': 'gzip, br'}))
+    rows = []
+    for path, headers in routes:
+        rate, errors, latencies = hammer(base_url, path, headers, args.clients, args.seconds)
+        rows.append((path, rate))
+        print(f"{label:<12} {path[:36]:<38} {rate:9.0f} req/s  "
+              f"p50={percentile(latencies, 0.50):7.2f}ms p99={percentile(latencies, 0.99):7.2f}ms errors={errors}")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--workers', type=int, default=max(2, os.cpu_count() or 2))
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--port', type=int, default=5601)
+    parser.add_argument('--skip-launch', action='store_true', help='only load-test --url')
+    parser.add_argument('--url', default=None)
+    args = parser.parse_args()
+
+    prepare_environment()
+
+    if args.skip_launch:
+        run_routes('target', args.url or f'http://127.0.0.1:{args.port}', args)
+        return
+
+    results = {}
+    for kind, port in (('dev', args.port), ('production', args.port + 1)):
+        process = launch(kind, port, args)
+        try:
+            results[kind] = run_routes(kind, f'http://127.0.0.1:{port}', args)
+        finally:
+            stop(process)
+
+    print()
+    for (path, before), (_, after) in zip(results['dev'], results['production']):
+        print(f"{path[:36]:<38} {before:9.0f} -> {after:9.0f} req/s  ({after / before if before else 0:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+End-to-end latency of the Discord/Google OAuth callbacks against stubbed
+providers and mongomock (or a local mongod via --mongodb-uri).
+
+    python benchmarks/oauth_callback_bench.py --requests 200 --token-delay 0.15 --user-delay 0.1 --geo-delay 0.12
+
+The "serial reference" line is the sum of the stub delays, i.e. the floor of
+the previous implementation that ran every stage (including the geo lookup)
+one after another.
+"""
+import time
+import argparse
+
+from common import prepare_environment, use_mongomock, summarize
+from stub_providers import start_stub_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=100)
+    parser.add_argument('--token-delay', type=float, default=0.15)
+    parser.add_argument('--user-delay', type=float, default=0.10)
+    parser.add_argument('--geo-delay', type=float, default=0.12)
+    parser.add_argument('--returning-users', type=float, default=0.5,
+                        help='fraction of logins from users that already exist')
+    parser.add_argument('--mongodb-uri', default=None)
+    args = parser.parse_args()
+
+    stub, stub_url = start_stub_server(0, args.token_delay, args.user_delay, args.geo_delay)
+    prepare_environment(
+        IPINFO_API_URL=f'{stub_url}/ipinfo',
+        PUBLIC_IP_API_URL=f'{stub_url}/ipify',
+        GEO_CACHE_TTL=0,  # every login pays for a lookup, as the old code did
+    )
+
+    import server
+    from backend.auth import auth
+    from backend.security import security
+
+    use_mongomock(auth, security, mongodb_uri=args.mongodb_uri)
+    auth.DISCORD_TOKEN_URL = f'{stub_url}/discord/token'
+    auth.DISCORD_USER_URL = f'{stub_url}/discord/users/@me'
+    auth.GOOGLE_TOKEN_URL = f'{stub_url}/google/token'
+    auth.GOOGLE_USER_V1_URL = f'{stub_url}/google/userinfo'
+
+    client = server.app.test_client()
+    returning = max(1, int(args.requests * args.returning_users))
+
+    for provider in ('discord', 'google'):
+        samples = []
+        for i in range(args.requests):
+            code = f'{provider}-{i % returning if i >= returning else i}'
+            started = time.perf_counter()
+            response = client.get(f'/api/auth/{provider}/callback?code={code}',
+                                  headers={'X-Forwarded-For': f'198.51.100.{i % 250}'})
+            samples.append((time.perf_counter() - started) * 1000)
+            assert response.status_code == 302, response.status_code
+        summarize(f'{provider} callback', samples)
+
+    serial_ms = (args.token_delay + args.user_delay + args.geo_delay) * 1000
+    print(f"{'serial reference (stub delays)':<32} {serial_ms:.2f}ms")
+    auth.geo_enricher.join()
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Sustained orders/sec and acknowledgement latency of POST /api/submit-order.
+
+Concurrent signed-in clients submit valid orders (a share of them retried with
+the same Idempotency-Key) against three writer configurations:
+
+  one-by-one    batch size 1: one insert per order, as a plain insert_one handler would do
+  sync batch    write-behind queue, response after insert_many is acknowledged (default)
+  async         write-behind queue, response as soon as the order is queued
+
+By default orders go to an in-memory stub collection that only enforces the
+idempotency index and waits --rtt-ms per insert call, standing in for the
+MongoDB round trip; this isolates the cost of the ingestion path itself.
+--mongomock uses mongomock instead (its unique-index check scans every stored
+document, so it slows down as orders accumulate), --mongodb-uri a real mongod.
+
+For every mode the final table reports requests/s, sustained orders/s (stored
+orders over the time until the queue has drained, so async is not credited
+for orders that are still queued), p50/p99 acknowledgement latency and the
+number of insert calls.
+
+    python benchmarks/order_ingest_bench.py --clients 32 --orders 200 --rtt-ms 1
+"""
+import time
+import uuid
+import datetime
+import random
+import argparse
+import threading
+
+from common import prepare_environment, use_mongomock, summarize, percentile
+
+ORDER = {
+    'gameType': 'lol',
+    'boostType': 'solo',
+    'currentRank': {'tier': 'silver', 'division': 'I', 'lp': 0},
+    'desiredRank': {'tier': 'gold', 'division': 'IV', 'lp': 0},
+    'server': 'Europe West',
+    'options': {'priorityBoost': True, 'soloOnly': False},
+    'price': 4.0,
+    'discount': 20,
+}
+
+
+class StubOrdersCollection:
+    """In-memory orders collection: unique (user_id, idempotency_key) and a fixed round trip per insert"""
+
+    def __init__(self, rtt):
+        self._rtt = rtt
+        self._documents = {}
+        self._keys = set()
+        self._lock = threading.Lock()
+
+    def create_index(self, *args, **kwargs):
+        return kwargs.get('name')
+
+    def insert_many(self, documents, ordered=True):
+        from pymongo.errors import BulkWriteError
+        time.sleep(self._rtt)
+        errors = []
+        with self._lock:
+            for index, document in enumerate(documents):
+                key = (document.get('user_id'), document.get('idempotency_key'))
+                if key[1] is not None and key in self._keys:
+                    errors.append({'index': index, 'code': 11000, 'errmsg': 'duplicate key',
+                                   'keyPattern': {'user_id': 1, 'idempotency_key': 1}})
+                    continue
+                if key[1] is not None:
+                    self._keys.add(key)
+                self._documents[document['_id']] = document
+        if errors:
+            raise BulkWriteError({'writeErrors': errors})
+
+    def find_one(self, query):
+        with self._lock:
+            for document in self._documents.values():
+                if all(document.get(field) == value for field, value in query.items()):
+                    return document
+        return None
+
+    def count_documents(self, query):
+        return len(self._documents)
+
+
+class DelayedCollection:
+    """Adds a fixed round-trip delay to insert calls"""
+
+    def __init__(self, collection, rtt):
+        self._collection = collection
+        self._rtt = rtt
+
+    def insert_many(self, *args, **kwargs):
+        time.sleep(self._rtt)
+        return self._collection.insert_many(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+
+def create_clients(db, secret, count):
+    """One signed-in user per client thread (Idempotency-Key is only accepted with a user)"""
+    import jwt
+    tokens = []
+    now = datetime.datetime.utcnow()
+    for index in range(count):
+        user_id = db.users.insert_one({'username': f'bench-client-{index}'}).inserted_id
+        tokens.append(jwt.encode({'sub': str(user_id), 'iat': now, 'exp': now + datetime.timedelta(hours=1)},
+                                 secret, algorithm='HS256'))
+    return tokens
+
+
+def run(label, app, tokens, orders_per_client, retry_share):
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+
+    def client(token):
+        test_client = app.test_client()
+        headers = {'Authorization': f'Bearer {token}'}
+        samples, seen = [], {}
+        for _ in range(orders_per_client):
+            key = str(uuid.uuid4())
+            repeats = 2 if random.random() < retry_share else 1
+            for _ in range(repeats):
+                started = time.perf_counter()
+                response = test_client.post('/api/submit-order', json=ORDER,
+                                            headers=dict(headers, **{'Idempotency-Key': key}))
+                samples.append((time.perf_counter() - started) * 1000)
+                seen[response.status_code] = seen.get(response.status_code, 0) + 1
+        with lock:
+            latencies.extend(samples)
+            for status, count in seen.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=client, args=(token,)) for token in tokens]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    summarize(f'{label} ack latency', latencies)
+    print(f"{'':<32} {len(latencies) / elapsed:8.0f} requests/s  statuses={dict(sorted(statuses.items()))}")
+    return started, elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--orders', type=int, default=200, help='orders per client')
+    parser.add_argument('--retry-share', type=float, default=0.1, help='share of orders sent twice')
+    parser.add_argument('--rtt-ms', type=float, default=None,
+                        help='simulated insert round trip (default 1ms; 0 with --mongodb-uri)')
+    parser.add_argument('--mongomock', action='store_true', help='store orders in mongomock')
+    parser.add_argument('--mongodb-uri', default=None)
+    args = parser.parse_args()
+
+    prepare_environment(REQUEST_LOG_SAMPLE_RATE=0, REQUEST_LOG_DEDUP_WINDOW=3600)
+    import server
+    from backend.auth import auth
+    from backend.security import security
+    from backend.orders import api, ingest
+
+    db = use_mongomock(auth, security, mongodb_uri=args.mongodb_uri)
+    rtt = (args.rtt_ms if args.rtt_ms is not None else (0 if args.mongodb_uri else 1)) / 1000.0
+    tokens = create_clients(db, security.JWT_SECRET, args.clients)
+
+    rows = []
+    configurations = (
+        ('one-by-one', 'sync', 1),
+        ('sync batch', 'sync', ingest.ORDERS_BATCH_SIZE),
+        ('async', 'async', ingest.ORDERS_BATCH_SIZE),
+    )
+    for label, ack_mode, batch_size in configurations:
+        if args.mongodb_uri or args.mongomock:
+            db.orders.drop()
+            collection = DelayedCollection(db.orders, rtt) if rtt else db.orders
+        else:
+            collection = StubOrdersCollection(rtt)
+        writer = ingest.OrderWriter(collection_factory=lambda: collection, batch_size=batch_size,
+                                    flush_interval=0 if batch_size == 1 else ingest.ORDERS_FLUSH_INTERVAL_MS / 1000.0)
+        api.order_writer = writer
+        api.ORDERS_ACK_MODE = ack_mode
+        started, elapsed, latencies = run(label, server.app, tokens, args.orders, args.retry_share)
+        # async orders are acknowledged before they are written; wait for the queue to drain
+        while True:
+            stats = writer.stats()
+            if stats['inserted'] + stats['duplicates'] + stats['failed'] >= stats['accepted']:
+                break
+            time.sleep(0.001)
+        drained = time.perf_counter() - started
+        stats = writer.stats()
+        stored = collection.count_documents({})
+        print(f"{'':<32} stored={stored} batches={stats['batches']} "
+              f"replayed={stats['replayed']} rejected={stats['rejected_full']}")
+        rows.append((label, len(latencies) / elapsed, stored / drained,
+                     percentile(latencies, 0.50), percentile(latencies, 0.99), stats['batches']))
+
+    print()
+    print(f"{'mode':<12} {'requests/s':>11} {'orders/s':>9} {'p50 ack':>9} {'p99 ack':>9} {'inserts':>8}")
+    for label, requests_per_second, orders_per_second, p50, p99, inserts in rows:
+        print(f"{label:<12} {requests_per_second:11.0f} {orders_per_second:9.0f} "
+              f"{p50:7.2f}ms {p99:7.2f}ms {inserts:8}")
+
+
+if __name__ == '__main__':
+    main()
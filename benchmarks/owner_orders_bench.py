@@ -0,0 +1,170 @@
+"""
+Seed the orders collection and measure owner order-list page latency.
+
+Inserts --count synthetic orders (default one million) with the fields the
+owner dashboards filter on, creates the list indexes, then times pages of
+backend.orders.queries.list_orders for common dashboard queries:
+
+  keyset page N   walking --pages pages with the returned cursor
+  skip page N     the same depth with skip/limit, for comparison
+  load everything the previous behaviour: fetch every order and filter in Python
+
+With a real mongod each query shape also prints the winning plan from
+explain(): the index used and how many keys/documents were examined.
+
+    python benchmarks/owner_orders_bench.py --mongodb-uri mongodb://127.0.0.1:27017 --count 1000000
+    python benchmarks/owner_orders_bench.py --mongomock --count 20000
+"""
+import time
+import random
+import argparse
+from datetime import datetime, timedelta
+
+from common import prepare_environment, summarize
+
+STATUS_WEIGHTS = (('pending', 15), ('in_progress', 30), ('completed', 45), ('cancelled', 7), ('paused', 3))
+SERVICES = ('Rank Boost', 'Duo Boost', 'Placement Matches', 'Coaching', 'Win Boost')
+FIRST_NAMES = ('john', 'sara', 'mohamed', 'lina', 'alex', 'omar', 'nora', 'ali', 'maya', 'yusuf')
+
+
+def generate_orders(count, seed=7):
+    from bson import ObjectId
+    from backend.orders.schema import TIERS, DIVISIONS, search_keys
+    rng = random.Random(seed)
+    statuses = [status for status, weight in STATUS_WEIGHTS for _ in range(weight)]
+    clients = [f'{rng.choice(FIRST_NAMES)}{number}' for number in range(5000)]
+    boosters = [(ObjectId(), f'Booster{number}') for number in range(200)]
+    now = datetime.utcnow()
+    for _ in range(count):
+        created_at = now - timedelta(seconds=rng.randrange(365 * 24 * 3600))
+        booster_id, booster_name = rng.choice(boosters)
+        status = rng.choice(statuses)
+        tier = rng.randrange(len(TIERS) - 4)
+        order = {
+            '_id': ObjectId(),
+            'user_id': ObjectId(),
+            'client_name': rng.choice(clients),
+            'booster_id': booster_id if status != 'pending' else None,
+            'booster_name': booster_name if status != 'pending' else '',
+            'service': rng.choice(SERVICES),
+            'status': status,
+            'progress': 100 if status == 'completed' else rng.randrange(100),
+            'price': round(rng.uniform(5, 400), 2),
+            'payment_status': 'paid' if status != 'pending' else rng.choice(('paid', 'pending')),
+            'chat_activity': rng.random() < 0.2,
+            'current_rank': {'tier': TIERS[tier], 'division': rng.choice(DIVISIONS), 'lp': 0},
+            'desired_rank': {'tier': TIERS[tier + 1], 'division': rng.choice(DIVISIONS), 'lp': 0},
+            'estimated_time': '~1 Day',
+            'options': {'priorityBoost': rng.random() < 0.3, 'soloOnly': rng.random() < 0.3},
+            'created_at': created_at,
+            'updated_at': created_at,
+        }
+        order['search_keys'] = search_keys(order)
+        yield order
+
+
+def seed(collection, count, batch_size=10000):
+    started = time.perf_counter()
+    batch = []
+    for order in generate_orders(count):
+        batch.append(order)
+        if len(batch) == batch_size:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+    print(f"seeded {count} orders in {time.perf_counter() - started:.1f}s")
+
+
+def timed_pages(label, collection, query, pages, **kwargs):
+    from backend.orders.queries import list_orders
+    samples, cursor = [], None
+    for _ in range(pages):
+        started = time.perf_counter()
+        documents, cursor = list_orders(collection, dict(query), cursor=cursor, **kwargs)
+        samples.append((time.perf_counter() - started) * 1000)
+        if cursor is None:
+            break
+    summarize(label, samples)
+    return samples
+
+
+def explain(label, collection, query, sort, direction):
+    try:
+        plan = collection.find(query).sort([(sort, direction), ('_id', direction)]).limit(25).explain()
+    except Exception:
+        return
+    stats = plan.get('executionStats', {})
+    stage = plan.get('queryPlanner', {}).get('winningPlan', {})
+    indexes = []
+    while stage:
+        if stage.get('indexName'):
+            indexes.append(stage['indexName'])
+        stage = stage.get('inputStage') or (stage.get('inputStages') or [None])[0]
+    print(f"  explain {label:<24} index={','.join(indexes) or 'COLLSCAN'} "
+          f"keys={stats.get('totalKeysExamined')} docs={stats.get('totalDocsExamined')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--count', type=int, default=1000000)
+    parser.add_argument('--pages', type=int, default=40)
+    parser.add_argument('--mongodb-uri', default=None)
+    parser.add_argument('--mongomock', action='store_true')
+    parser.add_argument('--skip-seed', action='store_true', help='reuse orders from a previous run')
+    parser.add_argument('--naive-limit', type=int, default=200000,
+                        help='only time "load everything" up to this many orders')
+    args = parser.parse_args()
+
+    prepare_environment()
+    from pymongo import ASCENDING, DESCENDING
+    from backend.orders.ingest import ensure_order_indexes
+    from backend.orders.queries import build_filter, LIST_PROJECTION
+
+    if args.mongomock:
+        import mongomock
+        client = mongomock.MongoClient()
+    else:
+        from pymongo import MongoClient
+        import os
+        client = MongoClient(args.mongodb_uri or os.environ['MONGODB_URI'])
+    collection = client.get_database('elo_boost_pro_bench').orders
+
+    if not args.skip_seed:
+        collection.drop()
+        seed(collection, args.count)
+    started = time.perf_counter()
+    ensure_order_indexes(collection)
+    print(f"indexes ready in {time.perf_counter() - started:.1f}s")
+
+    shapes = (
+        ('newest first', {}, 'created_at', DESCENDING),
+        ('status=in_progress', build_filter(status='in_progress'), 'created_at', DESCENDING),
+        ('chat + status', build_filter(status='in_progress', chat_activity=True), 'created_at', DESCENDING),
+        ('search "sara"', build_filter(search='sara'), 'created_at', DESCENDING),
+        ('price high-low', {}, 'price', DESCENDING),
+        ('client name a-z', {}, 'client_name', ASCENDING),
+    )
+    for label, query, sort, direction in shapes:
+        timed_pages(f'keyset {label}', collection, query, args.pages, sort=sort, direction=direction)
+        explain(label, collection, query, sort, direction)
+
+    depth = args.pages * 25
+    samples = []
+    for _ in range(5):
+        started = time.perf_counter()
+        list(collection.find({}, LIST_PROJECTION).sort([('created_at', DESCENDING), ('_id', DESCENDING)])
+             .skip(depth).limit(25))
+        samples.append((time.perf_counter() - started) * 1000)
+    summarize(f'skip page at offset {depth}', samples)
+
+    if args.count <= args.naive_limit:
+        started = time.perf_counter()
+        everything = list(collection.find({}))
+        matches = [order for order in everything if order['status'] == 'in_progress' and order['chat_activity']]
+        print(f"load everything + filter: {(time.perf_counter() - started) * 1000:.0f}ms "
+              f"for {len(everything)} orders ({len(matches)} matches)")
+
+
+if __name__ == '__main__':
+    main()
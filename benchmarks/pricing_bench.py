@@ -0,0 +1,97 @@
+"""
+Pricing throughput: the BoostingOrder.tsx formula evaluated order by order
+against backend.orders.pricing (precomputed tables: batch lookups from JSON
+orders, price_batch on index arrays with and without NumPy), plus one
+POST /api/orders/quote with a full batch.
+
+    python benchmarks/pricing_bench.py --orders 10000
+"""
+import math
+import time
+import random
+import argparse
+
+from common import prepare_environment
+
+RANK_VALUES = {'iron': 0, 'bronze': 1, 'silver': 2, 'gold': 3, 'platinum': 4,
+               'diamond': 5, 'master': 6, 'grandmaster': 7, 'challenger': 8}
+DIVISION_VALUES = {'IV': 0, 'III': 1, 'II': 2, 'I': 3, None: 0}
+
+
+def naive_price(order):
+    """Line-by-line port of the price calculation in BoostingOrder.tsx"""
+    current = RANK_VALUES[order['currentRank']['tier']] * 4 + DIVISION_VALUES[order['currentRank']['division']]
+    desired = RANK_VALUES[order['desiredRank']['tier']] * 4 + DIVISION_VALUES[order['desiredRank']['division']]
+    price = max(0, (desired - current) * 5)
+    options = order['options']
+    if options.get('priorityBoost'): price *= 1.25
+    if options.get('soloOnly'): price *= 1.2
+    if options.get('streaming'): price *= 1.15
+    if options.get('championsSelection'): price *= 1.1
+    if options.get('duoBoost'): price *= 1.3
+    if options.get('voiceDuo'): price *= 1.1
+    if options.get('ghostDuo'): price *= 1.15
+    total = price - price * 20 / 100
+    return math.floor(total * 100 + 0.5) / 100  # Math.round(total * 100) / 100
+
+
+def random_orders(count):
+    from backend.orders.schema import TIERS, DIVISIONS, APEX_TIERS, BOOLEAN_OPTIONS
+    orders = []
+    for _ in range(count):
+        ranks = []
+        for _ in range(2):
+            tier = random.choice(TIERS)
+            ranks.append({'tier': tier, 'division': None if tier in APEX_TIERS else random.choice(DIVISIONS)})
+        orders.append({
+            'currentRank': ranks[0],
+            'desiredRank': ranks[1],
+            'options': {name: random.random() < 0.3 for name in BOOLEAN_OPTIONS},
+        })
+    return orders
+
+
+def timed(label, count, function):
+    started = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<36} {elapsed * 1000:8.2f}ms  {count / elapsed:12.0f} orders/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--orders', type=int, default=10000)
+    args = parser.parse_args()
+
+    prepare_environment(REQUEST_LOG_SAMPLE_RATE=0)
+    from backend.orders import pricing
+
+    orders = random_orders(args.orders)
+    expected = timed('per-order formula (frontend port)', args.orders, lambda: [naive_price(o) for o in orders])
+
+    quotes = timed('quote_orders (table lookups)', args.orders, lambda: pricing.quote_orders(orders))
+    assert [q['price'] for q in quotes] == expected
+
+    encoded = [pricing.encode_order(o) for o in orders]
+    current, desired, masks = (list(column) for column in zip(*encoded))
+    numpy_module = pricing.np
+    if numpy_module is not None:
+        arrays = [numpy_module.asarray(column) for column in (current, desired, masks)]
+        timed('price_batch on arrays (NumPy)', args.orders, lambda: pricing.price_batch(*arrays))
+    pricing.np = None
+    timed('price_batch on lists (pure Python)', args.orders, lambda: pricing.price_batch(current, desired, masks))
+    pricing.np = numpy_module
+
+    timed('quote_order, cached (single)', args.orders, lambda: [pricing.quote_order(o) for o in orders])
+
+    import server
+    client = server.app.test_client()
+    batch = orders[:pricing.PRICING_MAX_BATCH]
+    response = timed(f'POST /api/orders/quote ({len(batch)})', len(batch),
+                     lambda: client.post('/api/orders/quote', json={'orders': batch}))
+    assert response.status_code == 200, response.status_code
+
+
+if __name__ == '__main__':
+    main()
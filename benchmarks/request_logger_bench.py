@@ -0,0 +1,113 @@
+"""
+Per-request overhead of the request logger on the request thread.
+
+"legacy" is the previous ColoredLogger.request (any() scans, termcolor and a
+synchronous print, unbounded dedup dict); "async" is
+backend.observability.request_log.RequestLogger, whose formatting and
+writing happen on its background thread. Output goes to os.devnull so only
+the cost paid by the request thread is compared.
+
+    python benchmarks/request_logger_bench.py --calls 200000 --paths 5000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+from common import prepare_environment
+
+
+class LegacyLogger:
+    """ColoredLogger.request as it was before the async logger"""
+    IGNORED_PATHS = [
+        'favicon.ico', 'manifest.json', 'static/', 'images/', 'logo192.png',
+        'favicon-sw.js', '.js', '.css', '.png', '.jpg', '.svg'
+    ]
+    last_logged = {}
+
+    @staticmethod
+    def request(method, path, status_code):
+        from termcolor import colored
+        if any(path.endswith(ext) for ext in ['.js', '.css', '.png', '.jpg', '.svg']):
+            return
+        if any(ignore in path for ignore in LegacyLogger.IGNORED_PATHS):
+            return
+        current_time = time.time()
+        path_key = f"{method}:{path}"
+        if path_key in LegacyLogger.last_logged:
+            if current_time - LegacyLogger.last_logged[path_key] < 5:
+                return
+        LegacyLogger.last_logged[path_key] = current_time
+        if 200 <= status_code < 300:
+            color, status_text = 'green', "OK"
+        elif 300 <= status_code < 400:
+            color, status_text = 'cyan', "REDIRECT"
+        elif 400 <= status_code < 500:
+            color, status_text = 'yellow', "CLIENT ERROR"
+        else:
+            color, status_text = 'red', "SERVER ERROR"
+        print(colored(f"[{method}] {path} → {status_code} {status_text}", color))
+
+
+def build_requests(calls, distinct_paths, rng):
+    """Mix of API calls over many distinct paths, SPA navigations and static files"""
+    templates = [
+        lambda i: f"/api/owner/orders/{i}",
+        lambda i: f"/api/auth/status/{i}",
+        lambda i: "/api/auth/check-token",
+        lambda i: f"/booster/orders/{i}",
+        lambda i: f"/static/js/{i}.chunk.js",
+        lambda i: "/images/logo.png",
+    ]
+    return [
+        ('GET', rng.choice(templates)(rng.randrange(distinct_paths)), rng.choice((200, 200, 200, 304, 401, 404)))
+        for _ in range(calls)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--calls', type=int, default=200000)
+    parser.add_argument('--paths', type=int, default=5000)
+    parser.add_argument('--dedup-window', type=float, default=5.0,
+                        help='0 logs every request, which shows the cost of printing')
+    args = parser.parse_args()
+
+    prepare_environment()
+    from backend.observability.request_log import RequestLogger
+
+    requests = build_requests(args.calls, args.paths, random.Random(1))
+    devnull = open(os.devnull, 'w')
+    stdout = sys.stdout
+    try:
+        sys.stdout = devnull
+        LegacyLogger.last_logged.clear()
+        if args.dedup_window == 0:
+            legacy = lambda m, p, s: (LegacyLogger.last_logged.clear(), LegacyLogger.request(m, p, s))
+        else:
+            legacy = LegacyLogger.request
+        started = time.perf_counter()
+        for method, path, status in requests:
+            legacy(method, path, status)
+        legacy_elapsed = time.perf_counter() - started
+
+        # Sampling is disabled so both loggers emit the same lines
+        logger = RequestLogger(dedup_window=args.dedup_window, sampled_paths=(), stream=devnull)
+        started = time.perf_counter()
+        for method, path, status in requests:
+            logger.log(method, path, status)
+        async_elapsed = time.perf_counter() - started
+        logger.flush()
+    finally:
+        sys.stdout = stdout
+
+    print(f"{len(requests)} requests over {args.paths} distinct ids, dedup window {args.dedup_window}s")
+    print(f"{'legacy':<10} {legacy_elapsed * 1e6 / len(requests):7.2f}us/request  "
+          f"dedup map entries: {len(LegacyLogger.last_logged)}")
+    print(f"{'async':<10} {async_elapsed * 1e6 / len(requests):7.2f}us/request  "
+          f"dedup map entries: {len(logger._dedup)}  stats: {logger.stats()}")
+
+
+if __name__ == '__main__':
+    main()
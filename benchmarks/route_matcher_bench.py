@@ -0,0 +1,105 @@
+"""
+Microbenchmark for backend.security.routes.get_route_permission.
+
+Compares the compiled segment trie (with and without its LRU) against the
+previous implementation (two dict lookups followed by a linear scan of the
+'/*' entries in API_PERMISSIONS) on a table of synthetic routes.
+
+    python benchmarks/route_matcher_bench.py --routes 3000 --lookups 50000
+"""
+import time
+import random
+import argparse
+
+from common import prepare_environment
+
+
+def legacy_get_route_permission(route_path, route_permissions, api_permissions):
+    """The matcher as it was before the trie (kept here for comparison)"""
+    route_path = route_path.strip('/')
+    if route_path in route_permissions:
+        return route_permissions[route_path]
+    if route_path in api_permissions:
+        return api_permissions[route_path]
+    for api_path, role in api_permissions.items():
+        if api_path.endswith('/*'):
+            base_path = api_path[:-2]
+            if route_path.startswith(base_path):
+                return role
+    return None
+
+
+def build_tables(count, rng):
+    """Synthetic exact and wildcard routes, roughly one wildcard per five sections"""
+    roles = ('owner', 'booster', 'client')
+    route_permissions, api_permissions = {}, {}
+    for i in range(count):
+        role = roles[i % 3]
+        section = f"{role}/section{i}"
+        if i % 2:
+            route_permissions[section] = role
+        else:
+            api_permissions[f"api/{section}"] = role
+        if i % 5 == 0:
+            api_permissions[f"api/{section}/*"] = role
+    return route_permissions, api_permissions
+
+
+def build_paths(route_permissions, api_permissions, count, rng):
+    """Mix of exact hits, paths under wildcards and public misses"""
+    exact = list(route_permissions) + [p for p in api_permissions if not p.endswith('/*')]
+    nested = [p[:-2] + f"/{rng.randint(1, 10**6)}" for p in api_permissions if p.endswith('/*')]
+    paths = []
+    for i in range(count):
+        kind = i % 3
+        if kind == 0:
+            paths.append('/' + rng.choice(exact))
+        elif kind == 1:
+            paths.append('/' + rng.choice(nested))
+        else:
+            paths.append(f"/public/page{rng.randint(1, 500)}")
+    return paths
+
+
+def time_lookups(label, func, paths):
+    started = time.perf_counter()
+    for path in paths:
+        func(path)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<32} {elapsed * 1e6 / len(paths):8.2f}us/lookup")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--routes', type=int, default=3000)
+    parser.add_argument('--lookups', type=int, default=50000)
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    prepare_environment()
+    from backend.security import routes
+
+    rng = random.Random(args.seed)
+    route_permissions, api_permissions = build_tables(args.routes, rng)
+    paths = build_paths(route_permissions, api_permissions, args.lookups, rng)
+
+    routes.ROUTE_PERMISSIONS = route_permissions
+    routes.API_PERMISSIONS = api_permissions
+    routes.compile_permissions()
+
+    # Both matchers must agree before their speed is compared
+    mismatches = 0
+    for path in paths[:2000]:
+        if legacy_get_route_permission(path, route_permissions, api_permissions) != routes.get_route_permission(path):
+            mismatches += 1
+    print(f"routes={len(route_permissions) + len(api_permissions)} lookups={len(paths)} mismatches={mismatches}")
+
+    time_lookups('legacy linear scan', lambda p: legacy_get_route_permission(p, route_permissions, api_permissions), paths)
+    routes.compile_permissions()
+    time_lookups('trie (cold LRU)', routes.get_route_permission, paths)
+    time_lookups('trie (warm LRU)', routes.get_route_permission, paths)
+    time_lookups('trie (no LRU)', lambda p: routes._match(routes._route_trie, routes._split(p), 0), paths)
+
+
+if __name__ == '__main__':
+    main()
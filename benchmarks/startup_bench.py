@@ -0,0 +1,77 @@
+"""
+Cold-start time of `python server.py`: from spawning the process to the first
+successful response on /api/hello.
+
+  --serve-only   serve the existing build (no fingerprint, no npm)
+  auto           fingerprint src/ + package.json and skip npm when the build is current
+  --rebuild      the previous behaviour: npm run build on every start (--include-rebuild)
+
+    python benchmarks/startup_bench.py --runs 5
+"""
+import os
+import sys
+import time
+import argparse
+import subprocess
+import http.client
+
+from common import ROOT, prepare_environment, percentile
+
+
+def cold_start(flags, port, timeout):
+    env = dict(os.environ, SERVER_PORT=str(port), SERVER_HOST='127.0.0.1', SERVER_MODE='development')
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, os.path.join(ROOT, 'server.py')] + flags, cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f'server.py {" ".join(flags)} exited with code {process.returncode}')
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+                connection.request('GET', '/api/hello')
+                if connection.getresponse().status == 200:
+                    return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.02)
+        raise RuntimeError(f'server.py {" ".join(flags)} did not answer within {timeout}s')
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=5621)
+    parser.add_argument('--include-rebuild', action='store_true', help='also time a full npm run build start')
+    args = parser.parse_args()
+
+    prepare_environment()
+    from backend.assets.frontend_build import source_fingerprint, build_status
+
+    started = time.perf_counter()
+    up_to_date, reason, _ = build_status(ROOT, os.path.join(ROOT, 'build'), source_fingerprint(ROOT))
+    print(f"fingerprint check: {(time.perf_counter() - started) * 1000:.1f}ms ({reason})")
+
+    modes = [('--serve-only', ['--serve-only'])]
+    if up_to_date:
+        modes.append(('auto (build current)', []))
+    else:
+        print("auto mode skipped: it would rebuild the frontend (run `npm run build` first)")
+    if args.include_rebuild:
+        modes.append(('--rebuild', ['--rebuild']))
+
+    for label, flags in modes:
+        runs = 1 if flags == ['--rebuild'] else args.runs
+        samples = [cold_start(flags, args.port, timeout=600) * 1000 for _ in range(runs)]
+        print(f"{label:<24} runs={runs:<3} p50={percentile(samples, 0.5):8.0f}ms "
+              f"min={min(samples):8.0f}ms max={max(samples):8.0f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Bytes on the wire and requests/sec for the build/ directory, comparing plain
+send_from_directory (the previous behaviour) with backend.assets.StaticAssets.
+
+Two page loads are simulated for every file in the build directory:
+
+  first visit   every file is requested with Accept-Encoding: gzip, deflate, br
+  repeat visit  the browser revalidates with If-None-Match / If-Modified-Since,
+                except for responses it may reuse without asking
+                (Cache-Control max-age > 0, e.g. immutable hashed bundles)
+
+    python benchmarks/static_assets_bench.py --seconds 3
+"""
+import os
+import time
+import argparse
+
+from common import ROOT, prepare_environment
+
+ACCEPT_ENCODING = 'gzip, deflate, br'
+
+
+def build_apps(folder):
+    from flask import Flask, send_from_directory, abort
+    from backend.assets.static_files import StaticAssets
+
+    before = Flask('before', static_folder=None)
+
+    @before.route('/<path:path>')
+    def serve_before(path):
+        return send_from_directory(folder, path)
+
+    assets = StaticAssets(folder)
+    assets.warm()
+    after = Flask('after', static_folder=None)
+
+    @after.route('/<path:path>')
+    def serve_after(path):
+        response = assets.send(path)
+        if response is None:
+            abort(404)
+        return response
+
+    return before, after
+
+
+def list_files(folder):
+    paths = []
+    for root, _, files in os.walk(folder):
+        for name in files:
+            if name.endswith(('.gz', '.br', '.tmp')):
+                continue
+            paths.append(os.path.relpath(os.path.join(root, name), folder).replace(os.sep, '/'))
+    return sorted(paths)
+
+
+def wire_size(response):
+    headers = sum(len(k) + len(v) + 4 for k, v in response.headers.items())
+    return headers + len(response.get_data())
+
+
+def reusable_without_request(response):
+    cache_control = response.headers.get('Cache-Control', '')
+    for directive in cache_control.split(','):
+        directive = directive.strip()
+        if directive.startswith('max-age=') and int(directive[8:]) > 0:
+            return True
+    return False
+
+
+def page_loads(app, paths):
+    client = app.test_client()
+    first_bytes, validators = 0, {}
+    for path in paths:
+        response = client.get('/' + path, headers={'Accept-Encoding': ACCEPT_ENCODING})
+        first_bytes += wire_size(response)
+        validators[path] = response
+
+    repeat_requests = repeat_bytes = 0
+    for path in paths:
+        previous = validators[path]
+        if reusable_without_request(previous):
+            continue
+        headers = {'Accept-Encoding': ACCEPT_ENCODING}
+        if previous.headers.get('ETag'):
+            headers['If-None-Match'] = previous.headers['ETag']
+        if previous.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = previous.headers['Last-Modified']
+        response = client.get('/' + path, headers=headers)
+        repeat_requests += 1
+        repeat_bytes += wire_size(response)
+    return first_bytes, repeat_requests, repeat_bytes
+
+
+def throughput(app, path, seconds):
+    client = app.test_client()
+    headers = {'Accept-Encoding': ACCEPT_ENCODING}
+    count = 0
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        client.get('/' + path, headers=headers).get_data()
+        count += 1
+    return count / seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--folder', default=os.path.join(ROOT, 'build'))
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    prepare_environment()
+    before, after = build_apps(args.folder)
+    paths = list_files(args.folder)
+    largest = max(paths, key=lambda p: os.path.getsize(os.path.join(args.folder, p)))
+
+    print(f"{len(paths)} files, largest {largest}")
+    print(f"{'':<14}{'first visit':>14}{'repeat reqs':>14}{'repeat bytes':>14}{'req/s (' + os.path.basename(largest) + ')':>34}")
+    for label, app in (('before', before), ('after', after)):
+        first_bytes, repeat_requests, repeat_bytes = page_loads(app, paths)
+        rps = throughput(app, largest, args.seconds)
+        print(f"{label:<14}{first_bytes:>14,}{repeat_requests:>14}{repeat_bytes:>14,}{rps:>34,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""
+Local stub server for the external providers used by backend/auth
+(Discord, Google, ipinfo.io and ipify) with configurable per-endpoint delays.
+
+Run standalone:
+    python benchmarks/stub_providers.py --port 8900 --token-delay 0.15
+
+or import start_stub_server() from a benchmark.
+"""
+import json
+import time
+import argparse
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Delays in seconds, set by start_stub_server()
+    delays = {'token': 0.0, 'user': 0.0, 'geo': 0.0}
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def _send(self, body, delay):
+        if delay:
+            time.sleep(delay)
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        form = parse_qs(self.rfile.read(length).decode('utf-8'))
+        code = (form.get('code') or ['stub'])[0]
+        # The access token carries the code so the user endpoint can derive a stable id
+        self._send({'access_token': f'token-{code}', 'token_type': 'Bearer'}, self.delays['token'])
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path.startswith('/ipify'):
+            return self._send({'ip': '203.0.113.10'}, self.delays['geo'])
+        if path.startswith('/discord/users') or path.startswith('/google/userinfo'):
+            token = (self.headers.get('Authorization') or 'Bearer token-stub').split(' ')[-1]
+            user_id = token.replace('token-', '')
+            return self._send({
+                'id': user_id,
+                'username': f'user{user_id}',
+                'name': f'user{user_id}',
+                'email': f'user{user_id}@example.com',
+                'avatar': None,
+                'picture': None,
+            }, self.delays['user'])
+        if path.startswith('/ipinfo/'):
+            ip = path.split('/')[-1]
+            return self._send({'ip': ip, 'city': 'Cairo', 'region': 'Cairo', 'country': 'EG',
+                               'loc': '30.0,31.2', 'org': 'AS0 Stub', 'postal': '', 'timezone': 'Africa/Cairo'},
+                              self.delays['geo'])
+        self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub_server(port=0, token_delay=0.0, user_delay=0.0, geo_delay=0.0):
+    """Start the stub server in a daemon thread and return (server, base_url)"""
+    StubHandler.delays = {'token': token_delay, 'user': user_delay, 'geo': geo_delay}
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f'http://127.0.0.1:{server.server_address[1]}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stub OAuth/geo providers')
+    parser.add_argument('--port', type=int, default=8900)
+    parser.add_argument('--token-delay', type=float, default=0.0)
+    parser.add_argument('--user-delay', type=float, default=0.0)
+    parser.add_argument('--geo-delay', type=float, default=0.0)
+    args = parser.parse_args()
+    server, url = start_stub_server(args.port, args.token_delay, args.user_delay, args.geo_delay)
+    print(f"Stub providers listening on {url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,112 @@
+"""
+Gunicorn settings for production (read automatically by `gunicorn wsgi:app`,
+or started through `python wsgi.py`).
+
+Workers, connections and timeouts come from config.env. The default worker
+class is gevent: every open /api/events stream is a greenlet parked on the
+event hub, so one worker holds WEB_WORKER_CONNECTIONS streams instead of one
+per thread. wsgi.py monkey-patches before importing the app. Set
+WEB_WORKER_CLASS=gthread (or leave gevent uninstalled) for thread workers,
+where each stream holds one of WEB_THREADS threads.
+
+The app is imported once
+in the master (preload_app) and forked into the workers; each worker then
+opens its own MongoDB client in post_fork (backend/db/client.py). Indexes are
+created once by the master (when_ready). With several workers, each one writes
+its metrics to METRICS_MULTIPROC_DIR and /metrics merges them, so a single
+scrape covers the whole server.
+
+Reloading:
+    kill -HUP <master pid>    restart workers gracefully (config changes)
+    kill -USR2 <master pid>   start a new master with new code, then
+    kill -QUIT <old master>   stop the old one once the new one is serving
+Because the app is preloaded, HUP alone does not pick up code changes.
+"""
+import os
+import sys
+import subprocess
+import multiprocessing
+from dotenv import load_dotenv
+
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.env'))
+
+
+def _int_env(name, default):
+    value = os.getenv(name)
+    return int(value) if value else default
+
+
+bind = f"{os.getenv('SERVER_HOST') or '0.0.0.0'}:{os.getenv('SERVER_PORT') or '5000'}"
+workers = _int_env('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1)
+threads = _int_env('WEB_THREADS', 4)
+worker_connections = _int_env('WEB_WORKER_CONNECTIONS', 1000)
+
+
+def _worker_class():
+    name = os.getenv('WEB_WORKER_CLASS') or 'gevent'
+    if name == 'gevent':
+        try:
+            import gevent  # noqa: F401
+        except ImportError:
+            return 'gthread'
+    return name
+
+
+worker_class = _worker_class()
+preload_app = True
+timeout = _int_env('WEB_TIMEOUT', 30)
+graceful_timeout = _int_env('WEB_GRACEFUL_TIMEOUT', 30)
+keepalive = _int_env('WEB_KEEPALIVE', 5)
+# Recycle workers periodically to bound memory growth
+max_requests = _int_env('WEB_MAX_REQUESTS', 10000)
+max_requests_jitter = _int_env('WEB_MAX_REQUESTS_JITTER', 1000)
+accesslog = None  # requests are logged by the app's request logger
+errorlog = '-'
+
+
+def when_ready(server):
+    """Create the MongoDB indexes once, from the master, with a short-lived client"""
+    from backend.db.indexes import DB_CREATE_INDEXES, start_index_bootstrap
+    if worker_class != 'gevent':
+        start_index_bootstrap()
+    elif DB_CREATE_INDEXES:
+        # Under gevent a background "thread" in the master is a greenlet, and it
+        # would be copied into every forked worker; use a separate process instead
+        subprocess.Popen([sys.executable, '-m', 'backend.db.indexes', '--create'],
+                         cwd=os.path.dirname(os.path.abspath(__file__)))
+    if workers > 1 and not os.getenv('EVENTS_REDIS_URL'):
+        server.log.warning("EVENTS_REDIS_URL is not set: real-time events only reach "
+                           "streams connected to the worker that published them")
+    if workers > 1 and (os.getenv('PRESENCE_BACKEND') or 'memory') == 'memory':
+        server.log.warning("PRESENCE_BACKEND=memory: each worker keeps its own online map, so "
+                           "/api/auth/status depends on the worker; use sqlite or redis")
+    from backend.observability.metrics import METRICS_MULTIPROC_DIR, reset_shared_dir
+    if workers > 1 and METRICS_MULTIPROC_DIR:
+        reset_shared_dir(METRICS_MULTIPROC_DIR)
+    elif workers > 1:
+        server.log.warning("METRICS_MULTIPROC_DIR is not set: /metrics only reports the worker "
+                           "that answers the scrape")
+
+
+def post_fork(server, worker):
+    """Open the worker's own MongoDB pool now (pymongo clients are not fork-safe)"""
+    from backend.db.client import reset_client, get_client
+    reset_client()
+    get_client()
+    server.log.info(f"Worker {worker.pid} created its MongoDB client")
+    from backend.observability.metrics import metrics, METRICS_MULTIPROC_DIR
+    if workers > 1 and METRICS_MULTIPROC_DIR:
+        metrics.start_sharing(METRICS_MULTIPROC_DIR)
+
+
+def worker_exit(server, worker):
+    """Write the worker's last metrics before it exits"""
+    from backend.observability.metrics import metrics
+    metrics.flush()
+
+
+def child_exit(server, worker):
+    """Fold a finished worker's metrics into the archive so counters keep growing"""
+    from backend.observability.metrics import archive_process, METRICS_MULTIPROC_DIR
+    if workers > 1 and METRICS_MULTIPROC_DIR:
+        archive_process(METRICS_MULTIPROC_DIR, worker.pid)
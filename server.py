@@ -3,27 +3,22 @@ import os
 import sys
 import subprocess
 import threading
-from flask import Flask, jsonify, request, send_from_directory, make_response, redirect
+from flask import Flask, jsonify, request, send_from_directory, make_response, redirect, abort, g
 from flask_cors import CORS
 from dotenv import load_dotenv
 import importlib.util
 import logging
 import time
+import argparse
 from termcolor import colored
 
+# Used to report how long startup took
+STARTUP_STARTED = time.perf_counter()
+
 # Setup colored logging system
 class ColoredLogger:
     """Custom colored logger to help distinguish different message types"""
     
-    # List of static file paths we don't want to log
-    IGNORED_PATHS = [
-        'favicon.ico', 'manifest.json', 'static/', 'images/', 'logo192.png', 
-        'favicon-sw.js', '.js', '.css', '.png', '.jpg', '.svg'
-    ]
-    
-    # Track the last time a message was logged for a path
-    last_logged = {}
-    
     @staticmethod
     def info(message):
         """Display information message in blue"""
@@ -43,44 +38,6 @@ class ColoredLogger:
     def error(message):
         """Display error message in red"""
         print(colored(f"[ERROR] {message}", 'red'))
-    
-    @staticmethod
-    def request(method, path, status_code):
-        """Display HTTP request info with appropriate color based on status code"""
-        # Ignore certain repetitive paths like static files
-        if any(path.endswith(ext) for ext in ['.js', '.css', '.png', '.jpg', '.svg']):
-            return
-            
-        if any(ignore in path for ignore in ColoredLogger.IGNORED_PATHS):
-            return
-        
-        # Check time elapsed since last logging of the same path to reduce duplicates
-        current_time = time.time()
-        path_key = f"{method}:{path}"
-        
-        # If the same path was logged in the last 5 seconds, ignore it
-        if path_key in ColoredLogger.last_logged:
-            if current_time - ColoredLogger.last_logged[path_key] < 5:
-                return
-        
-        ColoredLogger.last_logged[path_key] = current_time
-        
-        # Choose color based on status code
-        if 200 <= status_code < 300:
-            color = 'green'
-            status_text = "OK"
-        elif 300 <= status_code < 400:
-            color = 'cyan'
-            status_text = "REDIRECT"
-        elif 400 <= status_code < 500:
-            color = 'yellow'
-            status_text = "CLIENT ERROR"
-        else:
-            color = 'red'
-            status_text = "SERVER ERROR"
-        
-        # Display request with consistent, colored formatting
-        print(colored(f"[{method}] {path} → {status_code} {status_text}", color))
 
 # Initialize logger
 logger = ColoredLogger
@@ -97,12 +54,24 @@ except Exception as e:
 SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
 SERVER_PORT = int(os.getenv('SERVER_PORT', '5000'))
 DEBUG_MODE = os.getenv('DEBUG_MODE', 'true').lower() == 'true'
+# 'production' serves the app through gunicorn/waitress (see wsgi.py) instead of app.run
+SERVER_MODE = os.getenv('SERVER_MODE', 'development').lower()
 CORS_ALLOW_CREDENTIALS = os.getenv('CORS_ALLOW_CREDENTIALS', 'true').lower() == 'true'
+# When to run `npm run build` on startup:
+#   auto        only if src/ or package.json changed since the last build (default)
+#   background  like auto, but serve the previous build while rebuilding
+#   always      rebuild on every start (previous behaviour)
+#   never       serve the existing build as is (same as --serve-only)
+FRONTEND_BUILD = os.getenv('FRONTEND_BUILD', 'auto').lower()
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Setup Flask application
-app = Flask(__name__, 
-            static_folder=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'build'),
-            static_url_path='')
+# static_folder=None: Flask would otherwise register its own 'static' endpoint on
+# '/<path:filename>' (static_url_path=''), matched before serve_react; build files
+# are served by the routes below through the in-memory build index instead
+app = Flask(__name__, static_folder=None)
+app.static_folder = os.path.join(ROOT_DIR, 'build')
 app.config['JSON_AS_ASCII'] = False
 CORS(app, supports_credentials=CORS_ALLOW_CREDENTIALS)
 
@@ -117,14 +86,55 @@ if not os.path.exists(build_index_path):
     except Exception as e:
         logger.error(f"Error listing build directory: {str(e)}")
 
-# Log HTTP requests
+# Precompressed, cache-friendly serving of the build directory
+try:
+    from backend.assets.static_files import StaticAssets, STATIC_WATCH
+    static_assets = StaticAssets(app.static_folder)
+    asset_count, compressed_count = static_assets.warm()
+    logger.info(f"Static assets ready: {asset_count} files, {compressed_count} precompressed")
+    if STATIC_WATCH:
+        static_assets.start_watcher()
+except Exception as e:
+    static_assets = None
+    logger.error(f"Error preparing static assets: {e}")
+
+def build_file_exists(relative_path):
+    """Check the in-memory build index instead of probing the filesystem"""
+    if static_assets is None:
+        return os.path.isfile(os.path.join(app.static_folder, relative_path))
+    return static_assets.get(relative_path) is not None
+
+def send_build_file(relative_path):
+    """Serve a file from the build directory (404 if it does not exist)"""
+    if static_assets is None:
+        return send_from_directory(app.static_folder, relative_path)
+    response = static_assets.send(relative_path)
+    if response is None:
+        abort(404)
+    return response
+
+# Log HTTP requests (formatting and printing happen on a background thread)
+from backend.observability.request_log import request_logger
+
 @app.after_request
 def log_request(response):
     """Log HTTP requests after they are processed"""
-    # We don't want to log static file requests to reduce noise
-    logger.request(request.method, request.path, response.status_code)
+    # Static file requests are skipped inside the logger to reduce noise
+    duration = g.get('request_duration')
+    request_logger.log(request.method, request.path, response.status_code,
+                       duration_ms=duration * 1000 if duration is not None else None)
     return response
 
+# Per-endpoint latency histograms and the /metrics endpoint. Registered after
+# log_request so its after_request hook runs first and provides the duration,
+# and before the auth middleware so the timer covers token verification.
+try:
+    from backend.observability.api import register_metrics_endpoints
+    register_metrics_endpoints(app)
+    logger.success("Metrics module loaded successfully")
+except Exception as e:
+    logger.error(f"Error loading metrics module: {e}")
+
 # Import authentication blueprint
 try:
     from backend.auth.auth import auth_bp
@@ -136,21 +146,35 @@ except Exception as e:
 # Import security blueprint
 try:
     from backend.security.api import security_bp, register_security_endpoints
+    from backend.security.security import register_auth_middleware
+    # The caller is resolved on first use and shared by every check in the request
+    register_auth_middleware(app)
     register_security_endpoints(app)
     logger.success("Security module loaded successfully")
 except Exception as e:
     logger.error(f"Error loading security module: {e}")
 
+# Import real-time events blueprint
+try:
+    from backend.events.api import register_event_endpoints
+    register_event_endpoints(app)
+    logger.success("Events module loaded successfully")
+except Exception as e:
+    logger.error(f"Error loading events module: {e}")
+
+# Import order ingestion blueprint (/api/submit-order)
+try:
+    from backend.orders.api import register_order_endpoints
+    register_order_endpoints(app)
+    logger.success("Orders module loaded successfully")
+except Exception as e:
+    logger.error(f"Error loading orders module: {e}")
+
 # API routes
 @app.route('/api/hello', methods=['GET'])
 def hello():
     return jsonify({"message": "Hello from the Flask backend!"})
 
-@app.route('/api/submit-order', methods=['POST'])
-def submit_order():
-    data = request.json
-    return jsonify({"status": "success", "order": data})
-
 # Login routes - important to have these before the catch-all route
 @app.route('/api/auth/discord/login')
 def discord_login_redirect():
@@ -165,19 +189,19 @@ def google_login_redirect():
 # Static file routes - important to have these before the catch-all route
 @app.route('/static/<path:filename>')
 def serve_static(filename):
-    return send_from_directory(os.path.join(app.static_folder, 'static'), filename)
+    return send_build_file(f'static/{filename}')
 
 @app.route('/images/<path:filename>')
 def serve_images(filename):
-    return send_from_directory(os.path.join(app.static_folder, 'images'), filename)
+    return send_build_file(f'images/{filename}')
 
 @app.route('/favicon.ico')
 def favicon():
-    return send_from_directory(app.static_folder, 'favicon.ico')
+    return send_build_file('favicon.ico')
 
 @app.route('/manifest.json')
 def manifest():
-    return send_from_directory(app.static_folder, 'manifest.json')
+    return send_build_file('manifest.json')
 
 # Handle POST requests
 @app.route('/', methods=['POST'])
@@ -203,88 +227,141 @@ def serve_react(path):
         return jsonify({"error": "API endpoint not found"}), 404
     
     # Check if the requested file exists (static files)
-    full_path = os.path.join(app.static_folder, path)
-    if path and os.path.exists(full_path) and os.path.isfile(full_path):
-        return send_from_directory(app.static_folder, path)
+    if path and build_file_exists(path):
+        return send_build_file(path)
     
     # For all other routes, serve index.html
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_build_file('index.html')
 
 # Handle 404 errors
 @app.errorhandler(404)
 def not_found(e):
     # For non-API paths, serve index.html
     if not request.path.startswith('/api/'):
-        return send_from_directory(app.static_folder, 'index.html')
+        return send_build_file('index.html')
     return jsonify({"error": "Not found"}), 404
 
-def build_frontend():
-    """Build React frontend"""
+def find_npm():
+    """Locate the npm executable (npm.cmd on Windows)"""
+    if sys.platform != "win32":
+        return "npm"
+    possible_paths = [
+        "npm.cmd", 
+        r"C:\Program Files\nodejs\npm.cmd",
+        r"C:\Program Files (x86)\nodejs\npm.cmd",
+        os.path.expanduser(r"~\AppData\Roaming\npm\npm.cmd")
+    ]
+    for path in possible_paths:
+        if os.path.exists(path) or (path == "npm.cmd" and subprocess.run(["where", "npm"], 
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE).returncode == 0):
+            return path
+    return "npm"
+
+def build_frontend(fingerprint=None, build_path=None):
+    """Build React frontend into build_path (default: build/) and record its source fingerprint"""
+    from backend.assets.frontend_build import source_fingerprint, write_fingerprint
     logger.info("Building React frontend...")
     try:
-        npm_cmd = "npm"
-        if sys.platform == "win32":
-            possible_paths = [
-                "npm.cmd", 
-                r"C:\Program Files\nodejs\npm.cmd",
-                r"C:\Program Files (x86)\nodejs\npm.cmd",
-                os.path.expanduser(r"~\AppData\Roaming\npm\npm.cmd")
-            ]
-            
-            for path in possible_paths:
-                if os.path.exists(path) or (path == "npm.cmd" and subprocess.run(["where", "npm"], 
-                                            stdout=subprocess.PIPE, stderr=subprocess.PIPE).returncode == 0):
-                    npm_cmd = path
-                    break
-        
+        npm_cmd = find_npm()
         logger.info(f"Using npm command: {npm_cmd}")
         
+        if fingerprint is None:
+            fingerprint = source_fingerprint(ROOT_DIR)
+        env = dict(os.environ)
+        if build_path:
+            # react-scripts writes to BUILD_PATH instead of build/
+            env['BUILD_PATH'] = build_path
+        
         # Build React app
-        subprocess.run([npm_cmd, "run", "build"], check=True)
+        subprocess.run([npm_cmd, "run", "build"], check=True, cwd=ROOT_DIR, env=env)
+        write_fingerprint(build_path or app.static_folder, fingerprint)
         logger.success("Frontend build completed successfully!")
+        return True
     except Exception as e:
         logger.error(f"Error building frontend: {e}")
         logger.warning("You may need to build the frontend manually by running 'npm run build'")
+        return False
+
+def rebuild_frontend_in_background(fingerprint):
+    """Build into build.next while the current build is served, then swap it in"""
+    from backend.assets.frontend_build import swap_build_directory
+    next_build = app.static_folder + '.next'
+    
+    def run():
+        if not build_frontend(fingerprint, build_path=next_build):
+            return
+        try:
+            # The index moves to build.next before build/ is replaced, so files
+            # read from disk are never looked up in a directory being swapped
+            swap_build_directory(next_build, app.static_folder, static_assets)
+            logger.success("New frontend build is now being served")
+        except OSError as e:
+            logger.error(f"Could not swap in the new build from {next_build}: {e}")
+    
+    thread = threading.Thread(target=run, name='frontend-build', daemon=True)
+    thread.start()
+    return thread
+
+def prepare_frontend(mode):
+    """Rebuild the frontend only when needed (see FRONTEND_BUILD)"""
+    if mode == 'never':
+        return
+    from backend.assets.frontend_build import build_status
+    fingerprint = None
+    if mode != 'always':
+        up_to_date, reason, fingerprint = build_status(ROOT_DIR, app.static_folder)
+        if up_to_date:
+            logger.info("Frontend build is up to date, skipping npm run build")
+            return
+        logger.info(f"Frontend needs a rebuild: {reason}")
+    
+    has_build = build_file_exists('index.html')
+    if mode == 'background' and has_build and SERVER_MODE != 'production':
+        logger.info("Serving the previous build while the frontend rebuilds in the background")
+        rebuild_frontend_in_background(fingerprint)
+        return
+    
+    if build_frontend(fingerprint) and static_assets is not None:
+        static_assets.scan()
 
 def start_backend():
     """Start Flask server"""
     logger.info("Starting Flask backend server...")
     
-    # Create application directories if they don't exist
-    os.makedirs('backend', exist_ok=True)
-    os.makedirs('backend/auth', exist_ok=True)
-    os.makedirs('backend/security', exist_ok=True)
+    if SERVER_MODE == 'production':
+        # Replace this process with wsgi.py so the app is imported once, as the
+        # `server` module, and pre-forked by gunicorn (or served by waitress)
+        logger.info("Starting production server (wsgi.py)...")
+        wsgi_path = os.path.join(ROOT_DIR, 'wsgi.py')
+        os.execv(sys.executable, [sys.executable, wsgi_path])
     
-    # Create __init__.py files if they don't exist
-    if not os.path.exists('backend/__init__.py'):
-        with open('backend/__init__.py', 'w') as f:
-            f.write('# Backend package initialization')
-            
-    if not os.path.exists('backend/auth/__init__.py'):
-        with open('backend/auth/__init__.py', 'w') as f:
-            f.write('# Authentication package initialization')
-            
-    if not os.path.exists('backend/security/__init__.py'):
-        with open('backend/security/__init__.py', 'w') as f:
-            f.write('# Security package initialization')
+    # Create the MongoDB indexes in the background (idempotent)
+    from backend.db.indexes import start_index_bootstrap
+    start_index_bootstrap()
     
     # Start Flask server
-    logger.success(f"Server ready at: http://{SERVER_HOST}:{SERVER_PORT}")
+    logger.success(f"Server ready at: http://{SERVER_HOST}:{SERVER_PORT} "
+                   f"(startup took {time.perf_counter() - STARTUP_STARTED:.2f}s)")
     app.run(host=SERVER_HOST, port=SERVER_PORT, debug=DEBUG_MODE, use_reloader=False)
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the website (frontend build + Flask backend)")
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--serve-only', dest='frontend_build', action='store_const', const='never',
+                       help="serve the existing build without checking or rebuilding the frontend")
+    group.add_argument('--rebuild', dest='frontend_build', action='store_const', const='always',
+                       help="always run npm run build before serving")
+    group.add_argument('--background-build', dest='frontend_build', action='store_const', const='background',
+                       help="serve the previous build while rebuilding changed sources")
+    parser.set_defaults(frontend_build=FRONTEND_BUILD)
+    return parser.parse_args()
+
 if __name__ == '__main__':
+    args = parse_args()
     logger.info("▶️ Starting website (frontend + backend)...")
     
-    # Install termcolor if not present
-    try:
-        import termcolor
-    except ImportError:
-        logger.warning("Installing termcolor library for colors...")
-        subprocess.run([sys.executable, "-m", "pip", "install", "termcolor"], check=True)
-        logger.success("termcolor library installed successfully!")
-    
-    # Build frontend
-    build_frontend()
+    # Build frontend (only when its sources changed, unless told otherwise)
+    prepare_frontend(args.frontend_build)
     
     # Start server
-    start_backend() 
\ No newline at end of file
+    start_backend()
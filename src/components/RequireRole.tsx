@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { Navigate, useLocation, useNavigate } from 'react-router-dom';
 import { useAuth } from '../contexts/AuthContext';
+import { useAccessMap, isPathAllowed } from '../hooks/useAccessMap';
 
 interface RequireRoleProps {
   children: JSX.Element;
@@ -14,48 +15,42 @@ const RequireRole: React.FC<RequireRoleProps> = ({ children, role }) => {
   const [accessChecked, setAccessChecked] = useState(false);
   const [accessGranted, setAccessGranted] = useState(false);
 
-  // التحقق من الصلاحيات باستخدام API الأمان
+  // خريطة الصلاحيات تُجلب مرة واحدة لكل مستخدم ويتم القرار محليًا عند كل تنقل
+  const accessMapKey = !loading && isAuthenticated && user
+    ? `${user.id}:${user.is_owner ? 1 : 0}:${user.is_booster ? 1 : 0}`
+    : null;
+  const { accessMap, error: accessMapError } = useAccessMap(accessMapKey);
+
   useEffect(() => {
     if (!loading && isAuthenticated) {
+      if (!accessMap) {
+        // في حالة فشل جلب الخريطة نعتمد على التحقق المبدئي من الدور
+        if (accessMapError) setAccessChecked(false);
+        return;
+      }
+
       // استخراج المسار الحالي
       const currentPath = location.pathname.replace(/^\/+/, '');
-      
-      // استخدام API للتحقق من صلاحية الوصول
-      fetch(`/api/security/access-check/${currentPath}`, {
-        credentials: 'include',
-        headers: {
-          'Cache-Control': 'no-cache',
-          'Pragma': 'no-cache'
-        }
-      })
-      .then(response => response.json())
-      .then(data => {
-        console.log('Security check result:', data);
-        setAccessGranted(data.access_granted);
-        setAccessChecked(true);
-        
-        // إذا لم يكن لديه صلاحية الوصول، قم بإعادة توجيهه
-        if (!data.access_granted) {
-          // التحقق من دور المستخدم وإعادة التوجيه للصفحة المناسبة
-          if (data.user_role === 'owner') {
-            navigate('/owner');
-          } else if (data.user_role === 'booster') {
-            navigate('/booster');
-          } else {
-            navigate('/dashboard');
-          }
+      const granted = isPathAllowed(accessMap, currentPath);
+      setAccessGranted(granted);
+      setAccessChecked(true);
+
+      // إذا لم يكن لديه صلاحية الوصول، قم بإعادة توجيهه
+      if (!granted) {
+        // التحقق من دور المستخدم وإعادة التوجيه للصفحة المناسبة
+        if (accessMap.user_role === 'owner') {
+          navigate('/owner');
+        } else if (accessMap.user_role === 'booster') {
+          navigate('/booster');
+        } else {
+          navigate('/dashboard');
         }
-      })
-      .catch(error => {
-        console.error('Security check error:', error);
-        setAccessChecked(true);
-        setAccessGranted(false);
-      });
+      }
     } else if (!loading && !isAuthenticated) {
       setAccessChecked(true);
       setAccessGranted(false);
     }
-  }, [isAuthenticated, loading, location.pathname, navigate]);
+  }, [isAuthenticated, loading, location.pathname, navigate, accessMap, accessMapError]);
 
   // التحقق المبدئي من الصلاحيات مباشرة (قبل استجابة API)
   const hasCorrectRole = () => {
@@ -1,6 +1,7 @@
 import React, { useState, useEffect, useRef } from 'react';
 import styled from 'styled-components';
 import { FaSearch, FaFilter, FaComment, FaUser, FaExclamationTriangle, FaArrowLeft } from 'react-icons/fa';
+import { useEventStream } from '../../hooks/useEventStream';
 
 interface Message {
   id: string;
@@ -215,46 +216,17 @@ const DashboardOwnerLiveChat: React.FC = () => {
     setFilteredSessions(filtered);
   }, [chatSessions, searchQuery, statusFilter, flaggedFilter]);
   
-  // Simulate real-time updates
-  useEffect(() => {
-    if (!isLiveMonitoring) return;
-    
-    const interval = setInterval(() => {
-      const randomSessionIndex = Math.floor(Math.random() * chatSessions.length);
-      const updatedSessions = [...chatSessions];
-      
-      if (updatedSessions[randomSessionIndex]) {
-        // Add a new message to a random session
-        const newMessage: Message = {
-          id: `msg-${Date.now()}`,
-          sender: Math.random() > 0.5 ? 'client' : 'booster',
-          text: `Simulated message at ${new Date().toLocaleTimeString()}`,
-          timestamp: new Date(),
-          orderId: updatedSessions[randomSessionIndex].orderId
-        };
-        
-        updatedSessions[randomSessionIndex] = {
-          ...updatedSessions[randomSessionIndex],
-          messages: [...updatedSessions[randomSessionIndex].messages, newMessage],
-          lastActivity: new Date(),
-          hasUnreadMessages: true
-        };
-        
-        setChatSessions(updatedSessions);
-        
-        // If this is the selected session, scroll to bottom
-        if (selectedSession?.orderId === updatedSessions[randomSessionIndex].orderId) {
-          setTimeout(() => {
-            if (chatContainerRef.current) {
-              chatContainerRef.current.scrollTop = chatContainerRef.current.scrollHeight;
-            }
-          }, 100);
-        }
-      }
-    }, 30000); // Update every 30 seconds
-    
-    return () => clearInterval(interval);
-  }, [chatSessions, selectedSession, isLiveMonitoring]);
+  // Real-time booster presence pushed by the server
+  useEventStream({
+    presence: (event: { user_id: string; online: boolean }) => {
+      const status = event.online ? 'online' : 'offline';
+      setChatSessions(prevSessions => prevSessions.map(session =>
+        session.booster.id === event.user_id && session.booster.status !== status
+          ? { ...session, booster: { ...session.booster, status } }
+          : session
+      ));
+    }
+  }, { enabled: isLiveMonitoring });
   
   useEffect(() => {
     // Scroll to bottom when selecting a new chat
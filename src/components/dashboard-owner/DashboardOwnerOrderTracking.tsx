@@ -3,6 +3,7 @@ import styled from 'styled-components';
 import { FaSearch, FaEye, FaEdit, FaTrash, FaFilter, FaClock, FaCheck, FaTimes, FaComment, FaPause } from 'react-icons/fa';
 import OrderDetailModal from './OrderDetailModal';
 import { useNavigate } from 'react-router-dom';
+import { useEventStream } from '../../hooks/useEventStream';
 
 interface Order {
   id: string;
@@ -280,34 +281,31 @@ const DashboardOwnerOrderTracking: React.FC = () => {
     setFilteredOrders(filtered);
   }, [orders, searchQuery, statusFilter, chatActivityFilter]);
   
-  // Simulate real-time updates
-  useEffect(() => {
-    if (!isLiveMonitoring) return;
-    
-    const interval = setInterval(() => {
-      // Simulate a booster coming online/offline
-      const randomIndex = Math.floor(Math.random() * orders.length);
-      const updatedOrders = [...orders];
-      
-      if (updatedOrders[randomIndex]) {
-        const statuses: ('online' | 'offline' | 'away')[] = ['online', 'offline', 'away'];
-        const randomStatus = statuses[Math.floor(Math.random() * statuses.length)];
-        
-        updatedOrders[randomIndex] = {
-          ...updatedOrders[randomIndex],
-          booster: {
-            ...updatedOrders[randomIndex].booster,
-            status: randomStatus
-          },
-          updatedAt: new Date()
-        };
-        
-        setOrders(updatedOrders);
-      }
-    }, 15000); // Update every 15 seconds
-    
-    return () => clearInterval(interval);
-  }, [orders, isLiveMonitoring]);
+  // Real-time updates pushed by the server (presence and order events)
+  useEventStream({
+    presence: (event: { user_id: string; online: boolean }) => {
+      const status = event.online ? 'online' : 'offline';
+      setOrders(prevOrders => prevOrders.map(order =>
+        order.booster.id === event.user_id && order.booster.status !== status
+          ? { ...order, booster: { ...order.booster, status }, updatedAt: new Date() }
+          : order
+      ));
+    },
+    order: (event: { order?: { id?: string; status?: Order['status']; progress?: number } }) => {
+      const update = event.order;
+      if (!update || !update.id) return;
+      setOrders(prevOrders => prevOrders.map(order =>
+        order.id === update.id || order.orderId === update.id
+          ? {
+              ...order,
+              status: update.status || order.status,
+              progress: update.progress ?? order.progress,
+              updatedAt: new Date()
+            }
+          : order
+      ));
+    }
+  }, { enabled: isLiveMonitoring });
   
   const toggleLiveMonitoring = () => {
     setIsLiveMonitoring(!isLiveMonitoring);
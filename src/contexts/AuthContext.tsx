@@ -1,4 +1,5 @@
 import React, { createContext, useState, useContext, useEffect, ReactNode, useCallback } from 'react';
+import { useEventStream } from '../hooks/useEventStream';
 
 // تعريف نوع المستخدم
 export interface User {
@@ -192,34 +193,22 @@ export const AuthProvider: React.FC<AuthProviderProps> = ({ children }) => {
     
     // التحقق من الخادم
     checkAuthStatus();
-    
-    // تحديث دوري فقط إذا كان المستخدم مسجل دخول
-    // استخدام متغير لتتبع عدد مرات الفشل المتتالية
-    let failedAttempts = 0;
-    const MAX_FAILED_ATTEMPTS = 3;
+  }, [checkAuthStatus, getUserFromStorage]);
+
+  // قناة الأحداث تبقي الجلسة محدثة بدلاً من الاستعلام الدوري كل 5 دقائق:
+  // الخادم يجدد الكوكي عند كل إعادة اتصال، وإذا رفض الاتصال نعيد التحقق من التوكن
+  useEventStream({}, { enabled: isAuthenticated, onClosed: checkAuthStatus });
+
+  // استعلام دوري احتياطي فقط للمتصفحات التي لا تدعم EventSource
+  useEffect(() => {
+    if (typeof EventSource !== 'undefined' || !isAuthenticated) return;
     
     const intervalId = setInterval(() => {
-      // تحقق فقط إذا كان هناك مستخدم مسجل أو عدد محاولات الفشل أقل من الحد الأقصى
-      if (isAuthenticated || failedAttempts < MAX_FAILED_ATTEMPTS) {
-        checkAuthStatus().then(() => {
-          // إعادة تعيين عدد المحاولات الفاشلة إذا نجحت العملية
-          if (isAuthenticated) {
-            failedAttempts = 0;
-          } else {
-            // زيادة عدد المحاولات الفاشلة
-            failedAttempts++;
-            
-            // إيقاف التحقق المتكرر بعد وصول الحد الأقصى من المحاولات الفاشلة
-            if (failedAttempts >= MAX_FAILED_ATTEMPTS) {
-              console.log('Pausing auth checks after multiple failed attempts');
-            }
-          }
-        });
-      }
-    }, 300000); // زيادة الفترة إلى 5 دقائق بدلاً من دقيقة واحدة
+      checkAuthStatus();
+    }, 300000); // 5 دقائق
     
     return () => clearInterval(intervalId);
-  }, [checkAuthStatus, getUserFromStorage, isAuthenticated]);
+  }, [checkAuthStatus, isAuthenticated]);
 
   // وظائف تسجيل الدخول
   const loginWithDiscord = () => {
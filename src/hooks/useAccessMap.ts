@@ -0,0 +1,115 @@
+import { useEffect, useState } from 'react';
+
+export interface AccessMap {
+  user_role: 'owner' | 'booster' | 'client' | 'anonymous';
+  version: string;
+  rules: Record<string, boolean>;
+}
+
+const ACCESS_MAP_URL = '/api/security/access-map';
+
+// خريطة واحدة لكل تبويب؛ تُجلب مرة واحدة لكل مستخدم ويعيد المتصفح التحقق منها عبر ETag
+let cachedKey: string | null = null;
+let cachedMap: AccessMap | null = null;
+let pendingMap: Promise<AccessMap> | null = null;
+
+export const fetchAccessMap = (cacheKey: string): Promise<AccessMap> => {
+  if (cachedKey === cacheKey) {
+    if (cachedMap) return Promise.resolve(cachedMap);
+    if (pendingMap) return pendingMap;
+  }
+
+  cachedKey = cacheKey;
+  cachedMap = null;
+  const request = fetch(ACCESS_MAP_URL, { credentials: 'include' })
+    .then(response => {
+      if (!response.ok) throw new Error(`Access map request failed: ${response.status}`);
+      return response.json();
+    })
+    .then((data: AccessMap) => {
+      if (cachedKey === cacheKey) cachedMap = data;
+      return data;
+    })
+    .finally(() => {
+      if (pendingMap === request) pendingMap = null;
+    });
+  pendingMap = request;
+  return request;
+};
+
+// أوزان المقاطع: نفس ترتيب الخادم (ثابت ثم متغير ثم *)
+const LITERAL = 2;
+const PARAM = 1;
+const WILDCARD = 0;
+const END = 3;
+
+const compareScores = (a: number[], b: number[]) => {
+  for (let i = 0; i < Math.min(a.length, b.length); i++) {
+    if (a[i] !== b[i]) return a[i] - b[i];
+  }
+  return a.length - b.length;
+};
+
+const scorePattern = (pattern: string[], segments: string[]): number[] | null => {
+  const score: number[] = [];
+  for (let i = 0; i < pattern.length; i++) {
+    if (pattern[i] === '*' && i === pattern.length - 1) {
+      score.push(WILDCARD);
+      return score;
+    }
+    if (i >= segments.length) return null;
+    if (pattern[i].startsWith(':')) {
+      score.push(PARAM);
+    } else if (pattern[i] === segments[i]) {
+      score.push(LITERAL);
+    } else {
+      return null;
+    }
+  }
+  if (pattern.length !== segments.length) return null;
+  score.push(END);
+  return score;
+};
+
+const splitPath = (path: string) => path.split('/').filter(Boolean);
+
+// تحديد صلاحية الوصول محليًا حسب القاعدة الأكثر تحديدًا؛ المسارات غير المعرفة عامة
+export const isPathAllowed = (accessMap: AccessMap, path: string): boolean => {
+  const segments = splitPath(path);
+  let bestScore: number[] | null = null;
+  let allowed = true;
+  Object.entries(accessMap.rules).forEach(([pattern, patternAllowed]) => {
+    const score = scorePattern(splitPath(pattern), segments);
+    if (score && (!bestScore || compareScores(score, bestScore) > 0)) {
+      bestScore = score;
+      allowed = patternAllowed;
+    }
+  });
+  return allowed;
+};
+
+export const useAccessMap = (cacheKey: string | null) => {
+  const [accessMap, setAccessMap] = useState<AccessMap | null>(
+    cacheKey && cachedKey === cacheKey ? cachedMap : null
+  );
+  const [error, setError] = useState(false);
+
+  useEffect(() => {
+    if (!cacheKey) return;
+    let active = true;
+    setError(false);
+    fetchAccessMap(cacheKey)
+      .then(data => active && setAccessMap(data))
+      .catch(e => {
+        console.error('Access map error:', e);
+        if (active) setError(true);
+      });
+    return () => {
+      active = false;
+    };
+  }, [cacheKey]);
+
+  return { accessMap, error };
+};
+
+export default useAccessMap;
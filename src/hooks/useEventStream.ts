@@ -0,0 +1,94 @@
+import { useEffect, useRef, useState } from 'react';
+
+export type EventStreamHandlers = Record<string, (data: any) => void>;
+
+interface UseEventStreamOptions {
+  enabled?: boolean;
+  onClosed?: () => void;
+}
+
+const EVENT_STREAM_URL = '/api/events/stream';
+// إعادة المحاولة بعد رفض الاتصال (مثل 503 عند امتلاء عدد المشتركين، نفس Retry-After)
+const RECONNECT_DELAY_MS = 30000;
+
+// اتصال واحد مشترك لكل تبويب بين جميع المكونات المشتركة
+let sharedSource: EventSource | null = null;
+let sharedUsers = 0;
+const closedCallbacks = new Set<() => void>();
+
+const acquireSource = (): EventSource => {
+  if (!sharedSource || sharedSource.readyState === EventSource.CLOSED) {
+    const source = new EventSource(EVENT_STREAM_URL, { withCredentials: true });
+    // المتصفح يعيد الاتصال تلقائيًا؛ الحالة CLOSED تعني أن الخادم رفض الاتصال (مثل 401)
+    source.onerror = () => {
+      if (source.readyState === EventSource.CLOSED) {
+        closedCallbacks.forEach(callback => callback());
+      }
+    };
+    sharedSource = source;
+  }
+  sharedUsers++;
+  return sharedSource;
+};
+
+const releaseSource = (source: EventSource) => {
+  sharedUsers = Math.max(0, sharedUsers - 1);
+  if (sharedUsers === 0 && sharedSource === source) {
+    source.close();
+    sharedSource = null;
+  }
+};
+
+// الاستماع لأحداث الخادم (Server-Sent Events) بدلاً من الاستعلام الدوري
+export const useEventStream = (
+  handlers: EventStreamHandlers,
+  { enabled = true, onClosed }: UseEventStreamOptions = {}
+) => {
+  // الاحتفاظ بأحدث المعالجات دون إعادة فتح الاتصال عند كل إعادة رسم
+  const handlersRef = useRef(handlers);
+  const onClosedRef = useRef(onClosed);
+  handlersRef.current = handlers;
+  onClosedRef.current = onClosed;
+
+  const eventNames = Object.keys(handlers).sort().join(',');
+  // يزداد عند إعادة المحاولة بعد إغلاق الاتصال فيُعاد فتحه
+  const [attempt, setAttempt] = useState(0);
+
+  useEffect(() => {
+    if (!enabled || typeof EventSource === 'undefined') return;
+
+    const source = acquireSource();
+
+    const listeners = eventNames.split(',').filter(Boolean).map(name => {
+      const listener = (event: Event) => {
+        const handler = handlersRef.current[name];
+        if (!handler) return;
+        try {
+          handler(JSON.parse((event as MessageEvent).data));
+        } catch (e) {
+          console.error(`Failed to handle "${name}" event:`, e);
+        }
+      };
+      source.addEventListener(name, listener);
+      return { name, listener };
+    });
+
+    let retryTimer: ReturnType<typeof setTimeout> | undefined;
+    const closedCallback = () => {
+      if (onClosedRef.current) onClosedRef.current();
+      if (retryTimer === undefined) {
+        retryTimer = setTimeout(() => setAttempt(value => value + 1), RECONNECT_DELAY_MS);
+      }
+    };
+    closedCallbacks.add(closedCallback);
+
+    return () => {
+      if (retryTimer !== undefined) clearTimeout(retryTimer);
+      closedCallbacks.delete(closedCallback);
+      listeners.forEach(({ name, listener }) => source.removeEventListener(name, listener));
+      releaseSource(source);
+    };
+  }, [enabled, eventNames, attempt]);
+};
+
+export default useEventStream;
@@ -0,0 +1,27 @@
+"""
+Shared setup for the backend tests.
+
+MongoDB is replaced by mongomock, so no server is needed; install the test
+dependencies with `pip install -r requirements-dev.txt` and run `python -m pytest`.
+The settings below are only the ones read at import time.
+"""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Values used when config.env leaves a setting empty (load_dotenv does not override them)
+TEST_DEFAULTS = {
+    'JWT_SECRET': 'test-secret',
+    'JWT_EXPIRATION': '86400',
+    'COOKIE_MAX_AGE': '2592000',
+    'COOKIE_SAMESITE': 'Lax',
+    'COOKIE_PATH': '/',
+    'MONGODB_URI': 'mongodb://127.0.0.1:27017/?serverSelectionTimeoutMS=200',
+}
+for key, value in TEST_DEFAULTS.items():
+    if not os.environ.get(key):
+        os.environ[key] = value
+
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
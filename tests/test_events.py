@@ -0,0 +1,84 @@
+import pytest
+from bson import ObjectId
+from flask import Flask
+
+from backend.events import api
+from backend.events.hub import EventHub
+from backend.security.security import Principal
+
+
+@pytest.fixture
+def hub(monkeypatch):
+    hub = EventHub(capacity=16, max_subscribers=2)
+    monkeypatch.setattr(api, 'event_hub', hub)
+    monkeypatch.setattr(api, 'event_bridge', None)
+    user = {'_id': ObjectId(), 'username': 'owner', 'is_owner': True}
+    principal = Principal('token', {'sub': str(user['_id'])}, user)
+    monkeypatch.setattr(api, 'get_principal', lambda: principal)
+    monkeypatch.setattr(api, 'refresh_auth_cookie_if_needed', lambda response, *args, **kwargs: response)
+    return hub
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    api.register_event_endpoints(app)
+    return app.test_client()
+
+
+def test_head_does_not_take_a_subscriber_slot(hub, client):
+    for _ in range(3):
+        assert client.head('/api/events/stream').status_code == 405
+    assert hub.subscribers == 0
+    response = client.get('/api/events/stream', buffered=False)
+    assert response.status_code == 200
+    response.close()
+
+
+def test_slot_is_held_while_streaming_and_released_on_close(hub, client):
+    response = client.get('/api/events/stream', buffered=False)
+    body = iter(response.response)
+    assert next(body).startswith(b'retry:')
+    assert hub.subscribers == 1
+
+    hub.publish('order', {'id': 1}, ('owner',))
+    assert b'event: order' in next(body)
+    response.close()
+    assert hub.subscribers == 0
+
+
+def test_error_before_streaming_does_not_leak(hub, client, monkeypatch):
+    def failing_refresh(*args, **kwargs):
+        raise RuntimeError('cannot refresh')
+
+    monkeypatch.setattr(api, 'refresh_auth_cookie_if_needed', failing_refresh)
+    client.application.testing = False
+    for _ in range(3):
+        assert client.get('/api/events/stream').status_code == 500
+    assert hub.subscribers == 0
+
+
+def test_full_hub_answers_503(hub, client):
+    # streams held by other server threads
+    assert hub.try_subscribe() and hub.try_subscribe()
+
+    refused = client.get('/api/events/stream')
+    assert refused.status_code == 503
+    assert refused.headers['Retry-After'] == '30'
+    assert hub.subscribers == 2
+
+    hub.unsubscribe()
+    response = client.get('/api/events/stream', buffered=False)
+    assert response.status_code == 200
+    next(iter(response.response))
+    assert hub.subscribers == 2
+    response.close()
+    assert hub.subscribers == 1
+
+
+def test_stream_started_after_the_hub_filled_up_ends_with_a_retry(hub):
+    hub.try_subscribe()
+    hub.try_subscribe()
+    frames = list(hub.stream({'owner'}))
+    assert frames == ['retry: 30000\n\n']
+    assert hub.subscribers == 2
@@ -0,0 +1,45 @@
+import pytest
+
+from backend.http_client import CircuitBreaker, CircuitOpenError, HttpClient
+
+
+class FailingSession:
+    def __init__(self, error):
+        self.error = error
+        self.calls = 0
+
+    def request(self, method, url, **kwargs):
+        self.calls += 1
+        raise self.error
+
+
+@pytest.fixture
+def client():
+    client = HttpClient(max_retries=0)
+    client._provider('test')
+    client._breakers['test'] = CircuitBreaker(threshold=1, cooldown=0)
+    return client
+
+
+def test_unexpected_error_releases_the_half_open_trial(client):
+    session = FailingSession(ValueError('bad certificate path'))
+    client._sessions['test'] = session
+    breaker = client._breakers['test']
+    breaker.record_failure()
+    assert breaker.state == 'half_open'
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            client.get('test', 'https://example.invalid/')
+
+    # every attempt got its trial instead of the breaker refusing after the first
+    assert session.calls == 3
+    assert not breaker._trial_in_flight
+    assert client.stats()['test']['errors'] == 3
+
+
+def test_open_breaker_refuses_requests(client):
+    client._breakers['test'] = CircuitBreaker(threshold=1, cooldown=60)
+    client._breakers['test'].record_failure()
+    with pytest.raises(CircuitOpenError):
+        client.get('test', 'https://example.invalid/')
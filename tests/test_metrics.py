@@ -0,0 +1,111 @@
+import random
+
+from backend.observability.metrics import (
+    Histogram, MetricsRegistry, _bucket_index, _bucket_upper, BUCKET_COUNT, SUB_BUCKETS,
+)
+
+MAX_TRACKED_US = _bucket_upper(BUCKET_COUNT - 1)
+
+
+def sample_values():
+    values = list(range(0, 4 * 1024))
+    rng = random.Random(7)
+    values += [rng.randrange(1, MAX_TRACKED_US) for _ in range(20000)]
+    values += [1 << bits for bits in range(36)] + [(1 << bits) - 1 for bits in range(1, 37)]
+    return values
+
+
+def test_buckets_are_contiguous():
+    assert _bucket_index(0) == 0
+    for index in range(BUCKET_COUNT - 1):
+        upper = _bucket_upper(index)
+        assert _bucket_index(upper) == index
+        assert _bucket_index(upper + 1) == index + 1
+        assert _bucket_upper(index + 1) > upper
+
+
+def test_values_fall_inside_their_bucket():
+    for value in sample_values():
+        index = _bucket_index(value)
+        lower = _bucket_upper(index - 1) + 1 if index else 0
+        assert lower <= value <= _bucket_upper(index), value
+
+
+def test_relative_error_is_bounded():
+    for value in sample_values():
+        upper = _bucket_upper(_bucket_index(value))
+        if value < 2 * SUB_BUCKETS:
+            # the first buckets are one microsecond wide
+            assert upper == value
+        else:
+            assert (upper - value) / value < 1 / SUB_BUCKETS, value
+
+
+def test_out_of_range_values_are_clamped():
+    assert _bucket_index(-5) == 0
+    assert _bucket_index(MAX_TRACKED_US + 1) == BUCKET_COUNT - 1
+    assert _bucket_index(1 << 60) == BUCKET_COUNT - 1
+
+
+def test_quantiles_bound_the_exact_value():
+    histogram = Histogram()
+    samples = [index / 1000.0 for index in range(1, 1001)]  # 1ms .. 1s
+    random.Random(3).shuffle(samples)
+    for seconds in samples:
+        histogram.observe(seconds)
+    counts, count, total, maximum = histogram.snapshot()
+    assert count == 1000
+    assert abs(total - sum(samples)) < 1e-9
+    assert maximum == 1.0
+
+    quantiles = Histogram.quantiles(counts, count, (0.5, 0.9, 0.99))
+    for fraction, exact in ((0.5, 0.5), (0.9, 0.9), (0.99, 0.99)):
+        assert exact <= quantiles[fraction] < exact * (1 + 1 / SUB_BUCKETS) + 1e-6
+
+
+def test_quantiles_of_an_empty_histogram():
+    assert Histogram.quantiles([0] * BUCKET_COUNT, 0, (0.5, 0.99)) == {0.5: 0.0, 0.99: 0.0}
+
+
+def test_registry_keeps_one_histogram_per_label_set():
+    registry = MetricsRegistry()
+    registry.observe('op_seconds', 0.002, endpoint='a')
+    registry.observe('op_seconds', 0.004, endpoint='a')
+    registry.observe('op_seconds', 0.001, endpoint='b')
+    summary = registry.summary()
+    assert summary['op_seconds{endpoint=a}']['count'] == 2
+    assert summary['op_seconds{endpoint=b}']['count'] == 1
+    text = registry.render_prometheus()
+    assert 'op_seconds_count{endpoint="a"} 2' in text
+
+
+def test_shared_dir_merges_workers_and_archives_finished_ones(tmp_path, monkeypatch):
+    from backend.observability import metrics as metrics_module
+
+    worker = MetricsRegistry()
+    worker.shared_dir = str(tmp_path)
+    worker.observe('op_seconds', 0.002, endpoint='a')
+    worker.increment('requests_total', endpoint='a')
+    monkeypatch.setattr(metrics_module.os, 'getpid', lambda: 101)
+    worker.flush()
+
+    other = MetricsRegistry()
+    other.shared_dir = str(tmp_path)
+    other.observe('op_seconds', 0.004, endpoint='a')
+    other.increment('requests_total', 2, endpoint='a')
+    monkeypatch.setattr(metrics_module.os, 'getpid', lambda: 102)
+    other.flush()
+
+    # the answering worker reports its live values plus the other worker's file
+    summary = other.summary()
+    assert summary['op_seconds{endpoint=a}']['count'] == 2
+    assert summary['op_seconds{endpoint=a}']['max_ms'] == 4.0
+    assert 'requests_total{endpoint="a"} 3' in other.render_prometheus()
+
+    # once worker 101 exits its values move to the archive and still count
+    metrics_module.archive_process(str(tmp_path), 101)
+    assert not (tmp_path / '101.json').exists()
+    assert other.summary()['op_seconds{endpoint=a}']['count'] == 2
+
+    metrics_module.reset_shared_dir(str(tmp_path))
+    assert other.summary()['op_seconds{endpoint=a}']['count'] == 1
@@ -0,0 +1,66 @@
+import pytest
+from bson import ObjectId
+from flask import Flask
+
+from backend.orders import api
+from backend.orders.ingest import OrderTicket
+from backend.orders.pricing import quote_order
+from backend.security.security import Principal
+
+ORDER = {
+    'currentRank': {'tier': 'silver', 'division': 'I'},
+    'desiredRank': {'tier': 'gold', 'division': 'IV'},
+    'server': 'euw',
+    'options': {},
+}
+
+
+class StalledWriter:
+    """Queues every order and never writes it, as when MongoDB is slower than the ack timeout"""
+
+    def __init__(self):
+        self.tickets = []
+
+    def submit(self, order, idempotency_key=None):
+        order['_id'] = ObjectId()
+        ticket = OrderTicket(order)
+        self.tickets.append(ticket)
+        return ticket, False
+
+
+@pytest.fixture
+def writer(monkeypatch):
+    writer = StalledWriter()
+    monkeypatch.setattr(api, 'order_writer', writer)
+    monkeypatch.setattr(api, 'ORDERS_ACK_MODE', 'sync')
+    monkeypatch.setattr(api, 'ORDERS_ACK_TIMEOUT', 0.01)
+    monkeypatch.setattr(api, 'get_principal', lambda: Principal())
+    return writer
+
+
+@pytest.fixture
+def client():
+    app = Flask(__name__)
+    api.register_order_endpoints(app)
+    return app.test_client()
+
+
+@pytest.fixture
+def order():
+    return dict(ORDER, price=quote_order(ORDER)['price'])
+
+
+def test_sync_timeout_without_key_is_accepted(writer, client, order):
+    response = client.post('/api/submit-order', json=order)
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body['status'] == 'accepted'
+    assert body['order']['id'] == str(writer.tickets[0].order['_id'])
+
+
+def test_sync_timeout_with_key_asks_for_a_retry(writer, client, order, monkeypatch):
+    user = {'_id': ObjectId(), 'username': 'client'}
+    monkeypatch.setattr(api, 'get_principal', lambda: Principal('token', {'sub': str(user['_id'])}, user))
+    response = client.post('/api/submit-order', json=order, headers={'Idempotency-Key': 'k1'})
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
@@ -0,0 +1,169 @@
+import os
+
+import mongomock
+import pytest
+from bson import ObjectId
+from pymongo.errors import AutoReconnect, BulkWriteError
+
+from backend.orders import ingest
+from backend.orders.ingest import OrderWriter, OrderQueueFull
+
+
+class OrdersCollection:
+    """
+    Orders collection that reports write errors the way mongod does
+    (mongomock leaves out keyPattern, which the writer uses to tell _id
+    duplicates from Idempotency-Key duplicates).
+
+    lose_acks: number of insert_many calls that write the documents and then
+    fail with AutoReconnect, as when the acknowledgement is lost.
+    """
+
+    def __init__(self, lose_acks=0, fail=0):
+        self.documents = {}
+        self.keys = set()
+        self.calls = 0
+        self.lose_acks = lose_acks
+        self.fail = fail
+
+    def create_index(self, *args, **kwargs):
+        return kwargs.get('name')
+
+    def insert_many(self, documents, ordered=True):
+        self.calls += 1
+        if self.fail:
+            self.fail -= 1
+            raise AutoReconnect('connection refused')
+        errors = []
+        for index, document in enumerate(documents):
+            key = (document.get('user_id'), document.get('idempotency_key'))
+            if document['_id'] in self.documents:
+                errors.append({'index': index, 'code': 11000, 'keyPattern': {'_id': 1}, 'errmsg': 'dup _id'})
+            elif key[1] is not None and key in self.keys:
+                errors.append({'index': index, 'code': 11000, 'errmsg': 'dup key',
+                               'keyPattern': {'user_id': 1, 'idempotency_key': 1}})
+            else:
+                self.documents[document['_id']] = document
+                if key[1] is not None:
+                    self.keys.add(key)
+        if self.lose_acks:
+            self.lose_acks -= 1
+            raise AutoReconnect('connection closed')
+        if errors:
+            raise BulkWriteError({'writeErrors': errors})
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(ingest.time, 'sleep', lambda seconds: None)
+
+
+def make_writer(collection, **kwargs):
+    inserted = []
+    writer = OrderWriter(collection_factory=lambda: collection, on_inserted=inserted.extend, **kwargs)
+    # batches are written by the test itself, not by the writer thread
+    writer._pid = os.getpid()
+    return writer, inserted
+
+
+def drain(writer):
+    batch = []
+    while not writer._queue.empty():
+        batch.append(writer._queue.get_nowait())
+    return batch
+
+
+def order(user_id=None, **fields):
+    return dict({'user_id': user_id, 'game_type': 'lol', 'price': 10.0}, **fields)
+
+
+def test_batch_is_written_with_one_insert():
+    collection = OrdersCollection()
+    writer, inserted = make_writer(collection)
+    tickets = [writer.submit(order(), f'key-{index}')[0] for index in range(3)]
+    writer.write_batch(drain(writer))
+
+    assert collection.calls == 1
+    assert len(collection.documents) == 3
+    assert inserted == [ticket.order for ticket in tickets]
+    for ticket in tickets:
+        assert ticket.done.is_set() and ticket.error is None and not ticket.duplicate
+
+
+def test_lost_ack_retry_treats_id_duplicates_as_written():
+    collection = OrdersCollection(lose_acks=1)
+    writer, inserted = make_writer(collection, retries=3)
+    tickets = [writer.submit(order())[0] for _ in range(2)]
+    writer.write_batch(drain(writer))
+
+    # the first attempt wrote both documents; the retry sees them as _id duplicates
+    assert collection.calls == 2
+    assert len(collection.documents) == 2
+    assert [ticket.duplicate for ticket in tickets] == [False, False]
+    assert [ticket.error for ticket in tickets] == [None, None]
+    assert len(inserted) == 2
+    assert writer.stats()['inserted'] == 2
+
+
+def test_idempotency_key_duplicate_in_another_process():
+    user_id = ObjectId()
+    collection = OrdersCollection()
+    collection.keys.add((user_id, 'same-key'))
+    writer, inserted = make_writer(collection)
+    duplicate, _ = writer.submit(order(user_id), 'same-key')
+    fresh, _ = writer.submit(order(user_id), 'other-key')
+    writer.write_batch(drain(writer))
+
+    assert duplicate.duplicate and duplicate.error is None
+    assert not fresh.duplicate
+    assert inserted == [fresh.order]
+    assert writer.stats()['duplicates'] == 1
+
+
+def test_gives_up_after_the_retries():
+    collection = OrdersCollection(fail=10)
+    writer, inserted = make_writer(collection, retries=2)
+    ticket, _ = writer.submit(order())
+    writer.write_batch(drain(writer))
+
+    assert collection.calls == 3
+    assert ticket.error == 'Order could not be saved'
+    assert inserted == []
+    assert writer.stats()['failed'] == 1
+
+
+def test_same_key_is_replayed_until_it_fails():
+    collection = OrdersCollection(fail=10)
+    writer, _ = make_writer(collection, retries=0)
+    user_id = ObjectId()
+    first, replayed = writer.submit(order(user_id), 'key')
+    again, replayed_again = writer.submit(order(user_id), 'key')
+    assert not replayed and replayed_again and again is first
+    # keys are scoped by user
+    other, replayed_other = writer.submit(order(ObjectId()), 'key')
+    assert not replayed_other and other is not first
+
+    writer.write_batch(drain(writer))
+    assert first.error
+    retry, replayed_retry = writer.submit(order(user_id), 'key')
+    assert not replayed_retry and retry is not first
+
+
+def test_full_queue_is_rejected():
+    writer, _ = make_writer(OrdersCollection(), queue_size=1)
+    writer.submit(order())
+    with pytest.raises(OrderQueueFull):
+        writer.submit(order())
+    assert writer.stats()['rejected_full'] == 1
+
+
+def test_writer_thread_with_mongomock():
+    collection = mongomock.MongoClient().db.orders
+    writer = OrderWriter(collection_factory=lambda: collection, flush_interval=0.001)
+    user_id = ObjectId()
+    tickets = [writer.submit(order(user_id), f'key-{index}')[0] for index in range(20)]
+    for ticket in tickets:
+        assert ticket.wait(5)
+        assert ticket.error is None
+    assert collection.count_documents({'user_id': user_id}) == 20
+    assert 'user_idempotency_key' in collection.index_information()
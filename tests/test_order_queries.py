@@ -0,0 +1,152 @@
+import re
+import base64
+import random
+from datetime import datetime, timedelta
+
+import mongomock
+import pytest
+from bson import ObjectId, json_util
+from pymongo import ASCENDING, DESCENDING
+
+from backend.orders.queries import (
+    OrderQueryError, SORT_FIELDS, _after, build_filter, decode_cursor, encode_cursor, list_orders,
+)
+
+
+@pytest.fixture(scope='module')
+def orders():
+    """Orders with many equal sort values and some null or missing ones"""
+    rng = random.Random(11)
+    collection = mongomock.MongoClient().db.orders
+    started = datetime(2024, 1, 1)
+    documents = []
+    for index in range(100):
+        document = {
+            '_id': ObjectId(),
+            'created_at': started + timedelta(minutes=rng.randrange(10)),
+            'price': rng.choice([5.0, 10.0, 12.5, None]),
+            'client_name': rng.choice(['alice', 'bob', 'carol', '', None]),
+            'status': rng.choice(['pending', 'in_progress', 'completed']),
+            'chat_activity': rng.random() < 0.5,
+        }
+        if index % 17 == 0:
+            # a missing field sorts and matches like null
+            del document['price']
+            del document['client_name']
+        documents.append(document)
+    collection.insert_many(documents)
+    return collection, documents
+
+
+def expected_order(documents, field, direction):
+    def key(document):
+        value = document.get(field)
+        return (value is not None, value if value is not None else 0, document['_id'])
+    return [document['_id'] for document in sorted(documents, key=key, reverse=direction == DESCENDING)]
+
+
+def walk(collection, query, field, direction, limit):
+    ids, cursor, pages = [], None, 0
+    while True:
+        page, cursor = list_orders(collection, query, sort=field, direction=direction, limit=limit, cursor=cursor)
+        ids.extend(document['_id'] for document in page)
+        pages += 1
+        if cursor is None:
+            return ids, pages
+        assert len(page) == limit
+
+
+@pytest.mark.parametrize('field', sorted(SORT_FIELDS))
+@pytest.mark.parametrize('direction', [ASCENDING, DESCENDING])
+@pytest.mark.parametrize('limit', [1, 7, 25])
+def test_pages_cover_every_order_once_in_order(orders, field, direction, limit):
+    collection, documents = orders
+    ids, pages = walk(collection, {}, field, direction, limit)
+    assert ids == expected_order(documents, field, direction)
+    assert pages == -(-len(documents) // limit)
+
+
+def test_pages_with_a_filter(orders):
+    collection, documents = orders
+    query = build_filter(status='pending,completed', chat_activity=True)
+    matching = [document for document in documents
+                if document['status'] in ('pending', 'completed') and document['chat_activity']]
+    ids, _ = walk(collection, query, 'price', DESCENDING, 10)
+    assert ids == expected_order(matching, 'price', DESCENDING)
+
+
+def matches(collection, condition):
+    return {document['_id'] for document in collection.find(condition)}
+
+
+@pytest.mark.parametrize('direction', [ASCENDING, DESCENDING])
+def test_after_equal_values_breaks_ties_by_id(direction):
+    collection = mongomock.MongoClient().db.orders
+    ids = sorted(ObjectId() for _ in range(4))
+    collection.insert_many([{'_id': _id, 'price': 10.0} for _id in ids]
+                           + [{'_id': ObjectId(), 'price': 5.0}, {'_id': ObjectId(), 'price': 20.0},
+                              {'_id': ObjectId(), 'price': None}])
+    found = matches(collection, _after('price', direction, 10.0, ids[1]))
+    tied = {ids[2], ids[3]} if direction == ASCENDING else {ids[0]}
+    assert found & set(ids) == tied
+    prices = {document['_id']: document['price'] for document in collection.find()}
+    others = {prices[_id] for _id in found - set(ids)}
+    # nulls sort first ascending, so in descending order they come after every value
+    assert others == ({20.0} if direction == ASCENDING else {5.0, None})
+
+
+@pytest.mark.parametrize('direction', [ASCENDING, DESCENDING])
+def test_after_null_value(direction):
+    collection = mongomock.MongoClient().db.orders
+    null_ids = sorted(ObjectId() for _ in range(3))
+    collection.insert_many([{'_id': null_ids[0], 'price': None}, {'_id': null_ids[1]},
+                            {'_id': null_ids[2], 'price': None}, {'_id': ObjectId(), 'price': 1.0}])
+    found = matches(collection, _after('price', direction, None, null_ids[1]))
+    if direction == ASCENDING:
+        # the remaining nulls, then every non-null value
+        assert found & set(null_ids) == {null_ids[2]}
+        assert len(found) == 2
+    else:
+        # nulls are last in descending order: only the remaining nulls
+        assert found == {null_ids[0]}
+
+
+def raw_cursor(*items):
+    """A cursor with arbitrary content, as a client could forge it"""
+    return base64.urlsafe_b64encode(json_util.dumps(list(items)).encode('utf-8')).decode('ascii')
+
+
+def test_cursor_round_trip():
+    order = {'_id': ObjectId(), 'created_at': datetime(2024, 5, 1, 12, 30), 'price': None, 'client_name': 'ab'}
+    for field, value in (('created_at', order['created_at']), ('price', None), ('client_name', 'ab')):
+        cursor = encode_cursor(order, field, DESCENDING)
+        assert decode_cursor(cursor, field, DESCENDING) == (value, order['_id'])
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-base64!',
+    'W10',
+    encode_cursor({'_id': 'x'}, 'price', DESCENDING),
+    raw_cursor('price', DESCENDING, {'$ne': None}, ObjectId()),
+    raw_cursor('price', DESCENDING, re.compile('^a'), ObjectId()),
+    raw_cursor('price', DESCENDING, [1, 2], ObjectId()),
+    raw_cursor('price', DESCENDING, True, ObjectId()),
+    raw_cursor('price', DESCENDING, 10, ObjectId(), 'extra'),
+    raw_cursor(10, ObjectId()),
+])
+def test_invalid_cursor(cursor):
+    with pytest.raises(OrderQueryError):
+        decode_cursor(cursor, 'price', DESCENDING)
+
+
+def test_cursor_from_another_sort_is_rejected():
+    cursor = encode_cursor({'_id': ObjectId(), 'price': 10}, 'price', DESCENDING)
+    with pytest.raises(OrderQueryError):
+        decode_cursor(cursor, 'price', ASCENDING)
+    with pytest.raises(OrderQueryError):
+        decode_cursor(cursor, 'created_at', DESCENDING)
+
+
+def test_invalid_sort_field():
+    with pytest.raises(OrderQueryError):
+        list_orders(mongomock.MongoClient().db.orders, {}, sort='booster_name')
@@ -0,0 +1,139 @@
+import math
+import itertools
+
+import pytest
+
+from backend.orders import pricing
+from backend.orders.pricing import PricingError, quote_order, quote_orders, price_batch, encode_order, verify_price
+from backend.orders.schema import TIERS, DIVISIONS, APEX_TIERS
+
+RANK_VALUES = {'iron': 0, 'bronze': 1, 'silver': 2, 'gold': 3, 'platinum': 4,
+               'diamond': 5, 'master': 6, 'grandmaster': 7, 'challenger': 8}
+DIVISION_VALUES = {'IV': 0, 'III': 1, 'II': 2, 'I': 3, None: 0}
+OPTIONS = ('priorityBoost', 'soloOnly', 'streaming', 'championsSelection', 'duoBoost', 'voiceDuo', 'ghostDuo')
+
+
+def frontend_quote(order):
+    """Line-by-line port of the price and time calculation in src/pages/BoostingOrder.tsx"""
+    current = RANK_VALUES[order['currentRank']['tier']] * 4 + DIVISION_VALUES[order['currentRank']['division']]
+    desired = RANK_VALUES[order['desiredRank']['tier']] * 4 + DIVISION_VALUES[order['desiredRank']['division']]
+    rank_difference = desired - current
+    price = max(0, rank_difference * 5)
+    options = order['options']
+    if options.get('priorityBoost'): price *= 1.25
+    if options.get('soloOnly'): price *= 1.2
+    if options.get('streaming'): price *= 1.15
+    if options.get('championsSelection'): price *= 1.1
+    if options.get('duoBoost'): price *= 1.3
+    if options.get('voiceDuo'): price *= 1.1
+    if options.get('ghostDuo'): price *= 1.15
+
+    est_hours = max(1, rank_difference * 2)
+    if est_hours < 24:
+        time_text = f'~{est_hours} Hours'
+    elif est_hours < 48:
+        time_text = '~1 Day'
+    else:
+        time_text = f'~{math.ceil(est_hours / 24)} Days'
+    if options.get('priorityBoost'):
+        if est_hours < 24:
+            time_text = f'~{max(1, math.floor(est_hours * 0.75))} Hours'
+        else:
+            days = math.ceil(est_hours * 0.75 / 24)
+            time_text = '~1 Day' if days == 1 else f'~{days} Days'
+
+    discount_amount = (price * 20) / 100
+    # Math.round(x) rounds half up
+    return math.floor((price - discount_amount) * 100 + 0.5) / 100, time_text
+
+
+def all_ranks():
+    for tier in TIERS:
+        for division in ((None,) if tier in APEX_TIERS else DIVISIONS):
+            yield {'tier': tier, 'division': division}
+
+
+def all_option_sets():
+    for flags in itertools.product((False, True), repeat=len(OPTIONS)):
+        yield dict(zip(OPTIONS, flags))
+
+
+@pytest.fixture(scope='module')
+def every_order():
+    return [
+        {'currentRank': current, 'desiredRank': desired, 'options': options}
+        for current in all_ranks()
+        for desired in all_ranks()
+        for options in all_option_sets()
+    ]
+
+
+def test_single_quotes_match_the_frontend(every_order):
+    for order in every_order[::7]:
+        price, time_text = frontend_quote(order)
+        quote = quote_order(order)
+        assert quote['price'] == price, order
+        assert quote['estimated_time'] == time_text, order
+
+
+def test_batch_quotes_match_the_frontend(every_order):
+    quotes = quote_orders(every_order)
+    for order, quote in zip(every_order, quotes):
+        assert quote['price'] == frontend_quote(order)[0], order
+
+
+def test_price_batch_matches_the_frontend(every_order):
+    encoded = [encode_order(order) for order in every_order]
+    current, desired, masks = (list(column) for column in zip(*encoded))
+    prices = price_batch(current, desired, masks)
+    assert prices == [frontend_quote(order)[0] for order in every_order]
+
+
+def test_price_batch_without_numpy(every_order, monkeypatch):
+    monkeypatch.setattr(pricing, 'np', None)
+    orders = every_order[::11]
+    encoded = [encode_order(order) for order in orders]
+    prices = price_batch(*(list(column) for column in zip(*encoded)))
+    assert prices == [frontend_quote(order)[0] for order in orders]
+
+
+def test_apex_tiers_ignore_the_division():
+    base = {'currentRank': {'tier': 'gold', 'division': 'I'}, 'options': {}}
+    for division in (None, 'I', 'IV'):
+        order = dict(base, desiredRank={'tier': 'master', 'division': division})
+        assert quote_order(order)['divisions'] == RANK_VALUES['master'] * 4 - (3 * 4 + 3)
+
+
+@pytest.mark.parametrize('rank', [
+    None, 'gold', ['gold'], {'tier': 'mithril', 'division': 'I'}, {'tier': ['gold'], 'division': 'I'},
+    {'tier': {'name': 'gold'}, 'division': 'I'}, {'tier': 'gold', 'division': ['I']},
+    {'tier': 'gold', 'division': {'value': 'I'}}, {'tier': 'gold', 'division': 'V'}, {'tier': 'gold'},
+])
+def test_invalid_ranks_raise_pricing_error(rank):
+    order = {'currentRank': rank, 'desiredRank': {'tier': 'gold', 'division': 'I'}, 'options': {}}
+    with pytest.raises(PricingError):
+        quote_order(order)
+
+
+def test_one_bad_entry_does_not_fail_the_batch():
+    good = {'currentRank': {'tier': 'silver', 'division': 'I'}, 'desiredRank': {'tier': 'gold', 'division': 'IV'}}
+    orders = [
+        good,
+        dict(good, currentRank={'tier': 'silver', 'division': ['I']}),
+        dict(good, options=['priorityBoost']),
+        'not an order',
+        good,
+    ]
+    quotes = quote_orders(orders)
+    assert quotes[0] == quotes[4] == {'price': 4.0, 'divisions': 1}
+    assert all('error' in quote for quote in quotes[1:4])
+
+
+def test_verify_price_tolerance():
+    order = {'currentRank': {'tier': 'silver', 'division': 'I'}, 'desiredRank': {'tier': 'gold', 'division': 'IV'},
+             'options': {'priorityBoost': True}}
+    quote, matches = verify_price(order, 5.0)
+    assert quote['price'] == 5.0 and matches
+    assert verify_price(order, 5.01)[1]
+    assert not verify_price(order, 5.02)[1]
+    assert not verify_price(order, None)[1]
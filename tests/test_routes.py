@@ -0,0 +1,93 @@
+import pytest
+
+from backend.security import routes
+
+
+def linear_permission(route_path, route_permissions, api_permissions):
+    """get_route_permission before the trie: exact lookups, then a prefix scan of API '/*' entries"""
+    route_path = route_path.strip('/')
+    if route_path in route_permissions:
+        return route_permissions[route_path]
+    if route_path in api_permissions:
+        return api_permissions[route_path]
+    for api_path, role in api_permissions.items():
+        if api_path.endswith('/*'):
+            if route_path.startswith(api_path[:-2]):
+                return role
+    return None
+
+
+@pytest.fixture
+def tables():
+    """Edit the permission tables for one test and recompile the trie around it"""
+    saved = dict(routes.ROUTE_PERMISSIONS), dict(routes.API_PERMISSIONS)
+    yield routes.ROUTE_PERMISSIONS, routes.API_PERMISSIONS
+    for table, original in zip((routes.ROUTE_PERMISSIONS, routes.API_PERMISSIONS), saved):
+        table.clear()
+        table.update(original)
+    routes.compile_permissions()
+
+
+def candidate_paths():
+    patterns = list(routes.ROUTE_PERMISSIONS) + list(routes.API_PERMISSIONS)
+    paths = {'', 'unknown', 'api', 'api/unknown', 'static/js/main.js'}
+    for pattern in patterns:
+        paths.update((pattern, '/' + pattern, pattern + '/', pattern + '/child', pattern + '/child/grandchild'))
+        parent = pattern.rsplit('/', 1)[0]
+        paths.update((parent, parent + '/other'))
+    return sorted(paths)
+
+
+def test_matches_the_linear_scan_on_the_shipped_tables():
+    for path in candidate_paths():
+        expected = linear_permission(path, routes.ROUTE_PERMISSIONS, routes.API_PERMISSIONS)
+        assert routes.get_route_permission(path) == expected, path
+
+
+def test_matches_the_linear_scan_with_api_wildcards(tables):
+    _, api_permissions = tables
+    api_permissions['api/reports/*'] = 'owner'
+    api_permissions['api/uploads/*'] = 'client'
+    routes.compile_permissions()
+    for path in candidate_paths() + ['api/reports', 'api/reports/daily', 'api/uploads/a/b']:
+        expected = linear_permission(path, routes.ROUTE_PERMISSIONS, routes.API_PERMISSIONS)
+        assert routes.get_route_permission(path) == expected, path
+
+
+def test_page_table_wins_over_api_table(tables):
+    route_permissions, api_permissions = tables
+    route_permissions['shared'] = 'owner'
+    api_permissions['shared'] = 'client'
+    routes.compile_permissions()
+    assert routes.get_route_permission('shared') == 'owner'
+
+
+def test_most_specific_rule_wins(tables):
+    route_permissions, _ = tables
+    route_permissions.update({
+        'area/*': 'client',
+        'area/items/:id': 'booster',
+        'area/items/special': 'owner',
+    })
+    routes.compile_permissions()
+    assert routes.get_route_permission('area') == 'client'
+    assert routes.get_route_permission('area/other/page') == 'client'
+    assert routes.get_route_permission('area/items/42') == 'booster'
+    assert routes.get_route_permission('area/items/special') == 'owner'
+    # ':id' matches exactly one segment; deeper paths fall back to the wildcard
+    assert routes.get_route_permission('area/items/42/edit') == 'client'
+    # wildcards are segment-bounded, unlike the old prefix scan
+    assert routes.get_route_permission('areas') is None
+
+
+def test_compile_clears_the_lookup_cache(tables):
+    route_permissions, _ = tables
+    assert routes.get_route_permission('brand-new') is None
+    route_permissions['brand-new'] = 'owner'
+    routes.compile_permissions()
+    assert routes.get_route_permission('brand-new') == 'owner'
+
+
+def test_empty_segments_are_ignored():
+    assert routes.get_route_permission('owner//settings') == routes.get_route_permission('owner/settings')
+    assert routes.get_route_permission('//owner/settings//') == 'owner'
@@ -0,0 +1,49 @@
+import pytest
+from flask import Flask
+
+from backend.security import security
+from backend.security.security import Principal, owner_required, booster_required, client_required
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+
+    @app.route('/api/owner')
+    @owner_required
+    def owner_only():
+        return 'ok'
+
+    @app.route('/api/booster')
+    @booster_required
+    def booster_only():
+        return 'ok'
+
+    @app.route('/api/client')
+    @client_required
+    def client_only():
+        return 'ok'
+
+    return app
+
+
+@pytest.fixture
+def login(monkeypatch):
+    def login(**flags):
+        user = {'_id': 'u1', 'username': 'user', **flags}
+        monkeypatch.setattr(security, 'get_principal', lambda: Principal('token', {'sub': 'u1'}, user))
+    return login
+
+
+@pytest.mark.parametrize('flags, allowed', [
+    ({'is_owner': True, 'is_booster': True}, {'owner', 'booster'}),
+    ({'is_owner': True}, {'owner'}),
+    ({'is_booster': True}, {'booster'}),
+    ({}, {'client'}),
+])
+def test_each_decorator_checks_its_own_flag(app, login, flags, allowed):
+    login(**flags)
+    client = app.test_client()
+    for role in ('owner', 'booster', 'client'):
+        expected = 200 if role in allowed else 403
+        assert client.get(f'/api/{role}').status_code == expected, role
@@ -0,0 +1,48 @@
+import pytest
+from flask import Flask
+
+from backend.assets.static_files import StaticAssets
+
+FILES = {
+    'index.html': b'<html></html>',
+    'static/js/main.b159d869.js': b'console.log(1)',
+    'static/js/453.4e175c56.chunk.js': b'console.log(2)',
+    'static/css/main.0a1b2c3d.css': b'body{}',
+    'static/media/logo.6ce24c58023cc2f8fd88fe9d219db6c6.svg': b'<svg/>',
+    'static/media/banner.1f2e3d4c.png': b'\x89PNG',
+    'static/media/font.5e3b1a9f.woff2': b'wOF2',
+    'static/media/plain.svg': b'<svg/>',
+    'images/logo.png': b'\x89PNG',
+    'images/logo.0123abcd.png': b'\x89PNG',
+}
+
+
+@pytest.fixture
+def assets(tmp_path):
+    for name, data in FILES.items():
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    assets = StaticAssets(str(tmp_path))
+    assets.scan()
+    return assets
+
+
+@pytest.mark.parametrize('name', [
+    'static/js/main.b159d869.js',
+    'static/js/453.4e175c56.chunk.js',
+    'static/css/main.0a1b2c3d.css',
+    'static/media/logo.6ce24c58023cc2f8fd88fe9d219db6c6.svg',
+    'static/media/banner.1f2e3d4c.png',
+    'static/media/font.5e3b1a9f.woff2',
+])
+def test_hashed_files_under_static_are_immutable(assets, name):
+    assert assets.get(name).immutable
+    with Flask(__name__).test_request_context('/'):
+        assert 'immutable' in assets.send(name).headers['Cache-Control']
+
+
+@pytest.mark.parametrize('name', ['index.html', 'static/media/plain.svg', 'images/logo.png',
+                                  'images/logo.0123abcd.png'])
+def test_other_files_are_not_immutable(assets, name):
+    assert not assets.get(name).immutable
@@ -0,0 +1,116 @@
+import time
+
+import jwt
+import pytest
+
+from backend.security import token_cache as token_cache_module
+from backend.security.token_cache import TokenCache
+
+SECRET = 'test-secret'
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [time.time()]
+    monkeypatch.setattr(token_cache_module.time, 'time', lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def decode_calls(monkeypatch):
+    calls = []
+    decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return decode(*args, **kwargs)
+
+    monkeypatch.setattr(token_cache_module.jwt, 'decode', counting_decode)
+    return calls
+
+
+def make_token(exp, secret=SECRET, **claims):
+    return jwt.encode(dict(claims, sub='u1', exp=exp), secret, algorithm='HS256')
+
+
+def test_decodes_each_token_once(clock, decode_calls):
+    cache = TokenCache()
+    token = make_token(int(clock[0]) + 60)
+    assert cache.decode(token, SECRET)['sub'] == 'u1'
+    assert cache.decode(token, SECRET)['sub'] == 'u1'
+    assert len(decode_calls) == 1
+    assert cache.stats()['hits'] == 1
+
+
+def test_expires_at_exp_like_jwt_decode(clock, decode_calls):
+    cache = TokenCache()
+    exp = int(clock[0]) + 60
+    token = make_token(exp)
+    cache.decode(token, SECRET)
+
+    clock[0] = exp - 0.001
+    cache.decode(token, SECRET)
+    assert len(decode_calls) == 1
+
+    # jwt.decode rejects a token when exp <= now, so at exp the cache hands it back to jwt.decode
+    clock[0] = exp
+    cache.decode(token, SECRET)
+    assert len(decode_calls) == 2
+    assert cache.stats()['expired'] == 1
+
+
+def test_expired_token_raises(clock):
+    cache = TokenCache()
+    with pytest.raises(jwt.ExpiredSignatureError):
+        cache.decode(make_token(int(time.time()) - 1), SECRET)
+
+
+def test_secret_is_part_of_the_key(clock):
+    cache = TokenCache()
+    token = make_token(int(clock[0]) + 60)
+    cache.decode(token, SECRET)
+    with pytest.raises(jwt.InvalidSignatureError):
+        cache.decode(token, 'other-secret')
+
+
+def test_invalid_tokens_are_not_cached(clock, decode_calls):
+    cache = TokenCache()
+    token = make_token(int(clock[0]) + 60, secret='other-secret')
+    for _ in range(2):
+        with pytest.raises(jwt.InvalidTokenError):
+            cache.decode(token, SECRET)
+    assert len(decode_calls) == 2
+    assert cache.stats()['size'] == 0
+
+
+def test_token_without_exp_uses_max_ttl(clock, decode_calls):
+    cache = TokenCache(max_ttl=10)
+    token = jwt.encode({'sub': 'u1'}, SECRET, algorithm='HS256')
+    cache.decode(token, SECRET)
+    clock[0] += 9
+    cache.decode(token, SECRET)
+    clock[0] += 1
+    cache.decode(token, SECRET)
+    assert len(decode_calls) == 2
+
+
+def test_lru_eviction(clock, decode_calls):
+    cache = TokenCache(max_size=2)
+    exp = int(clock[0]) + 60
+    first, second, third = (make_token(exp, jti=str(index)) for index in range(3))
+    cache.decode(first, SECRET)
+    cache.decode(second, SECRET)
+    cache.decode(first, SECRET)
+    cache.decode(third, SECRET)
+    assert cache.stats()['evictions'] == 1
+
+    cache.decode(first, SECRET)
+    cache.decode(second, SECRET)
+    assert decode_calls == [first, second, third, second]
+
+
+def test_returns_independent_copies(clock):
+    cache = TokenCache()
+    token = make_token(int(clock[0]) + 60)
+    cache.decode(token, SECRET)['sub'] = 'changed'
+    assert cache.decode(token, SECRET)['sub'] == 'u1'
@@ -0,0 +1,105 @@
+import pytest
+from flask import Flask
+
+from backend.security import user_cache as user_cache_module
+from backend.security.user_cache import UserCache
+
+
+class Loader:
+    """Counts database lookups"""
+
+    def __init__(self, user):
+        self.user = user
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.user
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(user_cache_module.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_process_cache_hits_until_ttl(clock):
+    cache = UserCache(ttl=30)
+    loader = Loader({'_id': 'u1', 'username': 'a'})
+
+    assert cache.get_user('u1', 1, loader) == {'_id': 'u1', 'username': 'a'}
+    clock[0] += 29
+    cache.get_user('u1', 1, loader)
+    assert loader.calls == 1
+
+    clock[0] += 1
+    cache.get_user('u1', 1, loader)
+    assert loader.calls == 2
+    assert cache.stats()['expired'] == 1
+
+
+def test_token_iat_is_part_of_the_key(clock):
+    cache = UserCache()
+    loader = Loader({'_id': 'u1'})
+    cache.get_user('u1', 1, loader)
+    cache.get_user('u1', 2, loader)
+    assert loader.calls == 2
+
+
+def test_missing_user_is_not_cached(clock):
+    cache = UserCache()
+    loader = Loader(None)
+    assert cache.get_user('u1', 1, loader) is None
+    assert cache.get_user('u1', 1, loader) is None
+    assert loader.calls == 2
+    assert cache.stats()['size'] == 0
+
+
+def test_invalidate_drops_every_iat(clock):
+    cache = UserCache()
+    loader = Loader({'_id': 'u1'})
+    cache.get_user('u1', 1, loader)
+    cache.get_user('u1', 2, loader)
+    cache.invalidate('u1')
+    assert cache.stats()['size'] == 0
+    cache.get_user('u1', 1, loader)
+    assert loader.calls == 3
+
+
+def test_lru_eviction(clock):
+    cache = UserCache(max_size=2)
+    loaders = {user_id: Loader({'_id': user_id}) for user_id in ('a', 'b', 'c')}
+    cache.get_user('a', 1, loaders['a'])
+    cache.get_user('b', 1, loaders['b'])
+    # 'a' becomes the most recently used, so 'b' is evicted
+    cache.get_user('a', 1, loaders['a'])
+    cache.get_user('c', 1, loaders['c'])
+
+    cache.get_user('a', 1, loaders['a'])
+    cache.get_user('b', 1, loaders['b'])
+    assert loaders['a'].calls == 1
+    assert loaders['b'].calls == 2
+    assert cache.stats()['evictions'] == 2
+
+
+def test_callers_get_independent_copies(clock):
+    cache = UserCache()
+    loader = Loader({'_id': 'u1', 'username': 'a'})
+    cache.get_user('u1', 1, loader)['username'] = 'changed'
+    assert cache.get_user('u1', 1, loader)['username'] == 'a'
+
+
+def test_request_memo_skips_the_process_cache(clock):
+    cache = UserCache(ttl=0)
+    loader = Loader({'_id': 'u1'})
+    app = Flask(__name__)
+    with app.test_request_context():
+        first = cache.get_user('u1', 1, loader)
+        assert cache.get_user('u1', 1, loader) is first
+    assert loader.calls == 1
+    assert cache.stats()['request_hits'] == 1
+
+    with app.test_request_context():
+        cache.get_user('u1', 1, loader)
+    assert loader.calls == 2
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Production entry point for the Flask app.
+
+    gunicorn wsgi:app        (Linux/macOS, settings from gunicorn.conf.py)
+    python wsgi.py           gunicorn when available, otherwise waitress
+
+gunicorn runs WEB_WORKERS processes with gevent workers by default (see
+gunicorn.conf.py); waitress runs WEB_THREADS threads in one process. Neither
+uses Flask's development server.
+"""
+import os
+import sys
+
+from dotenv import load_dotenv
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+load_dotenv(os.path.join(ROOT, 'config.env'))
+
+
+def _patch_for_gevent():
+    """Monkey-patch before the app is imported when gunicorn will run gevent workers"""
+    if sys.platform == 'win32' or (os.getenv('WEB_WORKER_CLASS') or 'gevent') != 'gevent':
+        return
+    # `gunicorn wsgi:app` has already imported gunicorn; `python wsgi.py` uses it when installed
+    if __name__ != '__main__' and 'gunicorn' not in sys.modules:
+        return
+    try:
+        import gunicorn  # noqa: F401
+        from gevent import monkey
+    except ImportError:
+        return
+    monkey.patch_all()
+
+
+_patch_for_gevent()
+
+from server import app, logger, SERVER_HOST, SERVER_PORT  # noqa: E402
+
+
+def run_gunicorn():
+    from gunicorn.app.wsgiapp import run
+    sys.argv = ['gunicorn', '--config', os.path.join(ROOT, 'gunicorn.conf.py'), 'wsgi:app']
+    run()
+
+
+def run_waitress():
+    from waitress import serve
+    from backend.db.indexes import start_index_bootstrap
+    threads = int(os.getenv('WEB_THREADS') or 8)
+    logger.success(f"Server ready at: http://{SERVER_HOST}:{SERVER_PORT} (waitress, {threads} threads)")
+    # waitress runs in a single process with one MongoClient shared by all threads
+    start_index_bootstrap()
+    serve(app, host=SERVER_HOST, port=SERVER_PORT, threads=threads)
+
+
+def run_production():
+    """Serve the app with gunicorn (POSIX) or waitress"""
+    if sys.platform != 'win32':
+        try:
+            import gunicorn  # noqa: F401
+            return run_gunicorn()
+        except ImportError:
+            pass
+    try:
+        import waitress  # noqa: F401
+    except ImportError:
+        logger.error("Install gunicorn or waitress to run in production mode (pip install -r requirements.txt)")
+        sys.exit(1)
+    return run_waitress()
+
+
+if __name__ == '__main__':
+    run_production()